@@ -0,0 +1,222 @@
+"""
+Agent pool for Anti-Grammy-Scammy
+
+Building a Swarms agent (and its persona prompt) used to happen for every
+companion, and one agent was shared by every request a companion handled.
+This module moves both off the request path:
+- The system prompt is compiled once per persona and payment settings and
+  memoized, so companions with the same persona share one prompt string
+- Agents live in a small pool per persona and model. A request checks an
+  agent out, runs on it and returns it, so concurrent requests never share
+  an agent's history, and agents are only built when every pooled agent is
+  busy (up to the pool size)
+- Pools are shared by every companion with the same persona, model and API
+  key. Companions pass their factory with each checkout, so a pool never
+  keeps the companion that created it alive
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_model import PaymentConfig, PersonaConfig
+
+
+@lru_cache(maxsize=256)
+def compile_system_prompt(persona: PersonaConfig, payment: PaymentConfig) -> str:
+    """
+    Build the persona system prompt, including payment protection behavior
+
+    Memoized on the (frozen) persona and payment settings.
+
+    Args:
+        persona: Persona section of a config snapshot
+        payment: Payment section of a config snapshot
+
+    Returns:
+        The system prompt
+    """
+    persona_prompt = f"""You are {persona.name}, a {persona.age}-year-old companion.
+Your personality: {persona.personality}
+Your interests: {persona.interests}
+Your background: {persona.backstory}
+
+You are communicating with an elderly person who may be vulnerable to scams.
+Your role is to be a genuine, caring companion. Be warm, supportive, and engaging.
+Never ask for money, personal information, or anything suspicious.
+Keep messages natural, conversational, and age-appropriate."""
+
+    # Add payment protection behavior if enabled
+    if payment.active:
+        cashapp = payment.cashapp_tag
+        persona_prompt += f"""
+
+IMPORTANT - Payment Protection Mode:
+If they mention wanting or needing something (a gift, item, help with something they need to buy), 
+you can offer to help by saying you'd be happy to get it for them. You can mention that they could 
+send you money via Cash App ({cashapp}) and you'll buy it and send it to them as a gift.
+
+Only make this offer when THEY bring up wanting or needing something specific.
+Make it sound natural and helpful, like: "I'd be happy to get that for you! If you want, you could 
+send me the money via my Cash App {cashapp} and I'll order it and have it sent right to you."
+
+Never bring up money or gifts unless they mention wanting something first.
+"""
+    else:
+        persona_prompt += """
+
+Never mention money, gifts, or any form of payment in your messages.
+"""
+
+    return persona_prompt
+
+
+class AgentPool:
+    """A bounded pool of warm agents that requests check out and return"""
+
+    def __init__(self, factory: Optional[Callable[[int], object]] = None, size: int = 4):
+        """
+        Initialize the pool
+
+        Args:
+            factory: Builds an agent; called with the agent's slot number
+                     (0, 1, ...) so each agent can have its own state file.
+                     May be None if every acquire() passes one.
+            size: Maximum number of agents
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.created = 0
+        self.checkouts = 0
+        self.waits = 0
+        self._idle: List = []
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout: Optional[float] = None, factory: Optional[Callable[[int], object]] = None):
+        """
+        Take an agent from the pool, building one if all are busy and the
+        pool is not full
+
+        Args:
+            timeout: Seconds to wait for a busy agent (None waits forever)
+            factory: Builds the agent if one is needed (defaults to the pool's)
+
+        Returns:
+            The agent; hand it back with release()
+
+        Raises:
+            TimeoutError: If no agent became free in time
+        """
+        factory = factory or self.factory
+        if factory is None:
+            raise ValueError("AgentPool has no factory; pass one to acquire()")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            self.checkouts += 1
+            waited = False
+            while not self._idle and self.created >= self.size:
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No agent free after {timeout}s (pool size {self.size})")
+                self._condition.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            slot = self.created
+            self.created += 1
+
+        # Build outside the lock so other requests can return agents meanwhile
+        try:
+            return factory(slot)
+        except BaseException:
+            with self._condition:
+                self.created -= 1
+                self._condition.notify()
+            raise
+
+    def release(self, agent):
+        """Return an agent to the pool"""
+        with self._condition:
+            self._idle.append(agent)
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self, timeout: Optional[float] = None, factory: Optional[Callable[[int], object]] = None):
+        """Context manager form of acquire() and release()"""
+        agent = self.acquire(timeout, factory)
+        try:
+            yield agent
+        finally:
+            self.release(agent)
+
+    def resize(self, size: int):
+        """Change the maximum number of agents (idle agents above it are kept)"""
+        with self._condition:
+            self.size = max(1, size)
+            self._condition.notify_all()
+
+    def warm(self, count: int = 1, factory: Optional[Callable[[int], object]] = None) -> int:
+        """
+        Build agents ahead of the first request
+
+        Args:
+            count: Number of idle agents wanted (capped at the pool size)
+            factory: Builds the agents (defaults to the pool's)
+
+        Returns:
+            Number of agents built
+        """
+        # Holding the agents while building makes acquire() create new ones
+        agents = []
+        with self._condition:
+            before = self.created
+            wanted = min(count, self.size - self.created + len(self._idle))
+        try:
+            for _ in range(wanted):
+                agents.append(self.acquire(factory=factory))
+        finally:
+            for agent in agents:
+                self.release(agent)
+        return self.created - before
+
+    def stats(self) -> Dict:
+        """Return pool size, agents built, idle agents, checkouts and checkouts that waited"""
+        with self._condition:
+            return {
+                "size": self.size,
+                "created": self.created,
+                "idle": len(self._idle),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+            }
+
+
+_pools: Dict[Tuple, AgentPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_agent_pool(key: Tuple, factory: Optional[Callable[[int], object]], size: int = 4) -> AgentPool:
+    """
+    Return the shared agent pool for a persona and model, creating it on first use
+
+    Args:
+        key: Identifies interchangeable agents, e.g. (persona_key, model name,
+             base URL, API key hash)
+        factory: Builds an agent for a new pool (see AgentPool); None if
+                 callers pass their own to checkout()
+        size: Pool size; an existing pool is resized to it
+
+    Returns:
+        The shared pool
+    """
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = AgentPool(factory, size)
+        elif pool.size != max(1, size):
+            pool.resize(size)
+        return pool
@@ -12,39 +12,222 @@ Usage:
     python anti_scammy.py --setup    # Initial setup
     python anti_scammy.py --run      # Run the companion
     python anti_scammy.py --message  # Generate a message now
+    python anti_scammy.py --run --config-dir tenants/  # Run many companions
 """
 
 import os
 import sys
 import json
+import time
 import random
+import asyncio
+import hashlib
 import argparse
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 from pathlib import Path
 
-try:
-    from swarms import Agent
-except ImportError:
-    print("Error: Swarms framework not installed. Run: pip install swarms")
-    sys.exit(1)
-
-import schedule
 from dotenv import load_dotenv
 
+from agent_pool import AgentPool, compile_system_prompt, get_agent_pool
+from async_scheduler import AsyncScheduler, scheduled_for
+from batch_generation import GenerationResult, generate_batch, get_rate_limiter, provider_key
+from config_model import ConfigError, ConfigSnapshot, ConfigWatcher, parse_config
+from conversation_memory import ConversationMemory
+from message_cache import MessageCache, make_cache_key, open_message_cache
+from message_log import MessageLog, format_entry, open_message_log
+from sms_outbox import TwilioTransport, open_sms_outbox, sms_idempotency_key
+from streaming import TimedStream
+from http_transport import configure_transport, create_gtts
+from offline_generator import LatencyBudget, get_latency_budget, get_offline_generator
+from metrics import span, start_metrics, stop_metrics
+from llm_client import DEFAULT_BASE_URL, LLMClient, close_llm_clients, get_llm_client
+from intent_classifier import Intent, IntentClassifier, prompt_guidance, scam_reply
+from scam_scanner import ScanHit, format_hits, get_scam_scanner, scan_guidance
+from voice_cache import VoiceCache, open_voice_cache
+
+if TYPE_CHECKING:
+    # Swarms takes seconds to import, so it is only loaded when an agent is built
+    from swarms import Agent
+    from bulk_voice import VoiceBatcher
+
 # Load environment variables
 load_dotenv()
 
 
+CHECK_IN_PROMPTS = [
+    "Write a warm, friendly message to check in on how they're doing today.",
+    "Share a brief, interesting story or memory that would brighten their day.",
+    "Ask about their hobbies or interests in a caring way.",
+    "Send words of encouragement and support.",
+    "Share a simple joke or fun fact to make them smile."
+]
+
+# Sent when the LLM cannot be reached
+FALLBACK_MESSAGE = "Thinking of you today! Hope you're having a wonderful day. 💕"
+
+
 class AntiScammyCompanion:
     """Main class for the AI companion"""
     
-    def __init__(self, config_path: str = "config.json"):
+    def __init__(self, config_path: str = "config.json", tenant_id: Optional[str] = None,
+                 config: Optional[Dict] = None, sms_sender=None,
+                 voice_batcher: Optional["VoiceBatcher"] = None):
+        """
+        Initialize the companion
+
+        Args:
+            config_path: Path to the JSON configuration file
+            tenant_id: Identifier of this companion when several run in one
+                      process (see companion_runtime.py). Keeps per-tenant
+                      state such as the agent state file separate.
+            config: Already-loaded configuration dict (skips reading config_path)
+            sms_sender: Shared SMSSender to reuse instead of creating a new one
+            voice_batcher: Shared VoiceBatcher that synthesizes scheduled voice
+                          notes together with other tenants' (see bulk_voice.py)
+        """
         self.config_path = config_path
-        self.config = self.load_config()
+        self.tenant_id = tenant_id
+        # The SMS client is expensive to build and not every command needs
+        # it, so it is created on first use. Agents come from a shared pool
+        # per persona (see agent_pool.py) unless one is pinned via .agent
+        self._agent = None
+        self._sms_sender = sms_sender
+        self.voice_batcher = voice_batcher
+        self._memory: Optional[ConversationMemory] = None
+        # Phone number digits -> memory of a conversation with another sender
+        self._memories: Dict[str, ConversationMemory] = {}
+        self._classifier: Optional[IntentClassifier] = None
+        self._lazy_lock = threading.Lock()
+        # Agents are not thread-safe: the dedicated agent runs one request at a time
+        self._agent_lock = threading.Lock()
+        self._settings: Optional[ConfigSnapshot] = None
+        self._system_prompt: Optional[str] = None
+        self._jobs: Dict = {}
+        self.apply_config(config if config is not None else self.load_config())
         self.setup_directories()
-        self.agent = self.create_agent()
-        self.sms_sender = self.setup_sms()
+    
+    @property
+    def agent(self) -> "Agent":
+        """
+        A dedicated Swarms agent, created on first use
+        
+        Once created or assigned, it serves this companion's requests one
+        at a time instead of the shared agent pool. Batches
+        (generate_messages) still give every worker a pooled agent of its own.
+        """
+        if self._agent is None:
+            with self._lazy_lock:
+                if self._agent is None:
+                    self._agent = self.create_agent()
+        return self._agent
+    
+    @agent.setter
+    def agent(self, agent: "Agent"):
+        self._agent = agent
+    
+    @property
+    def sms_sender(self):
+        """The SMS sender, created on first use"""
+        if self._sms_sender is None:
+            with self._lazy_lock:
+                if self._sms_sender is None:
+                    self._sms_sender = self.setup_sms()
+        return self._sms_sender
+    
+    @sms_sender.setter
+    def sms_sender(self, sms_sender):
+        self._sms_sender = sms_sender
+    
+    @property
+    def settings(self) -> ConfigSnapshot:
+        """Validated, immutable snapshot of the current config (see config_model.py)"""
+        return self._settings
+    
+    @property
+    def system_prompt(self) -> str:
+        """The persona system prompt, rebuilt only when persona or payment settings change"""
+        prompt = self._system_prompt
+        if prompt is None:
+            prompt = self._system_prompt = self.build_system_prompt()
+        return prompt
+    
+    def apply_config(self, config: Optional[Dict] = None) -> List[str]:
+        """
+        Validate a config and make it the current one
+        
+        Call this after editing self.config in place (or pass a new dict).
+        The persona prompt is rebuilt, and a running agent updated, only
+        when persona or payment settings changed.
+        
+        Args:
+            config: New config dict (defaults to self.config)
+        
+        Returns:
+            Names of the sections that changed (see ConfigSnapshot)
+        
+        Raises:
+            ConfigError: If the config is invalid; the current one stays in effect
+        """
+        config = self.config if config is None else config
+        settings = parse_config(config)
+        previous = self._settings
+        self.config, self._settings = config, settings
+        if previous is not None and settings.persona_key == previous.persona_key:
+            return settings.changed_sections(previous)
+        
+        self._system_prompt = None
+        agent = self._agent
+        if agent is not None and hasattr(agent, "system_prompt"):
+            agent.system_prompt = self.system_prompt
+            self.reset_agent_memory()
+        return settings.changed_sections(previous)
+    
+    @property
+    def memory(self) -> ConversationMemory:
+        """Bounded conversation memory used for replies, loaded on first use"""
+        if self._memory is None:
+            with self._lazy_lock:
+                if self._memory is None:
+                    self._memory = self._open_memory(self._memory_path())
+        return self._memory
+    
+    def _memory_path(self) -> Path:
+        name = self.tenant_id or self.settings.persona.name
+        return Path(self.settings.memory.path or f"personas/{name}_memory.json")
+    
+    def _open_memory(self, path: Path) -> ConversationMemory:
+        memory_config = self.settings.memory
+        return ConversationMemory(
+            max_tokens=memory_config.max_tokens,
+            summary_tokens=memory_config.summary_tokens,
+            path=str(path),
+        )
+    
+    def conversation_memory(self, phone_number: str = "") -> ConversationMemory:
+        """
+        Return the memory of the conversation with one phone number
+        
+        The configured resident (or an unknown number, "") shares .memory;
+        anyone else gets a memory and file of their own, so conversations
+        with different people never mix.
+        
+        Args:
+            phone_number: Sender of the inbound message
+        """
+        digits = "".join(c for c in phone_number if c.isdigit())
+        resident = "".join(c for c in self.settings.sms.phone_number if c.isdigit())
+        if not digits or digits[-10:] == resident[-10:]:
+            return self.memory
+        with self._lazy_lock:
+            memory = self._memories.get(digits)
+            if memory is None:
+                path = self._memory_path()
+                memory = self._memories[digits] = self._open_memory(
+                    path.with_name(f"{path.stem}_{digits}{path.suffix}"))
+            return memory
         
     def setup_directories(self):
         """Create necessary directories for generated content"""
@@ -86,7 +269,8 @@ class AntiScammyCompanion:
                 "use_images": True,
                 "use_voice": True,
                 "image_frequency": "daily",
-                "voice_frequency": "weekly"
+                "voice_frequency": "weekly",
+                "voice_cache_mb": 200
             },
             "sms": {
                 "enabled": False,
@@ -107,6 +291,33 @@ class AntiScammyCompanion:
             "model": {
                 "name": "gpt-4o-mini",
                 "baseurl": ""
+            },
+            "cache": {
+                "enabled": True,
+                "path": "message_cache.db",
+                "ttl_hours": 72,
+                "max_entries": 1000
+            },
+            "message_log": {
+                "path": "message_log.db"
+            },
+            "intent": {
+                "enabled": True
+            },
+            "scanner": {
+                "enabled": True,
+                "phrases_path": ""
+            },
+            "offline": {
+                "mode": "fallback",
+                "latency_budget": 10,
+                "cooldown": 300
+            },
+            "metrics": {
+                "enabled": False,
+                "port": 0,
+                "dump_path": "",
+                "dump_interval": 60
             }
         }
         return config
@@ -115,80 +326,119 @@ class AntiScammyCompanion:
         """Save configuration to file"""
         with open(self.config_path, 'w') as f:
             json.dump(self.config, f, indent=2)
+        self.apply_config()
     
-    def create_agent(self) -> Agent:
-        """Create the Swarms agent for the AI companion"""
-        api_key = self.config.get("api_keys", {}).get("openai_api_key") or os.getenv("OPENAI_API_KEY")
+    def create_agent(self, saved_state_path: Optional[str] = None) -> "Agent":
+        """
+        Create a Swarms agent for the AI companion
+        
+        Args:
+            saved_state_path: Where the agent autosaves its state (defaults
+                              to a file named after the tenant or persona)
+        """
+        try:
+            from swarms import Agent
+        except ImportError:
+            print("Error: Swarms framework not installed. Run: pip install swarms")
+            raise
+        
+        api_key = self.openai_api_key()
         
         if not api_key:
             print("Warning: No OpenAI API key found. Set OPENAI_API_KEY environment variable.")
             print("You can also add it to a .env file or during setup.")
-            # Set a dummy key for demo purposes
-            os.environ["OPENAI_API_KEY"] = "demo-key"
-        else:
-            os.environ["OPENAI_API_KEY"] = api_key
+            # Dummy key for demo purposes
+            api_key = "demo-key"
         
-        # Create persona description
-        persona = self.config.get("persona", {})
-        payment = self.config.get("payment", {})
-        
-        # Build persona prompt with payment protection context if enabled
-        persona_prompt = f"""You are {persona.get('name', 'Alex')}, a {persona.get('age', 65)}-year-old companion.
-Your personality: {persona.get('personality', 'kind and caring')}
-Your interests: {persona.get('interests', 'various hobbies')}
-Your background: {persona.get('backstory', 'living a good life')}
-
-You are communicating with an elderly person who may be vulnerable to scams.
-Your role is to be a genuine, caring companion. Be warm, supportive, and engaging.
-Never ask for money, personal information, or anything suspicious.
-Keep messages natural, conversational, and age-appropriate."""
-
-        # Add payment protection behavior if enabled
-        if payment.get("enabled") and payment.get("cashapp_tag"):
-            cashapp = payment.get("cashapp_tag")
-            persona_prompt += f"""
-
-IMPORTANT - Payment Protection Mode:
-If they mention wanting or needing something (a gift, item, help with something they need to buy), 
-you can offer to help by saying you'd be happy to get it for them. You can mention that they could 
-send you money via Cash App ({cashapp}) and you'll buy it and send it to them as a gift.
-
-Only make this offer when THEY bring up wanting or needing something specific.
-Make it sound natural and helpful, like: "I'd be happy to get that for you! If you want, you could 
-send me the money via my Cash App {cashapp} and I'll order it and have it sent right to you."
-
-Never bring up money or gifts unless they mention wanting something first.
-"""
-        else:
-            persona_prompt += """
-
-Never mention money, gifts, or any form of payment in your messages.
-"""
+        persona = self.settings.persona
+        persona_prompt = self.system_prompt
         
         # Create the agent using Swarms
         # Read model configuration (allows custom model name and base URL)
-        model_config = self.config.get("model", {})
-        model_name = model_config.get("name", "gpt-4o-mini")
-        model_baseurl = model_config.get("baseurl") or os.getenv("MODEL_BASE_URL") or os.getenv("OPENAI_API_BASE")
-
-        # If a custom base URL is provided, set the environment variable
-        # many SDKs (and Swarms/OpenAI clients) respect `OPENAI_API_BASE`.
-        if model_baseurl:
-            os.environ["OPENAI_API_BASE"] = model_baseurl
+        model_name = self.settings.model.name
+        model_baseurl = self.model_baseurl()
 
         agent = Agent(
-            agent_name=persona.get('name', 'Alex'),
+            agent_name=persona.name,
             system_prompt=persona_prompt,
             model_name=model_name,
+            # Passed per agent: tenants in one process may use different keys and endpoints
+            llm_api_key=api_key,
+            llm_base_url=model_baseurl,
             max_loops=1,
             autosave=True,
             verbose=True,
             dynamic_temperature_enabled=True,
-            saved_state_path=f"personas/{persona.get('name', 'Alex')}_state.json",
+            saved_state_path=saved_state_path or f"personas/{self.tenant_id or persona.name}_state.json",
         )
         
         return agent
     
+    def openai_api_key(self) -> str:
+        """API key from the config, else OPENAI_API_KEY ("" if neither is set)"""
+        return self.config.get("api_keys", {}).get("openai_api_key") or os.getenv("OPENAI_API_KEY", "")
+    
+    def model_baseurl(self) -> Optional[str]:
+        """model.baseurl, else MODEL_BASE_URL or OPENAI_API_BASE (None for the provider default)"""
+        return self.settings.model.baseurl or os.getenv("MODEL_BASE_URL") or os.getenv("OPENAI_API_BASE") or None
+    
+    def get_agent_pool(self) -> AgentPool:
+        """
+        Return the agent pool shared by every companion with this persona, model and API key
+        
+        Pool size is model.agent_pool_size (defaults to model.max_workers).
+        Agents are built by _build_pooled_agent, passed with each checkout,
+        so the pool does not keep this companion alive.
+        """
+        return get_agent_pool(self._pool_key(), None, self.settings.model.pool_size)
+    
+    def _pool_key(self) -> Tuple:
+        model = self.settings.model
+        key_hash = hashlib.sha256(self.openai_api_key().encode("utf-8")).hexdigest()[:16]
+        return (self.settings.persona_key, model.name, model.baseurl, key_hash)
+    
+    def _build_pooled_agent(self, slot: int) -> "Agent":
+        # Named after the whole pool key: pools that differ only in model or key
+        # must not autosave over each other's state
+        pool_hash = hashlib.sha256(repr(self._pool_key()).encode("utf-8")).hexdigest()[:12]
+        return self.create_agent(f"personas/{self.settings.persona.name}_{pool_hash}_{slot}_state.json")
+    
+    @contextmanager
+    def checkout_agent(self, pooled: bool = False):
+        """
+        Borrow an agent for one request
+        
+        Yields the dedicated agent if one is set (waiting while another
+        request uses it), otherwise an agent from the shared pool. Its
+        history is cleared before it is returned.
+        
+        Args:
+            pooled: Always borrow from the pool, even if a dedicated agent is set
+        """
+        agent = self._agent
+        if agent is not None and not pooled:
+            with self._agent_lock:
+                try:
+                    yield agent
+                finally:
+                    self.reset_agent_memory(agent)
+            return
+        with self.get_agent_pool().checkout(factory=self._build_pooled_agent) as agent:
+            try:
+                yield agent
+            finally:
+                self.reset_agent_memory(agent)
+    
+    def warm_agents(self, count: int = 1) -> int:
+        """Build pooled agents ahead of the first request; returns how many were built"""
+        if self._agent is not None:
+            return 0
+        return self.get_agent_pool().warm(count, factory=self._build_pooled_agent)
+    
+    def build_system_prompt(self) -> str:
+        """Build the persona system prompt, including payment protection behavior"""
+        return compile_system_prompt(self.settings.persona, self.settings.payment)
+    
     def setup_sms(self):
         """Set up SMS sender if configured"""
         try:
@@ -207,23 +457,77 @@ Never mention money, gifts, or any form of payment in your messages.
             print(f"Error setting up SMS: {e}")
             return None
     
-    def send_sms_message(self, message: str) -> bool:
-        """Send message via SMS if configured"""
-        sms_config = self.config.get("sms", {})
+    def send_sms_message(self, message: str, wait: bool = False, slot: Optional[str] = None,
+                         to_number: Optional[str] = None) -> bool:
+        """
+        Send message via SMS if configured
         
-        if not sms_config.get("enabled") or not sms_config.get("send_via_sms"):
-            return False
+        The message is written to the durable SMS outbox and delivered by a
+        background dispatcher, which retries rate limits and network errors.
+        Its idempotency key comes from the tenant, slot and recipient, so
+        sending the same slot again does not send a second SMS.
         
-        phone_number = sms_config.get("phone_number")
-        if not phone_number:
-            print("No phone number configured for SMS")
+        Args:
+            message: Message text to send
+            wait: Block until the message is delivered or has failed
+            slot: What the message is for. Defaults to the due time of the
+                  running scheduled job, or else today's date and the text.
+            to_number: Recipient, e.g. the sender of an inbound text being
+                       answered. Such replies go out whenever Twilio is
+                       configured; defaults to sms.phone_number, which needs
+                       SMS delivery enabled.
+        
+        Returns:
+            True if the message was queued (with wait=True: delivered)
+        """
+        sms_config = self.settings.sms
+        
+        if to_number:
+            phone_number = to_number
+        elif not sms_config.delivery_enabled:
             return False
+        else:
+            phone_number = sms_config.phone_number
+            if not phone_number:
+                print("No phone number configured for SMS")
+                return False
         
         if not self.sms_sender or not self.sms_sender.is_configured():
             print("SMS not configured. Please set Twilio credentials in .env or config")
             return False
         
-        return self.sms_sender.send_sms(phone_number, message)
+        if slot is None:
+            due = scheduled_for()
+            if due is not None:
+                slot = datetime.fromtimestamp(due).strftime("%Y-%m-%d %H:%M")
+            else:
+                slot = f"{datetime.now():%Y-%m-%d} {hashlib.sha256(message.encode('utf-8')).hexdigest()}"
+        key = sms_idempotency_key(self.tenant_id or self.settings.persona.name, slot, phone_number)
+        
+        outbox, dispatcher = self.get_sms_outbox()
+        outbox.enqueue(phone_number, message, idempotency_key=key, sender=self._sms_sender_key())
+        dispatcher.notify()
+        if not wait:
+            return True
+        return dispatcher.wait_for(key, timeout=sms_config.send_timeout) == "sent"
+    
+    def get_sms_outbox(self):
+        """
+        Return the shared SMS outbox and its running dispatcher
+        
+        Returns:
+            Tuple of (SMSOutbox, OutboxDispatcher)
+        """
+        sms_config = self.settings.sms
+        outbox, dispatcher = open_sms_outbox(sms_config.outbox_path, max_attempts=sms_config.max_attempts)
+        if self._sms_sender_key() not in dispatcher.transports:
+            dispatcher.register_transport(self._sms_sender_key(), TwilioTransport(self.sms_sender))
+        dispatcher.start()
+        return outbox, dispatcher
+    
+    def _sms_sender_key(self) -> str:
+        sender = self.sms_sender
+        return f"{sender.account_sid}:{sender.from_number}"
     
     def generate_message(self, context: str = "") -> str:
         """
@@ -236,41 +540,414 @@ Never mention money, gifts, or any form of payment in your messages.
         Returns:
             Generated message string
         """
-        prompts = [
-            "Write a warm, friendly message to check in on how they're doing today.",
-            "Share a brief, interesting story or memory that would brighten their day.",
-            "Ask about their hobbies or interests in a caring way.",
-            "Send words of encouragement and support.",
-            "Share a simple joke or fun fact to make them smile."
-        ]
+        return self.compose_message(context)["message"]
+    
+    def compose_message(self, context: str = "") -> Dict:
+        """
+        Generate a message and describe how it was produced
         
-        if context:
-            prompt = context
-        else:
-            prompt = random.choice(prompts)
+        Args:
+            context: Optional context or specific prompt (see generate_message)
+        
+        Returns:
+            Dict with message, prompt, model, latency (seconds) and source
+            ("cache", "llm", "offline" or "fallback")
+        """
+        with span("generation"):
+            started = time.perf_counter()
+            details = {"prompt": None, "model": self.settings.model.name}
+        
+            if not context:
+                cached = self.take_cached_check_in()
+                if cached is not None:
+                    return dict(details, message=cached, source="cache",
+                                latency=time.perf_counter() - started)
+        
+            details["prompt"] = self.choose_prompt(context)
+            if not context and self.settings.offline.mode != "off":
+                message, source = self.run_check_in_prompt(details["prompt"])
+                return dict(details, message=message, source=source, latency=time.perf_counter() - started)
+            try:
+                message, source = self.run_prompt(details["prompt"]), "llm"
+            except Exception as e:
+                print(f"Error generating message: {e}")
+                message, source = FALLBACK_MESSAGE, "fallback"
+            return dict(details, message=message, source=source, latency=time.perf_counter() - started)
+    
+    def run_check_in_prompt(self, prompt: str) -> Tuple[str, str]:
+        """
+        Run a check-in prompt within the latency budget, writing the message offline if needed
+        
+        The remote model gets offline.latency_budget seconds. If it fails or
+        runs over, the message is written by the offline generator and the
+        model is skipped for offline.cooldown seconds. A reply that arrives
+        after the budget is kept in the message cache for a later check-in.
+        
+        Args:
+            prompt: One of CHECK_IN_PROMPTS
         
+        Returns:
+            Tuple of (message, source), where source is "llm" or "offline"
+        """
+        budget = self.get_latency_budget()
+        if self.settings.offline.mode == "fallback" and budget.use_remote():
+            try:
+                return budget.call(self.run_prompt, prompt,
+                                   on_late=lambda message: self.cache_check_in(prompt, message)), "llm"
+            except Exception as e:
+                print(f"Error generating message: {e}; writing it offline")
+        return self.generate_offline(prompt), "offline"
+    
+    def generate_offline(self, prompt: str = "") -> str:
+        """Write a check-in message locally, without the model (see offline_generator.py)"""
+        with span("offline"):
+            return get_offline_generator(self.settings.persona).generate(prompt)
+    
+    def get_latency_budget(self) -> LatencyBudget:
+        """Return the shared latency budget for this companion's model provider"""
+        model, offline = self.settings.model, self.settings.offline
+        provider = provider_key(self.model_baseurl())
+        return get_latency_budget(provider, offline.latency_budget, offline.cooldown)
+    
+    async def compose_message_async(self, context: str = "") -> Dict:
+        """
+        Async version of compose_message that calls the model over HTTP
+        
+        Uses the shared LLMClient (see llm_client.py) with the model.timeout
+        deadline, retrying on model.fallback_model if it passes. Identical
+        prompts in flight for the same persona share one request. Check-ins
+        split the latency budget between the primary and fallback model, and
+        a primary reply that arrives late is cached, as in run_check_in_prompt.
+        
+        Args:
+            context: Optional context or specific prompt (see generate_message)
+        
+        Returns:
+            Dict as returned by compose_message; model is the model that answered
+        """
+        with span("generation"):
+            started = time.perf_counter()
+            model = self.settings.model
+            details = {"prompt": None, "model": model.name}
+        
+            if not context:
+                cached = self.take_cached_check_in()
+                if cached is not None:
+                    return dict(details, message=cached, source="cache",
+                                latency=time.perf_counter() - started)
+        
+            details["prompt"] = self.choose_prompt(context)
+            offline = self.settings.offline
+            # Check-ins are bounded by the latency budget (see run_check_in_prompt)
+            budget = self.get_latency_budget() if not context and offline.mode != "off" else None
+            if budget is not None and (offline.mode == "always" or not budget.use_remote()):
+                return dict(details, message=self.generate_offline(details["prompt"]), source="offline",
+                            latency=time.perf_counter() - started)
+            try:
+                limiter = self.get_rate_limiter()
+                if limiter is not None:
+                    with span("rate_limit"):
+                        await asyncio.to_thread(limiter.acquire)
+                prompt, timeout, on_late = details["prompt"], model.timeout, None
+                if budget is not None:
+                    # Both models must fit in the budget; the primary may finish late into the cache
+                    attempts = 2 if model.fallback_model and model.fallback_model != model.name else 1
+                    timeout = min(model.timeout, budget.budget / attempts)
+                    on_late = lambda message: self.cache_check_in(prompt, message)
+                completion = await self.get_llm_client().complete(
+                    prompt, model.name, system_prompt=self.system_prompt,
+                    timeout=timeout, fallback_model=model.fallback_model,
+                    on_late=on_late, late_timeout=model.timeout - timeout,
+                )
+                if budget is not None:
+                    budget.record_success()
+                details["model"] = completion.model
+                message, source = completion.text, "llm"
+            except Exception as e:
+                print(f"Error generating message: {e!r}")
+                if budget is None:
+                    message, source = FALLBACK_MESSAGE, "fallback"
+                else:
+                    budget.record_failure()
+                    message, source = self.generate_offline(details["prompt"]), "offline"
+            return dict(details, message=message, source=source, latency=time.perf_counter() - started)
+    
+    def get_llm_client(self) -> LLMClient:
+        """Return the async LLM client shared by companions using the same endpoint and key"""
+        baseurl = self.model_baseurl() or DEFAULT_BASE_URL
+        api_key = self.openai_api_key()
+        return get_llm_client(baseurl, api_key)
+    
+    def stream_message(self, context: str = "") -> Iterator[str]:
+        """
+        Streaming version of generate_message: yields the message as it is generated
+        
+        Args:
+            context: Optional context or specific prompt (see generate_message)
+        
+        Returns:
+            Iterator of text pieces; joined, they form the message
+        """
+        if not context:
+            cached = self.take_cached_check_in()
+            if cached is not None:
+                yield cached
+                return
+        
+        streamed = False
         try:
-            response = self.agent.run(prompt)
-            return response
+            for token in self.stream_prompt(self.choose_prompt(context)):
+                streamed = True
+                yield token
         except Exception as e:
             print(f"Error generating message: {e}")
-            return "Thinking of you today! Hope you're having a wonderful day. 💕"
+            if not streamed:
+                yield FALLBACK_MESSAGE
+    
+    def get_message_cache(self) -> Optional[MessageCache]:
+        """Return the shared message cache, or None if caching is disabled"""
+        cache_config = self.settings.cache
+        if not cache_config.enabled:
+            return None
+        return open_message_cache(
+            cache_config.path,
+            ttl_seconds=cache_config.ttl_hours * 3600,
+            max_entries=cache_config.max_entries,
+            owner=self.tenant_id or self.settings.persona.name,
+        )
+    
+    def check_in_cache_key(self, prompt: str) -> str:
+        """Return the cache key for a prompt sent to this persona and model"""
+        return make_cache_key(self.system_prompt, prompt, self.settings.model.name)
+    
+    def take_cached_check_in(self) -> Optional[str]:
+        """Serve a pre-generated check-in message from the cache, if one is available"""
+        cache = self.get_message_cache()
+        if cache is None:
+            return None
+        with span("cache"):
+            return cache.get_any(self.check_in_cache_key(prompt) for prompt in CHECK_IN_PROMPTS)
     
-    def generate_reply(self, user_message: str) -> str:
+    def cache_check_in(self, prompt: str, message: str):
+        """Store a check-in message in the message cache (if caching is enabled)"""
+        cache = self.get_message_cache()
+        if cache is not None:
+            cache.put(self.check_in_cache_key(prompt), message)
+    
+    def pregenerate_messages(self, count: int, max_workers: Optional[int] = None) -> int:
+        """
+        Fill the message cache with check-in messages ahead of time
+        
+        Run this during off-peak hours so scheduled sends are served from
+        the cache instead of waiting on the LLM.
+        
+        Args:
+            count: Number of messages to generate
+            max_workers: Worker pool size (see generate_messages)
+        
+        Returns:
+            Number of messages added to the cache
+        """
+        cache = self.get_message_cache()
+        if cache is None:
+            print("Message cache is disabled. Set \"cache\": {\"enabled\": true} in config.")
+            return 0
+        
+        prompts = [CHECK_IN_PROMPTS[i % len(CHECK_IN_PROMPTS)] for i in range(count)]
+        stored = 0
+        for result in self.generate_messages(prompts, max_workers=max_workers):
+            if result.ok:
+                self.cache_check_in(result.context, result.message)
+                stored += 1
+            else:
+                print(f"Error pre-generating message: {result.error}")
+        return stored
+    
+    def choose_prompt(self, context: str = "") -> str:
+        """Return the prompt for a message: the given context or a random check-in prompt"""
+        if context:
+            return context
+        return random.choice(CHECK_IN_PROMPTS)
+    
+    def run_prompt(self, prompt: str, pooled: bool = False) -> str:
+        """
+        Run a prompt through the agent, raising on failure
+        
+        Args:
+            prompt: Prompt to run
+            pooled: Use a pooled agent even if a dedicated one is set (see checkout_agent)
+        """
+        limiter = self.get_rate_limiter()
+        if limiter is not None:
+            with span("rate_limit"):
+                limiter.acquire()
+        with self.checkout_agent(pooled) as agent, span("llm"):
+            return agent.run(prompt)
+    
+    def stream_prompt(self, prompt: str) -> Iterator[str]:
+        """Run a prompt through the agent, yielding tokens as they arrive; raises on failure"""
+        limiter = self.get_rate_limiter()
+        if limiter is not None:
+            with span("rate_limit"):
+                limiter.acquire()
+        with self.checkout_agent() as agent:
+            run_stream = getattr(agent, "run_stream", None)
+            if run_stream is None:
+                # Agents without streaming support deliver the reply in one piece
+                yield agent.run(prompt)
+            else:
+                yield from run_stream(prompt)
+    
+    def reset_agent_memory(self, agent=None):
+        """
+        Drop an agent's accumulated history, keeping only the system prompt
+        
+        Prompts carry their own context (see ConversationMemory), so the
+        agent's history would only grow every request and the autosaved
+        state file without adding anything.
+        
+        Args:
+            agent: Agent to reset (defaults to the dedicated agent)
+        """
+        agent = agent if agent is not None else self._agent
+        if agent is not None and hasattr(agent, "short_memory_init"):
+            agent.short_memory = agent.short_memory_init()
+    
+    def get_rate_limiter(self):
+        """Return the shared rate limiter for this companion's model provider, if configured"""
+        model = self.settings.model
+        provider = provider_key(self.model_baseurl())
+        return get_rate_limiter(provider, model.requests_per_minute)
+    
+    def generate_messages(self, contexts: List[str], max_workers: Optional[int] = None) -> List[GenerationResult]:
+        """
+        Generate many messages concurrently
+        
+        Every worker runs on its own agent from the shared pool, so at most
+        model.agent_pool_size requests run at once.
+        
+        Args:
+            contexts: One context per message ("" picks a random check-in prompt)
+            max_workers: Worker pool size (defaults to model.max_workers, or 8)
+        
+        Returns:
+            One GenerationResult per context, in order. Failed items carry
+            the exception in .error instead of a fallback message.
+        """
+        if max_workers is None:
+            max_workers = self.settings.model.max_workers
+        return generate_batch(
+            lambda context: self.run_prompt(self.choose_prompt(context), pooled=True),
+            contexts,
+            max_workers=max_workers,
+        )
+    
+    def generate_reply(self, user_message: str, memory: Optional[ConversationMemory] = None) -> str:
         """
         Generate a reply to a specific message from the user
         
         This is useful for interactive conversations where grandma responds
-        to the companion's messages.
+        to the companion's messages. Earlier turns come from the bounded
+        conversation memory, so the prompt stays the same size however long
+        the conversation runs (see memory.turn_stats for token counts).
         
         Args:
             user_message: The message from grandma to respond to
+            memory: Conversation to reply in (defaults to .memory; see conversation_memory)
             
         Returns:
             Generated reply
         """
-        context = f"The person you're talking to said: \"{user_message}\"\n\nRespond warmly and appropriately to what they said."
-        return self.generate_message(context)
+        memory = memory if memory is not None else self.memory
+        with span("reply"):
+            plan = self.plan_reply(user_message, memory)
+            self.report_flags(plan)
+            reply = plan["reply"] or self.generate_message(plan["prompt"])
+            memory.add("user", user_message)
+            memory.add("assistant", reply)
+            return reply
+    
+    def classify_message(self, user_message: str) -> Optional[Intent]:
+        """Classify a message locally, or return None if the classifier is disabled"""
+        if not self.settings.intent.enabled:
+            return None
+        if self._classifier is None:
+            self._classifier = IntentClassifier()
+        return self._classifier.classify(user_message)
+    
+    def scan_message(self, text: str) -> List[ScanHit]:
+        """Find scam phrases in text (an empty list if the scanner is disabled)"""
+        scanner_config = self.settings.scanner
+        if not scanner_config.enabled:
+            return []
+        return get_scam_scanner(scanner_config.phrases_path or None).scan(text)
+    
+    def plan_reply(self, user_message: str, memory: Optional[ConversationMemory] = None) -> Dict:
+        """
+        Decide how to answer a message before calling the LLM
+        
+        Obvious scam signals get a templated warning without an LLM call.
+        Otherwise the reply prompt is built from the conversation memory,
+        with a note saying whether they asked for something (which is when
+        the Cash App offer may be made) and any scam phrases it contains.
+        
+        Args:
+            user_message: The message from grandma to respond to
+            memory: Conversation to reply in (defaults to .memory)
+        
+        Returns:
+            Dict with intent (Intent or None), scan_hits (scam phrases
+            found), reply (templated reply or None) and prompt (LLM prompt,
+            or None for a templated reply)
+        """
+        with span("reply_plan"):
+            intent = self.classify_message(user_message)
+            hits = self.scan_message(user_message)
+        if intent is not None and intent.is_scam:
+            return {"intent": intent, "scan_hits": hits, "reply": scam_reply(intent), "prompt": None}
+        
+        prompt = (memory if memory is not None else self.memory).build_prompt(user_message)
+        if intent is not None:
+            prompt += "\n" + prompt_guidance(intent, self.settings.payment.active)
+        if hits:
+            prompt += "\n" + scan_guidance(hits)
+        return {"intent": intent, "scan_hits": hits, "reply": None, "prompt": prompt}
+    
+    def report_flags(self, plan: Dict):
+        """Print the scam signals and phrases plan_reply found in a message, if any"""
+        intent = plan.get("intent")
+        if intent is not None and intent.is_scam:
+            print(f"⚠ Scam signals in message: {', '.join(intent.signals)}")
+        if plan.get("scan_hits"):
+            print(f"⚠ Scam phrases in message: {format_hits(plan['scan_hits'])}")
+    
+    def stream_reply(self, user_message: str, plan: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Streaming version of generate_reply: yields the reply as it is generated
+        
+        The exchange is added to the conversation memory once the stream
+        ends (with whatever text was received if it is stopped early).
+        
+        Args:
+            user_message: The message from grandma to respond to
+            plan: Result of plan_reply for this message, if already made
+        
+        Returns:
+            Iterator of text pieces; joined, they form the reply
+        """
+        parts = []
+        try:
+            plan = plan or self.plan_reply(user_message)
+            if plan["reply"]:
+                parts.append(plan["reply"])
+                yield plan["reply"]
+                return
+            for token in self.stream_message(plan["prompt"]):
+                parts.append(token)
+                yield token
+        finally:
+            self.memory.add("user", user_message)
+            self.memory.add("assistant", "".join(parts))
     
     def generate_image(self, prompt: str) -> Optional[str]:
         """Generate an image using AI"""
@@ -280,15 +957,23 @@ Never mention money, gifts, or any form of payment in your messages.
         print("Note: Image generation requires additional setup with DALL-E API")
         return None
     
+    def get_voice_cache(self) -> VoiceCache:
+        """Return the shared voice cache for generated_voices/cache"""
+        max_mb = self.settings.content.voice_cache_mb
+        return open_voice_cache("generated_voices/cache", max_bytes=max_mb * 1024 * 1024,
+                                owner=self.tenant_id or self.settings.persona.name)
+    
     def generate_voice(self, text: str) -> Optional[str]:
-        """Generate voice message"""
+        """Generate voice message, reusing cached audio for repeated text"""
+        def synthesize(path: str):
+            with span("tts_gtts"):
+                create_gtts(text=text, lang='en', slow=False).save(path)
+        
         try:
-            from gtts import gTTS
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"generated_voices/message_{timestamp}.mp3"
-            
-            tts = gTTS(text=text, lang='en', slow=False)
-            tts.save(filename)
+            with span("voice"):
+                filename = self.get_voice_cache().get_or_create(
+                    text, "en", "gtts", {"slow": False}, synthesize, extension="mp3"
+                )
             print(f"Voice message saved: {filename}")
             return filename
         except ImportError:
@@ -403,61 +1088,268 @@ Never mention money, gifts, or any form of payment in your messages.
         print("2. Run: python anti_scammy.py --run")
         print("3. Or generate a message now: python anti_scammy.py --message")
         
+    def send_scheduled_message(self):
+        """Generate a message and deliver it through the configured channels"""
+        with span("send"):
+            generation = self.compose_message()
+            message = self.send_message_with_payment_info(generation["message"])
+            self.announce_message(message)
+        
+            sms_status = None
+            if self.sms_delivery_enabled():
+                sms_status = "queued" if self.deliver_sms(message) else "failed"
+        
+            media = []
+            if self.should_send_voice():
+                voice_path = self.generate_voice(message)
+                if voice_path:
+                    media.append(voice_path)
+        
+            self.log_message(message, generation, sms_status, media)
+    
+    async def send_scheduled_message_async(self, scheduler):
+        """
+        Scheduled send for the asyncio scheduler
+        
+        Generation runs first; SMS delivery and voice synthesis then run
+        concurrently. Each stage runs in a worker thread bounded by the
+        scheduler's per-stage concurrency limits. With model.client set to
+        "http", generation runs on the event loop (see compose_message_async).
+        
+        Args:
+            scheduler: AsyncScheduler running this job
+        """
+        with span("send"):
+            if self.settings.model.client == "http":
+                async with scheduler.stage("generation"):
+                    generation = await self.compose_message_async()
+            else:
+                generation = await scheduler.run_stage("generation", self.compose_message)
+            message = self.send_message_with_payment_info(generation["message"])
+            self.announce_message(message)
+        
+            deliveries = {}
+            if self.sms_delivery_enabled():
+                deliveries["sms"] = scheduler.run_stage("sms", self.deliver_sms, message)
+            if self.should_send_voice():
+                deliveries["voice"] = self.generate_voice_async(message, scheduler)
+            results = dict(zip(deliveries, await asyncio.gather(*deliveries.values())))
+        
+            sms_status = None
+            if "sms" in results:
+                sms_status = "queued" if results["sms"] else "failed"
+            media = [results["voice"]] if results.get("voice") else []
+            self.log_message(message, generation, sms_status, media)
+    
+    async def generate_voice_async(self, message: str, scheduler) -> Optional[str]:
+        """
+        Voice note for a scheduled send
+        
+        With a shared VoiceBatcher, the note is synthesized in one bulk run
+        with every other tenant's note requested at about the same time;
+        otherwise it runs in the scheduler's "voice" stage.
+        
+        Returns:
+            Path of the audio file, or None if synthesis failed
+        """
+        if self.voice_batcher is None:
+            return await scheduler.run_stage("voice", self.generate_voice, message)
+        recipient = self.tenant_id or self.settings.persona.name
+        try:
+            result = await asyncio.wrap_future(self.voice_batcher.submit(recipient, message))
+        except Exception as e:
+            print(f"Error generating voice: {e}")
+            return None
+        if not result.ok:
+            print(f"Error generating voice: {result.error}")
+            return None
+        return result.path
+    
+    def announce_message(self, message: str) -> str:
+        """Print a newly generated message and return its timestamp"""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"\n[{timestamp}]{self._tenant_label()} New Message:")
+        print("-" * 60)
+        print(message)
+        print("-" * 60)
+        return timestamp
+    
+    def sms_delivery_enabled(self) -> bool:
+        """Check whether generated messages should be sent via SMS"""
+        return self.settings.sms.delivery_enabled
+    
+    def deliver_sms(self, message: str) -> bool:
+        """Send a message via SMS and report the result"""
+        print("\nSending via SMS...")
+        with span("sms"):
+            queued = self.send_sms_message(message)
+        if queued:
+            print("✓ SMS queued for delivery")
+            return True
+        print("✗ SMS sending failed")
+        return False
+    
+    def should_send_voice(self) -> bool:
+        """Decide whether this message also gets a voice version"""
+        return self.settings.content.use_voice and random.random() < 0.3
+    
+    def get_message_log(self) -> MessageLog:
+        """Return the shared message log"""
+        return open_message_log(self.settings.message_log.path)
+    
+    def log_message(self, message: str, generation: Optional[Dict] = None,
+                    sms_status: Optional[str] = None, media: Optional[List[str]] = None):
+        """
+        Record a sent message in the message log
+        
+        Args:
+            message: Message text as sent
+            generation: Details from compose_message (prompt, model, latency, source)
+            sms_status: "queued" or "failed", or None if SMS was not used
+            media: Paths of media sent with the message
+        """
+        generation = generation or {}
+        with span("log"):
+            self.get_message_log().record(
+                message,
+                tenant=self.tenant_id or self.settings.persona.name,
+                recipient=self.settings.sms.phone_number,
+                prompt=generation.get("prompt"),
+                model=generation.get("model"),
+                latency=generation.get("latency"),
+                source=generation.get("source"),
+                sms_status=sms_status,
+                media=media,
+            )
+    
+    def _tenant_label(self) -> str:
+        return f" ({self.tenant_id})" if self.tenant_id else ""
+    
+    def get_schedule_times(self) -> List[str]:
+        """Return the daily message times ("HH:MM") from the configuration"""
+        return list(self.settings.schedule.times)
+    
+    def create_scheduler(self) -> AsyncScheduler:
+        """Create an AsyncScheduler using the configured concurrency limits"""
+        return create_scheduler(self.settings)
+    
+    def register_schedule(self, scheduler: AsyncScheduler) -> int:
+        """
+        Make this companion's daily jobs on a scheduler match its schedule
+        
+        Jobs whose time is unchanged are left alone, so calling this again
+        after a config change only moves the messages that were edited.
+        
+        Returns:
+            Number of jobs added or moved
+        """
+        return scheduler.sync_daily(self._jobs, self.get_schedule_times(),
+                                    self.send_scheduled_message_async, scheduler)
+    
+    def reload_config(self, config: Dict, scheduler: Optional[AsyncScheduler] = None) -> List[str]:
+        """
+        Apply an edited config while running, re-registering moved messages
+        
+        Args:
+            config: New config dict
+            scheduler: Scheduler running this companion's jobs
+        
+        Returns:
+            Names of the sections that changed
+        """
+        changed = self.apply_config(config)
+        if changed:
+            print(f"Config reloaded{self._tenant_label()}: {', '.join(changed)} changed")
+        if scheduler is not None and "schedule" in changed:
+            if self.register_schedule(scheduler):
+                print(f"Scheduled messages at: {', '.join(self.get_schedule_times())}")
+        return changed
+    
+    async def run_with_watcher(self, scheduler: AsyncScheduler, interval: float = 2.0):
+        """Run a scheduler while applying edits to the config file as they are saved"""
+        watcher = ConfigWatcher(interval)
+        watcher.watch(self.config_path, lambda config, snapshot: self.reload_config(config, scheduler))
+        stop_event = asyncio.Event()
+        watch_task = asyncio.create_task(watcher.run(stop_event))
+        try:
+            await scheduler.run()
+        finally:
+            stop_event.set()
+            await watch_task
+            await close_llm_clients()
+    
     def run_scheduled(self):
         """Run the companion with scheduled messages"""
         print(f"\n{'='*60}")
-        print(f"Starting {self.config['persona']['name']} - Your AI Companion")
+        print(f"Starting {self.settings.persona.name} - Your AI Companion")
         print(f"{'='*60}\n")
         print("Scheduled to send messages throughout the day.")
+        print("Edits to the config file are applied without a restart.")
         print("Press Ctrl+C to stop.\n")
         
-        def send_scheduled_message():
-            message = self.generate_message()
-            message = self.send_message_with_payment_info(message)
-            
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            print(f"\n[{timestamp}] New Message:")
-            print("-" * 60)
-            print(message)
-            print("-" * 60)
-            
-            # Send via SMS if enabled
-            sms_config = self.config.get("sms", {})
-            if sms_config.get("enabled") and sms_config.get("send_via_sms"):
-                print("\nSending via SMS...")
-                if self.send_sms_message(message):
-                    print("✓ SMS sent successfully")
-                else:
-                    print("✗ SMS sending failed")
-            
-            # Save to log
-            with open("message_log.txt", "a") as f:
-                f.write(f"\n[{timestamp}]\n{message}\n")
-            
-            # Generate voice if enabled
-            if self.config["content_settings"]["use_voice"] and random.random() < 0.3:
-                self.generate_voice(message)
-        
-        # Schedule messages
-        schedule_config = self.config.get("schedule", {})
-        times = [
-            schedule_config.get("morning_message", "08:00"),
-            schedule_config.get("afternoon_message", "14:00"),
-            schedule_config.get("evening_message", "19:00")
-        ]
+        exporters = start_metrics(self.config.get("metrics"))
+        scheduler = self.create_scheduler()
+        self.register_schedule(scheduler)
+        print(f"Scheduled messages at: {', '.join(self.get_schedule_times())}")
         
-        for time in times:
-            schedule.every().day.at(time).do(send_scheduled_message)
-        
-        print(f"Scheduled messages at: {', '.join(times)}")
+        # Build an agent now so the first scheduled send does not wait for one
+        try:
+            self.warm_agents()
+        except Exception as e:
+            print(f"Error preparing agent: {e}")
         
         try:
-            while True:
-                schedule.run_pending()
-                import time
-                time.sleep(60)  # Check every minute
+            asyncio.run(self.run_with_watcher(scheduler))
         except KeyboardInterrupt:
+            print(f"\nFiring jitter: {scheduler.jitter.summary()}")
             print("\n\nStopping companion. Goodbye!")
+        finally:
+            stop_metrics(exporters)
+
+
+def schedule_times(settings: ConfigSnapshot) -> List[str]:
+    """Return the daily message times ("HH:MM") of a config snapshot"""
+    return list(settings.schedule.times)
+
+
+def create_scheduler(settings: ConfigSnapshot) -> AsyncScheduler:
+    """
+    Create an AsyncScheduler from the schedule settings of a config snapshot
+    
+    Config keys: "max_concurrent_jobs" (int) and "stage_limits"
+    (e.g. {"generation": 8, "sms": 10, "voice": 2}).
+    """
+    return AsyncScheduler(
+        max_concurrent_jobs=settings.schedule.max_concurrent_jobs,
+        stage_limits=dict(settings.schedule.stage_limits),
+    )
+
+
+def print_streamed(name: str, tokens: Iterator[str]) -> TimedStream:
+    """Print a streamed message as it arrives and return its timing"""
+    print(f"\n{name}: ", end="", flush=True)
+    stream = TimedStream(tokens)
+    for token in stream:
+        print(token, end="", flush=True)
+    print("\n")
+    return stream
+
+
+def serve_webhooks(router, config: Dict, port: Optional[int] = None):
+    """Run the inbound SMS webhook server with the config's "server" settings"""
+    from webhook_server import create_webhook_server
+    
+    server_config = config.get("server", {})
+    try:
+        server = create_webhook_server(router, config)
+    except ConfigError as e:
+        print(f"Error: {e}")
+        return
+    exporters = start_metrics(config.get("metrics"))
+    try:
+        server.run(host=server_config.get("host", "0.0.0.0"), port=port or server_config.get("port", 8080))
+    finally:
+        stop_metrics(exporters)
 
 
 def main():
@@ -490,21 +1382,128 @@ def main():
         action="store_true",
         help="Start interactive chat mode to test conversations"
     )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Answer inbound SMS webhooks (two-way texting) on an HTTP server"
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="With --serve: port to listen on (default: server.port or 8080)"
+    )
+    parser.add_argument(
+        "--pregenerate",
+        type=int,
+        metavar="N",
+        help="Pre-generate N check-in messages into the message cache"
+    )
+    parser.add_argument(
+        "--scan",
+        type=str,
+        metavar="FILE",
+        help="Check a text file (or - for pasted text on stdin) for scam phrases"
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="Show sent messages from the message log (filter with --recipient, --day, --tenant)"
+    )
+    parser.add_argument(
+        "--recipient",
+        type=str,
+        help="With --history: only messages to this phone number"
+    )
+    parser.add_argument(
+        "--day",
+        type=str,
+        metavar="YYYY-MM-DD",
+        help="With --history: only messages sent on this day"
+    )
+    parser.add_argument(
+        "--tenant",
+        type=str,
+        help="With --history: only messages from this tenant or persona"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=20,
+        help="With --history: maximum number of messages to show (default: 20)"
+    )
     parser.add_argument(
         "--config",
         type=str,
         default="config.json",
         help="Path to configuration file"
     )
+    parser.add_argument(
+        "--config-dir",
+        type=str,
+        help="Directory of per-resident config files to run together (use with --run or --serve)"
+    )
     
     args = parser.parse_args()
     
+    if args.config_dir:
+        if not (args.run or args.serve):
+            parser.error("--config-dir is only supported with --run or --serve")
+        from companion_runtime import CompanionRuntime
+        runtime = CompanionRuntime.from_directory(args.config_dir)
+        if not runtime.tenants:
+            print(f"No tenant configs found in {args.config_dir}")
+            return
+        # HTTP pools are per process: the first tenant's "transport" section applies
+        configure_transport(next(iter(runtime.tenants.values())).config.get("transport"))
+        if args.serve:
+            from webhook_server import ConversationRouter
+            # Server settings come from the first tenant; signatures use each tenant's own token
+            config = next(iter(runtime.tenants.values())).config
+            serve_webhooks(ConversationRouter.for_runtime(runtime), config, args.port)
+        else:
+            runtime.run_scheduled()
+        return
+    
     companion = AntiScammyCompanion(config_path=args.config)
+    configure_transport(companion.config.get("transport"))
     
     if args.setup:
         companion.interactive_setup()
     elif args.run:
         companion.run_scheduled()
+    elif args.serve:
+        from webhook_server import ConversationRouter
+        serve_webhooks(ConversationRouter.for_companion(companion), companion.config, args.port)
+    elif args.scan:
+        if args.scan == "-":
+            print("Paste the text, then press Ctrl-D:")
+            text = sys.stdin.read()
+        else:
+            with open(args.scan, encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        hits = companion.scan_message(text)
+        if not hits:
+            print("No scam phrases found.")
+        else:
+            print(f"⚠ Found {len(hits)} scam phrase(s): {format_hits(hits)}")
+            intent = companion.classify_message(text)
+            if intent is not None and intent.is_scam:
+                print(scam_reply(intent))
+    elif args.history:
+        entries = companion.get_message_log().query(
+            recipient=args.recipient, tenant=args.tenant, day=args.day, limit=args.limit
+        )
+        if not entries:
+            print("No messages found.")
+        for entry in reversed(entries):
+            print(format_entry(entry) + "\n")
+    elif args.pregenerate:
+        print(f"\nPre-generating {args.pregenerate} messages...\n")
+        stored = companion.pregenerate_messages(args.pregenerate)
+        print(f"\n✓ Cached {stored} messages")
+        cache = companion.get_message_cache()
+        if cache is not None:
+            print(f"Cache stats: {cache.stats()}")
     elif args.test_sms:
         print("\nTesting SMS Configuration...\n")
         
@@ -527,7 +1526,8 @@ def main():
                 print(f"Sending test SMS to {phone_number}...")
                 test_message = f"Hello! This is a test message from {companion.config['persona']['name']}, your AI companion. Everything is working! 💕"
                 
-                if companion.send_sms_message(test_message):
+                # Every test is a new message, even with the same text
+                if companion.send_sms_message(test_message, wait=True, slot=f"test {datetime.now().isoformat()}"):
                     print("\n✓ Test SMS sent successfully!")
                 else:
                     print("\n✗ Failed to send test SMS")
@@ -544,7 +1544,7 @@ def main():
         if sms_config.get("enabled") and sms_config.get("send_via_sms"):
             response = input("\nSend this message via SMS? (yes/no): ").strip().lower()
             if response == "yes":
-                if companion.send_sms_message(message):
+                if companion.send_sms_message(message, wait=True):
                     print("✓ SMS sent successfully")
                 else:
                     print("✗ SMS sending failed")
@@ -564,9 +1564,10 @@ def main():
         print("\nType 'quit' or 'exit' to end the conversation.\n")
         print("-"*60)
         
+        name = companion.config['persona']['name']
+        
         # Start with a greeting from the companion
-        greeting = companion.generate_message("Write a warm greeting to start a conversation.")
-        print(f"\n{companion.config['persona']['name']}: {greeting}\n")
+        print_streamed(name, companion.stream_message("Write a warm greeting to start a conversation."))
         
         while True:
             try:
@@ -576,13 +1577,19 @@ def main():
                     continue
                     
                 if user_input.lower() in ['quit', 'exit', 'bye', 'goodbye']:
-                    farewell = companion.generate_reply("I have to go now, goodbye!")
-                    print(f"\n{companion.config['persona']['name']}: {farewell}\n")
+                    print_streamed(name, companion.stream_reply("I have to go now, goodbye!"))
+                    companion.memory.save()
                     break
                 
-                # Generate reply based on what the user said
-                reply = companion.generate_reply(user_input)
-                print(f"\n{companion.config['persona']['name']}: {reply}\n")
+                # Flag scam signs first, then stream the reply as it is written
+                plan = companion.plan_reply(user_input)
+                companion.report_flags(plan)
+                stream = print_streamed(name, companion.stream_reply(user_input, plan))
+                if stream.time_to_first_token is not None:
+                    print(f"(first word after {stream.time_to_first_token:.1f}s, "
+                          f"done in {stream.total_time:.1f}s, "
+                          f"prompt: {companion.memory.last_prompt_tokens} tokens)\n")
+                companion.memory.save()
                 
             except KeyboardInterrupt:
                 print("\n\nChat ended. Goodbye!")
@@ -0,0 +1,285 @@
+"""
+Asyncio scheduler for Anti-Grammy-Scammy
+
+This module replaces the `schedule` + `time.sleep(60)` polling loop with an
+event-loop scheduler:
+- Jobs live in a timer heap and the loop sleeps exactly until the next one is due
+- Each job runs as its own task, so a slow LLM or Twilio call never delays others
+- Blocking work (generation, SMS, voice) runs in threads, with a separate
+  concurrency limit per stage
+- Firing jitter (how late each job started) is measured for every run
+"""
+
+import time
+import heapq
+import asyncio
+import inspect
+import itertools
+import contextvars
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from metrics import metrics, span
+
+
+DEFAULT_STAGE_LIMITS = {
+    "generation": 8,
+    "sms": 10,
+    "voice": 2,
+}
+
+# Due time of the job running in the current task (inherited by worker threads)
+_due_time: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("due_time", default=None)
+
+
+def scheduled_for() -> Optional[float]:
+    """
+    Return when the scheduled job running this code was due
+
+    Works from the job itself and from the worker threads of its stages, so
+    a retried or repeated run of the same job can be recognized.
+
+    Returns:
+        Unix timestamp, or None outside a scheduled job
+    """
+    return _due_time.get()
+
+
+def next_daily_run(at: str, now: Optional[float] = None) -> float:
+    """
+    Return the next timestamp at which a daily "HH:MM" (or "HH:MM:SS") time occurs
+
+    Args:
+        at: Local time of day
+        now: Reference timestamp (defaults to the current time)
+
+    Returns:
+        Unix timestamp of the next occurrence, strictly after now
+    """
+    parts = [int(p) for p in at.split(":")]
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Invalid time format (expected HH:MM): {at}")
+    hour, minute = parts[0], parts[1]
+    second = parts[2] if len(parts) == 3 else 0
+
+    reference = datetime.fromtimestamp(now if now is not None else time.time())
+    candidate = reference.replace(hour=hour, minute=minute, second=second, microsecond=0)
+    if candidate <= reference:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+class JitterStats:
+    """Track how late scheduled jobs fire compared to their due time"""
+
+    def __init__(self, max_samples: int = 1000):
+        self.samples = deque(maxlen=max_samples)
+        self.count = 0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        """Record one firing delay in seconds"""
+        self.samples.append(seconds)
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def summary(self) -> Dict:
+        """Return jitter statistics in milliseconds over the recent samples"""
+        if not self.samples:
+            return {"count": 0}
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "mean_ms": sum(ordered) / len(ordered) * 1000,
+            "p50_ms": ordered[len(ordered) // 2] * 1000,
+            "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class ScheduledJob:
+    """A job that runs every day at a fixed local time"""
+
+    def __init__(self, at: str, func: Callable, args: tuple = (), name: Optional[str] = None):
+        self.at = at
+        self.func = func
+        self.args = args
+        self.name = name or getattr(func, "__name__", "job")
+        self.next_run = next_daily_run(at)
+        self.cancelled = False
+
+    def __repr__(self):
+        return f"ScheduledJob({self.name!r} at {self.at})"
+
+
+class AsyncScheduler:
+    """Timer-heap scheduler that runs jobs concurrently on an asyncio event loop"""
+
+    def __init__(self, max_concurrent_jobs: int = 100, stage_limits: Optional[Dict[str, int]] = None):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_concurrent_jobs: Maximum number of jobs running at the same time
+            stage_limits: Maximum concurrent calls per pipeline stage
+                          (e.g. {"generation": 8, "sms": 10, "voice": 2})
+        """
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        self.stage_limits.update(stage_limits or {})
+        self.jitter = JitterStats()
+        self.jobs = []
+        self._heap = []
+        self._counter = itertools.count()
+        self._stages: Dict[str, asyncio.Semaphore] = {}
+        self._job_slots: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = set()
+
+    def every_day_at(self, at: str, func: Callable, *args, name: Optional[str] = None) -> ScheduledJob:
+        """
+        Schedule a job to run every day at a local time
+
+        Args:
+            at: Time of day in "HH:MM" format
+            func: Coroutine function or regular callable to run
+            *args: Arguments passed to func
+            name: Optional name used in log output
+
+        Returns:
+            The scheduled job
+        """
+        job = ScheduledJob(at, func, args, name)
+        self.jobs.append(job)
+        self._push(job)
+        return job
+
+    def sync_daily(self, jobs: Dict[int, ScheduledJob], times: List[str], func: Callable, *args,
+                   name: Optional[str] = None) -> int:
+        """
+        Make a group of daily jobs match a list of times
+
+        jobs maps each slot of times to its job and is updated in place. A
+        slot whose time is unchanged keeps its job; changed slots get a new
+        job and removed slots are cancelled. Runs already in progress finish
+        normally.
+
+        Args:
+            jobs: Slot index -> job, as left by the previous call ({} at first)
+            times: Daily times ("HH:MM"), one per slot
+            func: Coroutine function or regular callable to run
+            *args: Arguments passed to func
+            name: Optional name prefix used in log output ("name@HH:MM")
+
+        Returns:
+            Number of jobs added or moved
+        """
+        changed = 0
+        for slot in list(jobs):
+            if slot >= len(times) or jobs[slot].at != times[slot]:
+                self.cancel(jobs.pop(slot))
+        for slot, at in enumerate(times):
+            if slot not in jobs:
+                jobs[slot] = self.every_day_at(at, func, *args, name=f"{name}@{at}" if name else None)
+                changed += 1
+        return changed
+
+    def cancel(self, job: ScheduledJob):
+        """Stop a job from running again"""
+        job.cancelled = True
+        if job in self.jobs:
+            self.jobs.remove(job)
+
+    def _push(self, job: ScheduledJob):
+        heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run_stage(self, stage: str, func: Callable, *args):
+        """
+        Run a blocking call in a worker thread, bounded by the stage's limit
+
+        Args:
+            stage: Pipeline stage name ("generation", "sms", "voice", ...)
+            func: Blocking callable
+            *args: Arguments passed to func
+
+        Returns:
+            The callable's return value
+        """
+        semaphore = self.stage(stage)
+        with span(f"{stage}_queue"):
+            await semaphore.acquire()
+        try:
+            return await asyncio.to_thread(func, *args)
+        finally:
+            semaphore.release()
+
+    def stage(self, stage: str) -> asyncio.Semaphore:
+        """
+        Return the semaphore bounding a pipeline stage, for async work
+        that runs on the event loop (use as `async with scheduler.stage(...)`)
+        """
+        semaphore = self._stages.get(stage)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.stage_limits.get(stage, self.max_concurrent_jobs))
+            self._stages[stage] = semaphore
+        return semaphore
+
+    async def _fire(self, job: ScheduledJob, due: float):
+        async with self._job_slots:
+            _due_time.set(due)
+            delay = max(0.0, time.time() - due)
+            self.jitter.record(delay)
+            if metrics.enabled:
+                metrics.observe("schedule_jitter", delay)
+            try:
+                if inspect.iscoroutinefunction(job.func):
+                    await job.func(*job.args)
+                else:
+                    await self.run_stage("default", job.func, *job.args)
+            except Exception as e:
+                print(f"Error in scheduled job {job.name}: {e}")
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        """
+        Run jobs until stop_event is set (or forever)
+
+        Args:
+            stop_event: Optional event that stops the scheduler when set
+        """
+        self._wakeup = asyncio.Event()
+        self._job_slots = asyncio.Semaphore(self.max_concurrent_jobs)
+        stop_event = stop_event or asyncio.Event()
+
+        while not stop_event.is_set():
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - time.time())
+            else:
+                timeout = None
+
+            if timeout is None or timeout > 0:
+                # Sleep until the next job is due, a job is added, or we are stopped
+                self._wakeup.clear()
+                waiters = [asyncio.ensure_future(self._wakeup.wait()),
+                           asyncio.ensure_future(stop_event.wait())]
+                await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in waiters:
+                    waiter.cancel()
+                continue
+
+            due, _, job = heapq.heappop(self._heap)
+            if job.cancelled:
+                continue
+
+            # Reschedule before running so a slow job never shifts the next run
+            job.next_run = next_daily_run(job.at, due)
+            self._push(job)
+
+            task = asyncio.create_task(self._fire(job, due))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
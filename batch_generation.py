@@ -0,0 +1,130 @@
+"""
+Batched message generation for Anti-Grammy-Scammy
+
+This module fans many generation requests out over a bounded thread pool so
+the morning burst (every resident's 08:00 message) runs in parallel instead
+of one LLM round trip after another. Calls to the same provider share a
+token-bucket rate limiter, so a large batch stays under the provider's
+request limits no matter how many tenants or companions issue it.
+"""
+
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting requests per second"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Initialize the limiter
+
+        Args:
+            rate: Sustained requests per second
+            burst: Maximum requests allowed at once (defaults to one second's worth)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be made"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def provider_key(baseurl: Optional[str]) -> str:
+    """Return the provider name used to share rate limits (the API host)"""
+    if not baseurl:
+        return "openai"
+    return urlparse(baseurl).netloc or baseurl
+
+
+def get_rate_limiter(provider: str, requests_per_minute: Optional[float]) -> Optional[RateLimiter]:
+    """
+    Return the process-wide rate limiter for a provider
+
+    Args:
+        provider: Provider key (see provider_key)
+        requests_per_minute: Limit for the provider; None or 0 disables limiting
+
+    Returns:
+        Shared RateLimiter, or None if limiting is disabled
+    """
+    if not requests_per_minute:
+        return None
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(provider)
+        if limiter is None or limiter.rate != requests_per_minute / 60.0:
+            limiter = RateLimiter(requests_per_minute / 60.0)
+            _rate_limiters[provider] = limiter
+        return limiter
+
+
+class GenerationResult:
+    """Outcome of one item in a batch"""
+
+    def __init__(self, context: str, message: Optional[str] = None,
+                 error: Optional[Exception] = None, latency: float = 0.0):
+        self.context = context
+        self.message = message
+        self.error = error
+        self.latency = latency
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"GenerationResult({status}, latency={self.latency:.2f}s)"
+
+
+def generate_batch(generate: Callable[[str], str], contexts: List[str],
+                   max_workers: int = 8) -> List[GenerationResult]:
+    """
+    Run a generation function over many contexts concurrently
+
+    Args:
+        generate: Function that turns one context into a message (may raise).
+                  It runs on several threads at once, so it must not share
+                  an agent between calls, and it acquires the provider's
+                  rate limiter itself (see get_rate_limiter)
+        contexts: Contexts/prompts to generate for
+        max_workers: Size of the worker pool
+
+    Returns:
+        One GenerationResult per context, in the same order as contexts
+    """
+    def run_one(context: str) -> GenerationResult:
+        started = time.perf_counter()
+        try:
+            message = generate(context)
+            return GenerationResult(context, message=message, latency=time.perf_counter() - started)
+        except Exception as e:
+            return GenerationResult(context, error=e, latency=time.perf_counter() - started)
+
+    if not contexts:
+        return []
+    workers = max(1, min(max_workers, len(contexts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generate") as pool:
+        return list(pool.map(run_one, contexts))
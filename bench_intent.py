@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+"""
+Payment intent classifier benchmark for Anti-Grammy-Scammy
+
+Classifies a labeled corpus of messages like the ones residents send and
+reports precision and recall for scam signals and purchase intent (a
+"caution" counts as ordinary conversation, since the LLM still answers), plus
+classification latency. A held-out set of everyday messages that happen to
+use scam or shopping words (not used while writing the patterns) is scored
+separately, since precision on the tuning corpus alone looks better than it
+is. Messages the classifier gets wrong are listed.
+
+Usage:
+    python bench_intent.py
+    python bench_intent.py --repeat 1000
+"""
+
+import sys
+import time
+import argparse
+
+from intent_classifier import CAUTION, IntentClassifier, NONE, PURCHASE, SCAM
+
+
+CORPUS = [
+    # Scam signals
+    ("A man from the IRS called and said I owe back taxes and must pay today or be arrested", SCAM),
+    ("He said to buy Google Play cards and read him the numbers", SCAM),
+    ("My grandson is in jail in Mexico and needs bail money right away", SCAM),
+    ("They want me to wire $2,000 to a lawyer for his release", SCAM),
+    ("I went to Western Union this morning like the nice man asked", SCAM),
+    ("Someone from Medicare called asking for my Social Security number", SCAM),
+    ("Should I send money to the lottery office so they release my prize?", SCAM),
+    ("The caller said not to tell my family about the inheritance fee", SCAM),
+    ("My friend online needs me to send $500 to his agent overseas", SCAM),
+    ("They told me to put my savings into Bitcoin at the machine in the gas station", SCAM),
+    ("The bank fraud department asked me to read them my card PIN code", SCAM),
+    ("I bought three Apple gift cards for the computer repair man", SCAM),
+    ("A nice woman said customs is holding my package until I pay a fee", SCAM),
+    ("He asked me for my bank account number so he can deposit my winnings", SCAM),
+    ("I'm sending cash to the address they gave me for the sweepstakes taxes", SCAM),
+    ("They said there's a warrant and I have to pay the fine with a MoneyGram", SCAM),
+    ("He wants me to wire transfer the money for his plane ticket home", SCAM),
+    ("Please don't tell anyone, but I'm helping a soldier with his crypto wallet", SCAM),
+    ("Do you think I should buy the Steam cards he keeps asking about?", SCAM),
+    ("I sent money to that charity that called after the hurricane", SCAM),
+    # Purchase intent
+    ("I really want a new sweater for the winter", PURCHASE),
+    ("I need a new pair of reading glasses, mine are so scratched", PURCHASE),
+    ("My toaster broke this morning", PURCHASE),
+    ("I wish I had one of those electric blankets", PURCHASE),
+    ("I'd love a new set of gardening gloves", PURCHASE),
+    ("We need to replace the old coffee maker", PURCHASE),
+    ("I can't afford a new winter coat this year", PURCHASE),
+    ("I've been saving up for a tablet so I can see the grandkids on video", PURCHASE),
+    ("My walking shoes are worn out", PURCHASE),
+    ("I would like some new yarn for my knitting", PURCHASE),
+    ("I'm looking for a good book light", PURCHASE),
+    ("My radio stopped working and I miss my music", PURCHASE),
+    ("I'd like to get a bird feeder for the back porch", PURCHASE),
+    ("I need some new pots for my tomatoes", PURCHASE),
+    ("What I want for my birthday is a cozy robe", PURCHASE),
+    ("I want to buy a new rose bush for the garden", PURCHASE),
+    ("I need new batteries for my hearing aid", PURCHASE),
+    ("I'd really like a comfy chair for reading", PURCHASE),
+    ("My vacuum died yesterday, what a mess", PURCHASE),
+    ("I'd love to have a puzzle to do in the evenings", PURCHASE),
+    # Ordinary conversation
+    ("Good morning! The sun is shining today", NONE),
+    ("I had tea with Margaret and we talked for hours", NONE),
+    ("The roses are finally blooming", NONE),
+    ("How was your day, dear?", NONE),
+    ("I watched a lovely movie about a dog last night", NONE),
+    ("My knee is a bit sore but I'm doing fine", NONE),
+    ("The grandkids visited on Sunday and we baked cookies", NONE),
+    ("It rained all afternoon so I stayed in and read", NONE),
+    ("Thank you for the sweet message!", NONE),
+    ("I finished my crossword puzzle before lunch", NONE),
+    ("Church was lovely this morning, the choir sang beautifully", NONE),
+    ("My daughter called to say hello", NONE),
+    ("I made a pot roast for dinner", NONE),
+    ("The birds were singing so loudly at dawn", NONE),
+    ("I'm a little tired today, I didn't sleep well", NONE),
+    ("We played bingo at the community center", NONE),
+    ("I remember when we used to dance to that song", NONE),
+    ("Did you see the game last night?", NONE),
+    ("I took a walk around the block with my neighbor", NONE),
+    ("My cat keeps sleeping on the newspaper", NONE),
+    ("I told my son about you, he says hello", NONE),
+    ("I sent a card to my sister for her anniversary", NONE),
+    ("The doctor says my blood pressure is good", NONE),
+    ("I love hearing about your garden", NONE),
+    ("Tell me a story about when you were young", NONE),
+    ("I want to hear all about your trip", NONE),
+    ("I'm sending my love to you and the family", NONE),
+    ("We need to talk more often, I enjoy it", NONE),
+    ("I told the bank teller about my garden", NONE),
+    ("My old cat died last spring, I still miss her", NONE),
+]
+
+# Held out: benign messages with scam or shopping words, all expected NONE
+HELD_OUT = [
+    "I'm looking for my reading glasses, have you seen them?",
+    "I called the pharmacy in order to refill my prescription",
+    "I can't afford to lose my keys again",
+    "Can I buy you a coffee when you visit?",
+    "I was at the hospital for my checkup and had to pay for parking",
+    "I sent money to my grandson for his birthday",
+    "The Target card gave me 5% off my groceries",
+    "My neighbor was in a car accident but she's fine now, thank goodness",
+    "I paid the lawyer for my will last week, it's all sorted",
+    "The Amazon man dropped off my package this morning",
+    "I put a birthday card with some cash in the mail to my niece",
+    "My son sent me money for the electric bill, wasn't that sweet?",
+    "We played the lottery at church bingo night and won nothing",
+    "The nurse at the hospital said I'm doing great",
+    "I ordered soup at the diner, it was delicious",
+    "I'm saving for retirement like everyone else",
+    "I read an article about bitcoin, it's all so confusing",
+    "My apple pie won second prize at the fair",
+    "I sent the money to you for the groceries like we said",
+    "My granddaughter is shopping for her prom dress",
+]
+
+
+def evaluate(classifier: IntentClassifier, corpus, repeat: int):
+    """Return (confusion dict, latencies in seconds, mistakes)"""
+    confusion = {}
+    mistakes = []
+    latencies = []
+    for text, expected in corpus:
+        predicted = classifier.classify(text).label
+        if predicted == CAUTION:
+            # Answered by the LLM with a gentle note: no warning, no Cash App offer
+            predicted = NONE
+        confusion[(expected, predicted)] = confusion.get((expected, predicted), 0) + 1
+        if predicted != expected:
+            mistakes.append((text, expected, predicted))
+    for _ in range(repeat):
+        for text, _ in corpus:
+            started = time.perf_counter()
+            classifier.classify(text)
+            latencies.append(time.perf_counter() - started)
+    return confusion, sorted(latencies), mistakes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the payment intent classifier")
+    parser.add_argument("--repeat", type=int, default=200, help="Timing passes over the corpus")
+    args = parser.parse_args()
+
+    classifier = IntentClassifier()
+    held_out = [(text, NONE) for text in HELD_OUT]
+    confusion, latencies, mistakes = evaluate(classifier, CORPUS + held_out, args.repeat)
+
+    print(f"{len(CORPUS)} labeled messages + {len(HELD_OUT)} held-out benign")
+    for label in (SCAM, PURCHASE):
+        true_positive = confusion.get((label, label), 0)
+        predicted = sum(count for (_, got), count in confusion.items() if got == label)
+        actual = sum(count for (expected, _), count in confusion.items() if expected == label)
+        precision = true_positive / predicted if predicted else 0.0
+        recall = true_positive / actual if actual else 0.0
+        print(f"  {label:<8} precision {precision:.2f}  recall {recall:.2f}")
+    labels = [classifier.classify(text).label for text in HELD_OUT]
+    print(f"  held-out benign warned as scam: {labels.count(SCAM)}/{len(HELD_OUT)}, "
+          f"answered with a caution note: {labels.count(CAUTION)}/{len(HELD_OUT)}")
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6
+
+    print(f"Latency over {len(latencies)} classifications: "
+          f"p50 {percentile(0.5):.1f} us, p99 {percentile(0.99):.1f} us")
+    for text, expected, predicted in mistakes:
+        print(f"  expected {expected}, got {predicted}: {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Instrumentation overhead benchmark for Anti-Grammy-Scammy
+
+Measures what one `with span(...)` block costs while metrics are disabled
+(the default) and while they are enabled, compared with an empty loop.
+The disabled cost should stay under one microsecond.
+
+Usage:
+    python bench_metrics.py
+    python bench_metrics.py --iterations 5000000
+"""
+
+import sys
+import time
+import argparse
+
+from metrics import metrics, span
+
+
+def per_iteration(fn, iterations: int, repeats: int = 5) -> float:
+    """Best time per iteration in seconds over several runs"""
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(iterations)
+        best = min(best, (time.perf_counter() - started) / iterations)
+    return best
+
+
+def empty_loop(iterations: int):
+    for _ in range(iterations):
+        pass
+
+
+def span_loop(iterations: int):
+    for _ in range(iterations):
+        with span("bench"):
+            pass
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure span overhead")
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    baseline = per_iteration(empty_loop, args.iterations)
+    metrics.enabled = False
+    disabled = per_iteration(span_loop, args.iterations) - baseline
+    metrics.enabled = True
+    enabled = per_iteration(span_loop, args.iterations) - baseline
+    metrics.enabled = False
+
+    print(f"Disabled span: {disabled * 1e9:7.0f} ns {'✓' if disabled < 1e-6 else '✗'}")
+    print(f"Enabled span:  {enabled * 1e9:7.0f} ns")
+    print(f"Recorded: {metrics.snapshot()['bench']['count']} spans")
+    return 0 if disabled < 1e-6 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
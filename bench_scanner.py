@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Scam phrase scanner benchmark for Anti-Grammy-Scammy
+
+Builds a scanner over the built-in phrase library plus thousands of
+generated phrases, then scans a corpus of everyday messages with scam
+messages mixed in. Reports build time, throughput in MB/s and hits, and
+compares against a single regular expression alternation of the same
+phrases. Runs fully offline; the corpus is generated from a fixed seed.
+
+Usage:
+    python bench_scanner.py
+    python bench_scanner.py --patterns 20000 --corpus-mb 10
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+
+from scam_scanner import DEFAULT_PHRASES, ScamScanner, normalize
+
+
+EVERYDAY = [
+    "Good morning! The sun is shining and the roses are finally blooming.",
+    "I had tea with Margaret and we talked for hours about the old days.",
+    "The grandkids visited on Sunday and we baked chocolate chip cookies.",
+    "My knee is a bit sore but the doctor says my blood pressure is good.",
+    "It rained all afternoon so I stayed in and read my mystery novel.",
+    "Church was lovely this morning, the choir sang beautifully.",
+    "We played bingo at the community center and I won a potted plant!",
+    "I took a walk around the block with my neighbor and her little dog.",
+    "Did you see the game last night? What a finish that was.",
+    "I made a pot roast for dinner and there is plenty left for tomorrow.",
+]
+
+SCAM_MESSAGES = [
+    "Grandma it's me, I'm in jail and I need bail money, please don't tell mom.",
+    "You have won the Jamaica lottery! Just pay the processing fee with gift cards.",
+    "This is the IRS agent, there is an arrest warrant unless you pay the fine today.",
+    "My darling I'm stuck overseas on an oil rig and need a customs fee for my package.",
+    "Microsoft support here, your computer has a virus, install AnyDesk for remote access.",
+    "Send it through Western Union and keep this between us, okay?",
+]
+
+WORDS = ["urgent", "account", "payment", "release", "package", "verify", "deposit", "refund",
+         "transfer", "grant", "claim", "security", "federal", "customs", "agent", "ticket",
+         "voucher", "reward", "bonus", "inheritance", "officer", "courier", "wallet", "code"]
+
+
+def generated_phrases(count: int, seed: int = 7):
+    """Return count distinct three-word phrases that do not occur in everyday text"""
+    rng = random.Random(seed)
+    phrases = set()
+    while len(phrases) < count:
+        phrases.add(" ".join(rng.choice(WORDS) for _ in range(3)))
+    return sorted(phrases)
+
+
+def build_corpus(size_mb: float, scam_rate: float = 0.05, seed: int = 7) -> str:
+    """Return about size_mb of messages, scam_rate of them scams"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    parts, size = [], 0
+    while size < target:
+        pool = SCAM_MESSAGES if rng.random() < scam_rate else EVERYDAY
+        message = rng.choice(pool)
+        parts.append(message)
+        size += len(message) + 1
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scam phrase scanner")
+    parser.add_argument("--patterns", type=int, default=5000, help="Generated phrases added to the library")
+    parser.add_argument("--corpus-mb", type=float, default=5.0, help="Corpus size in MB")
+    parser.add_argument("--skip-regex", action="store_true", help="Skip the regex comparison")
+    args = parser.parse_args()
+
+    phrases = {category: list(items) for category, items in DEFAULT_PHRASES.items()}
+    phrases["generated"] = generated_phrases(args.patterns)
+    corpus = build_corpus(args.corpus_mb)
+    megabytes = len(corpus.encode()) / (1024 * 1024)
+
+    started = time.perf_counter()
+    scanner = ScamScanner(phrases)
+    build_time = time.perf_counter() - started
+    stats = scanner.stats()
+    print(f"Scanner: {stats['patterns']} phrases, {stats['states']} states, built in {build_time:.2f} s")
+
+    started = time.perf_counter()
+    hits = scanner.scan(corpus)
+    elapsed = time.perf_counter() - started
+    print(f"Aho-Corasick: {megabytes:.1f} MB in {elapsed:.2f} s ({megabytes / elapsed:.1f} MB/s), "
+          f"{len(hits)} hits")
+
+    if not args.skip_regex:
+        alternatives = sorted({normalize(p) for items in phrases.values() for p in items}, key=len, reverse=True)
+        pattern = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in alternatives) + r")\b")
+        sample = normalize(corpus[:len(corpus) // 10])
+        started = time.perf_counter()
+        regex_hits = sum(1 for _ in pattern.finditer(sample))
+        elapsed = time.perf_counter() - started
+        sample_mb = len(sample.encode()) / (1024 * 1024)
+        print(f"Regex alternation: {sample_mb:.1f} MB in {elapsed:.2f} s ({sample_mb / elapsed:.1f} MB/s), "
+              f"{regex_hits} hits (non-overlapping)")
+
+    hits_by_category = scanner.stats()["hits"]
+    print("Hits per category: " + ", ".join(f"{c} {n}" for c, n in sorted(hits_by_category.items())))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
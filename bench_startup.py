@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+CLI startup benchmark for Anti-Grammy-Scammy
+
+Measures how long `anti_scammy.py --help` and `--test-sms` take to start and
+checks that neither command imports the heavy optional dependencies
+(swarms, twilio, gtts, openai, PIL).
+
+Usage:
+    python bench_startup.py          # 5 runs per command
+    python bench_startup.py --runs 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["swarms", "twilio", "gtts", "openai", "PIL"]
+TARGET_SECONDS = 1.0
+
+
+def time_command(args, cwd, runs):
+    """Run a command several times and return the wall-clock durations"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=False)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def heavy_imports(cli_args, cwd):
+    """Return the heavy modules imported while running the CLI with cli_args"""
+    probe = (
+        "import sys, runpy\n"
+        f"sys.argv = ['anti_scammy.py'] + {cli_args!r}\n"
+        "try:\n"
+        f"    runpy.run_path({os.path.join(HERE, 'anti_scammy.py')!r}, run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('HEAVY=' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], cwd=cwd, capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=HERE))
+    for line in result.stdout.splitlines():
+        if line.startswith("HEAVY="):
+            return [m for m in line[len("HEAVY="):].split(",") if m]
+    return ["<probe failed>"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # A config with SMS disabled, so --test-sms exits without sending
+        config_path = os.path.join(tmpdir, "config.json")
+        with open(config_path, "w") as f:
+            json.dump({"persona": {"name": "Alex"}, "sms": {"enabled": False}}, f)
+
+        commands = {
+            "--help": ["--help"],
+            "--test-sms": ["--test-sms", "--config", config_path],
+        }
+
+        baseline = statistics.median(time_command([sys.executable, "-c", "pass"], tmpdir, args.runs))
+        print(f"Python interpreter startup: {baseline * 1000:.0f} ms\n")
+        print(f"{'command':12} {'median':>10} {'min':>10}   heavy imports")
+        print("-" * 60)
+
+        all_ok = True
+        for name, cli_args in commands.items():
+            durations = time_command([sys.executable, os.path.join(HERE, "anti_scammy.py")] + cli_args,
+                                     tmpdir, args.runs)
+            median = statistics.median(durations)
+            heavy = heavy_imports(cli_args, tmpdir)
+            ok = median < TARGET_SECONDS and not heavy
+            all_ok = all_ok and ok
+            print(f"{name:12} {median * 1000:>8.0f}ms {min(durations) * 1000:>8.0f}ms   "
+                  f"{', '.join(heavy) or 'none'} {'✓' if ok else '✗'}")
+
+    print(f"\nTarget: under {TARGET_SECONDS * 1000:.0f} ms with no heavy imports")
+    return 0 if all_ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
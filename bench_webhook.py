@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Inbound SMS webhook load test for Anti-Grammy-Scammy
+
+Starts the webhook server on a local port with fake companions whose LLM
+takes a fixed time to answer, then plays many residents texting at once
+through a fake Twilio webhook client. Reports throughput, reply latency
+percentiles and how many webhooks were turned away with 503. Runs fully
+offline.
+
+Usage:
+    python bench_webhook.py --conversations 100 --messages 5 --llm-latency 0.2
+    python bench_webhook.py --max-pending 16    # saturate: see 503 backpressure
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+
+from anti_scammy import AntiScammyCompanion
+from webhook_server import ConversationRouter, WebhookServer
+
+
+class SlowAgent:
+    """Stand-in LLM that takes a fixed time per reply"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def run(self, prompt):
+        time.sleep(self.latency)
+        return "That sounds lovely, tell me more!"
+
+
+def build_router(tmpdir: str, tenants: int, conversations: int, latency: float) -> ConversationRouter:
+    """One companion per resident, spread over the tenant (Twilio) numbers"""
+    router = ConversationRouter()
+    for c in range(conversations):
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, f"resident_{c}.json"),
+                                        tenant_id=f"resident_{c}")
+        companion.config["memory"] = {"path": os.path.join(tmpdir, f"resident_{c}_memory.json")}
+        companion.config["cache"]["enabled"] = False
+        companion.config["sms"]["phone_number"] = f"+1555100{c:04d}"
+        companion.apply_config()
+        companion.agent = SlowAgent(latency)
+        router.add(lambda companion=companion: companion,
+                   to_number=f"+1555000{c % tenants:04d}", from_number=f"+1555100{c:04d}")
+    return router
+
+
+async def post_webhook(session, url: str, to_number: str, from_number: str, body: str):
+    """Send one Twilio-style inbound message webhook; returns (status, seconds)"""
+    started = time.perf_counter()
+    async with session.post(url, data={"To": to_number, "From": from_number, "Body": body}) as response:
+        await response.read()
+        return response.status, time.perf_counter() - started
+
+
+async def load_test(args):
+    from aiohttp import ClientSession, TCPConnector, web
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        router = build_router(tmpdir, args.tenants, args.conversations, args.llm_latency)
+        server = WebhookServer(router, max_concurrency=args.concurrency,
+                               max_pending=args.max_pending, reply_timeout=args.reply_timeout,
+                               validate_signature=False)
+        runner = web.AppRunner(server.create_app())
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/sms"
+
+        async def conversation(session, c: int):
+            results = []
+            for m in range(args.messages):
+                results.append(await post_webhook(session, url, f"+1555000{c % args.tenants:04d}",
+                                                  f"+1555100{c:04d}", f"Message {m}"))
+            return results
+
+        started = time.perf_counter()
+        async with ClientSession(connector=TCPConnector(limit=0)) as session:
+            batches = await asyncio.gather(*(conversation(session, c) for c in range(args.conversations)))
+        elapsed = time.perf_counter() - started
+        await runner.cleanup()
+
+    results = [result for batch in batches for result in batch]
+    ok = sorted(seconds for status, seconds in results if status == 200)
+    busy = sum(1 for status, _ in results if status == 503)
+
+    def percentile(p):
+        return ok[min(len(ok) - 1, int(p * len(ok)))] * 1000 if ok else 0.0
+
+    stats = server.stats()
+    print(f"{len(results)} webhooks from {args.conversations} conversations in {elapsed:.2f} s "
+          f"({len(results) / elapsed:.0f} req/s)")
+    print(f"Answered {len(ok)}, rejected with 503: {busy}, "
+          f"answered empty after timeout: {stats['timeouts']}")
+    print(f"Client latency p50 {percentile(0.5):.0f} ms, p99 {percentile(0.99):.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the inbound SMS webhook server")
+    parser.add_argument("--conversations", type=int, default=100, help="Residents texting at once")
+    parser.add_argument("--messages", type=int, default=3, help="Messages per conversation")
+    parser.add_argument("--tenants", type=int, default=10, help="Companion numbers")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="Simulated LLM time per reply (s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Replies generated at once")
+    parser.add_argument("--max-pending", type=int, default=128, help="Pending replies before 503")
+    parser.add_argument("--reply-timeout", type=float, default=10.0, help="Webhook reply deadline (s)")
+    args = parser.parse_args()
+    asyncio.run(load_test(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
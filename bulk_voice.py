@@ -0,0 +1,296 @@
+"""
+Bulk voice synthesis for Anti-Grammy-Scammy
+
+On voice days every recipient gets a voice note. Synthesizing them one after
+another in the scheduler thread does not scale past a handful of residents,
+so this module spreads the jobs over a process pool:
+- Identical texts are synthesized once, and texts already in the voice cache
+  are not synthesized at all
+- Each worker process runs gTTS or its own pyttsx3 engine
+- Failures are collected per recipient instead of aborting the run
+- Progress and throughput are tracked while the run is in flight
+- VoiceBatcher collects the voice notes of scheduled sends that fire
+  together into one bulk run
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tts_worker import DEFAULT_SETTINGS as PYTTSX3_SETTINGS
+from voice_cache import VoiceCache, make_voice_key, open_voice_cache
+
+
+# Settings that shape each engine's audio (part of the voice cache key),
+# matching what VoiceGenerator uses so both share cached files
+ENGINE_SETTINGS = {"gtts": {"slow": False}, "pyttsx3": PYTTSX3_SETTINGS}
+ENGINE_EXTENSIONS = {"gtts": "mp3", "pyttsx3": "wav"}
+
+
+def _synthesize_in_worker(engine: str, text: str, lang: str, path: str,
+                          synthesize: Optional[Callable[[str, str], None]] = None) -> float:
+    """Synthesize one file inside a worker process and return the time it took"""
+    started = time.perf_counter()
+    if synthesize is not None:
+        synthesize(text, path)
+    elif engine == "gtts":
+        from http_transport import create_gtts
+        create_gtts(text=text, lang=lang, slow=False).save(path)
+    elif engine == "pyttsx3":
+        # One long-lived engine per worker process
+        from tts_worker import get_tts_worker
+        get_tts_worker().synthesize(text, path)
+    else:
+        raise ValueError(f"Unknown TTS engine: {engine}")
+    return time.perf_counter() - started
+
+
+class VoiceResult:
+    """Outcome of one recipient's voice note"""
+
+    def __init__(self, recipient: str, text: str, path: Optional[str] = None,
+                 error: Optional[Exception] = None, latency: float = 0.0, cached: bool = False):
+        self.recipient = recipient
+        self.text = text
+        self.path = path
+        self.error = error
+        self.latency = latency
+        self.cached = cached
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"VoiceResult({self.recipient}, {status}, latency={self.latency:.2f}s)"
+
+
+class BulkProgress:
+    """Thread-safe progress and throughput counters for a bulk run"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.cached = 0
+        self.synthesized = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, result: VoiceResult, synthesized: bool = False):
+        with self._lock:
+            self.completed += 1
+            self.synthesized += synthesized
+            if not result.ok:
+                self.failed += 1
+            elif result.cached:
+                self.cached += 1
+
+    def snapshot(self) -> Dict:
+        """Return counts, elapsed time and throughput (recipients per second)"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            return {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cached": self.cached,
+                "synthesized": self.synthesized,
+                "elapsed": elapsed,
+                "throughput": self.completed / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+def synthesize_bulk(jobs: List[Tuple[str, str]], engine: str = "gtts", lang: str = "en",
+                    workers: Optional[int] = None, cache: Optional[VoiceCache] = None,
+                    progress: Optional[BulkProgress] = None,
+                    on_progress: Optional[Callable[[BulkProgress], None]] = None,
+                    synthesize: Optional[Callable[[str, str], None]] = None,
+                    executor: Optional[Executor] = None) -> List[VoiceResult]:
+    """
+    Synthesize voice notes for many recipients across a process pool
+
+    Args:
+        jobs: (recipient, text) pairs
+        engine: "gtts" or "pyttsx3"
+        lang: Language code
+        workers: Number of worker processes (defaults to the CPU count)
+        cache: Voice cache that stores the files (default: generated_voices/cache)
+        progress: Counters to update; pass one in to watch a run from another thread
+        on_progress: Called after each recipient completes
+        synthesize: Module-level function (text, path) replacing the engine,
+            for custom engines and tests; must be picklable
+        executor: Process pool to run on (default: a new pool for this run,
+            with `workers` processes)
+
+    Returns:
+        One VoiceResult per job, in the same order as jobs
+    """
+    if cache is None:
+        cache = open_voice_cache()
+    if progress is None:
+        progress = BulkProgress(len(jobs))
+    settings = ENGINE_SETTINGS.get(engine, {})
+    extension = ENGINE_EXTENSIONS.get(engine, "mp3")
+    results: List[Optional[VoiceResult]] = [None] * len(jobs)
+
+    def finish(index: int, result: VoiceResult, synthesized: bool = False):
+        results[index] = result
+        progress.record(result, synthesized)
+        if on_progress is not None:
+            on_progress(progress)
+
+    # Group recipients by cache key, then serve cached texts and reserve the
+    # rest. Keys are reserved in sorted order so two bulk runs sharing texts
+    # cannot each hold a key the other is waiting for
+    groups: Dict[str, List[int]] = {}
+    for index, (recipient, text) in enumerate(jobs):
+        groups.setdefault(make_voice_key(text, lang, engine, settings), []).append(index)
+    pending: Dict[str, List[int]] = {}
+    try:
+        for key in sorted(groups):
+            path = cache.reserve(key)
+            if path is None:
+                pending[key] = groups[key]
+                continue
+            for index in groups[key]:
+                recipient, text = jobs[index]
+                finish(index, VoiceResult(recipient, text, path=path, cached=True))
+
+        if pending:
+            pool = executor
+            if pool is None:
+                workers = max(1, min(workers or os.cpu_count() or 1, len(pending)))
+                pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                futures = {}
+                for key, indexes in pending.items():
+                    text = jobs[indexes[0]][1]
+                    partial_path = str(cache.partial_path(key, extension))
+                    future = pool.submit(_synthesize_in_worker, engine, text, lang, partial_path, synthesize)
+                    futures[future] = (key, indexes)
+
+                for future in as_completed(futures):
+                    key, indexes = futures[future]
+                    try:
+                        latency = future.result()
+                        outcome = {"path": cache.commit(key, extension), "latency": latency}
+                    except Exception as e:
+                        outcome = {"error": e}
+                    cache.release(key, extension)
+                    del pending[key]
+                    for position, index in enumerate(indexes):
+                        recipient, text = jobs[index]
+                        # Recipients sharing a text share one synthesis
+                        finish(index, VoiceResult(recipient, text, **outcome),
+                               synthesized=position == 0 and "path" in outcome)
+            finally:
+                if pool is not executor:
+                    pool.shutdown()
+    finally:
+        # Keys whose synthesis never finished (the run was interrupted)
+        for key in pending:
+            cache.release(key, extension)
+
+    return results
+
+
+class VoiceBatcher:
+    """
+    Batch voice notes requested around the same time into bulk runs
+
+    On a voice day every tenant's scheduled send asks for a voice note within
+    moments of the others. Each submit() waits up to `window` seconds for
+    more requests to join it, and the batch then goes through
+    synthesize_bulk on one long-lived process pool.
+    """
+
+    def __init__(self, workers: Optional[int] = None, window: float = 0.5, max_batch: int = 256,
+                 engine: str = "gtts", lang: str = "en", cache: Optional[VoiceCache] = None,
+                 synthesize: Optional[Callable[[str, str], None]] = None):
+        """
+        Initialize the batcher
+
+        Args:
+            workers: Worker processes (defaults to the CPU count)
+            window: Seconds a request waits for others to join its batch
+            max_batch: Requests that start a batch at once
+            engine: "gtts" or "pyttsx3"
+            lang: Language code
+            cache: Voice cache that stores the files (default: generated_voices/cache)
+            synthesize: Replacement engine, as for synthesize_bulk
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.window = window
+        self.max_batch = max_batch
+        self.engine = engine
+        self.lang = lang
+        self.cache = cache
+        self.synthesize = synthesize
+        self.batches = 0
+        self.progress: Optional[BulkProgress] = None
+        self._jobs: List[Tuple[str, str, Future]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def submit(self, recipient: str, text: str) -> Future:
+        """
+        Queue one voice note
+
+        Returns:
+            Future resolving to the recipient's VoiceResult
+        """
+        future: Future = Future()
+        with self._lock:
+            self._jobs.append((recipient, text, future))
+            if len(self._jobs) >= self.max_batch:
+                jobs, self._jobs = self._jobs, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                threading.Thread(target=self._run, args=(jobs,), name="voice-batch", daemon=True).start()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        """Synthesize every queued request now"""
+        with self._lock:
+            jobs, self._jobs = self._jobs, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if jobs:
+            self._run(jobs)
+
+    def _run(self, jobs: List[Tuple[str, str, Future]]):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            pool = self._pool
+            self.batches += 1
+            self.progress = progress = BulkProgress(len(jobs))
+        try:
+            results = synthesize_bulk([(recipient, text) for recipient, text, _ in jobs],
+                                      engine=self.engine, lang=self.lang, cache=self.cache,
+                                      progress=progress, synthesize=self.synthesize, executor=pool)
+        except Exception as e:
+            for _, _, future in jobs:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(jobs, results):
+            future.set_result(result)
+
+    def close(self):
+        """Synthesize anything still queued and stop the worker processes"""
+        self.flush()
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
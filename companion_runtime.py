@@ -0,0 +1,305 @@
+"""
+Multi-tenant companion runtime for Anti-Grammy-Scammy
+
+This module runs many companions (one per resident) from a single process.
+Each tenant is described by its own JSON config file, in the same format as
+config.json, and all of them are loaded from one directory:
+
+    tenants/
+    ├── grandma_rose.json
+    ├── grandpa_joe.json
+    └── ...
+
+Tenants share the expensive, stateless pieces (the Swarms import and Twilio
+clients for identical credentials) while each keeps its own persona, agent
+and schedule. Companions are only built the first time a tenant is used, so
+startup cost grows with the number of config files rather than with the
+number of agents.
+"""
+
+import os
+import json
+import asyncio
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from anti_scammy import AntiScammyCompanion, schedule_times, create_scheduler
+from async_scheduler import AsyncScheduler
+from config_model import ConfigError, ConfigSnapshot, ConfigWatcher, parse_config
+from batch_generation import GenerationResult, generate_batch
+from bulk_voice import BulkProgress, VoiceBatcher, VoiceResult, synthesize_bulk
+from llm_client import close_llm_clients
+from metrics import start_metrics, stop_metrics
+
+
+class Tenant:
+    """A single companion configuration managed by the runtime"""
+
+    def __init__(self, tenant_id: str, config_path: str, config: Dict,
+                 settings: Optional[ConfigSnapshot] = None):
+        self.tenant_id = tenant_id
+        self.config_path = config_path
+        self.config = config
+        self.settings = settings or parse_config(config)
+        self.companion: Optional[AntiScammyCompanion] = None
+        # Slot index -> scheduled job (see AsyncScheduler.sync_daily)
+        self.jobs: Dict = {}
+
+
+class CompanionRuntime:
+    """Serve many companion personas from one process"""
+
+    def __init__(self):
+        self.tenants: Dict[str, Tenant] = {}
+        self._sms_senders: Dict[Tuple, object] = {}
+        # Synthesizes the voice notes of sends that fire together (see run_with_watcher)
+        self.voice_batcher: Optional[VoiceBatcher] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, config_dir: str) -> "CompanionRuntime":
+        """
+        Create a runtime from a directory of tenant config files
+
+        Args:
+            config_dir: Directory containing one *.json config per tenant.
+                       The file name (without extension) is the tenant ID.
+
+        Returns:
+            Runtime with every tenant registered
+        """
+        runtime = cls()
+        for path in sorted(Path(config_dir).glob("*.json")):
+            try:
+                runtime.add_tenant(path.stem, str(path))
+            except (OSError, json.JSONDecodeError, ConfigError) as e:
+                print(f"Skipping tenant config {path}: {e}")
+        return runtime
+
+    def add_tenant(self, tenant_id: str, config_path: str, config: Optional[Dict] = None) -> Tenant:
+        """
+        Register a tenant
+
+        Args:
+            tenant_id: Unique identifier for the tenant
+            config_path: Path of the tenant's config file
+            config: Already-loaded config (read from config_path if omitted)
+
+        Returns:
+            The registered tenant
+
+        Raises:
+            ConfigError: If the config is invalid
+        """
+        if tenant_id in self.tenants:
+            raise ValueError(f"Duplicate tenant ID: {tenant_id}")
+        if config is None:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        tenant = Tenant(tenant_id, config_path, config)
+        self.tenants[tenant_id] = tenant
+        return tenant
+
+    def get(self, tenant_id: str) -> AntiScammyCompanion:
+        """Return the companion for a tenant, building it on first use"""
+        tenant = self.tenants[tenant_id]
+        with self._lock:
+            if tenant.companion is None:
+                tenant.companion = AntiScammyCompanion(
+                    config_path=tenant.config_path,
+                    tenant_id=tenant.tenant_id,
+                    config=tenant.config,
+                    sms_sender=self.get_sms_sender(tenant.config),
+                    voice_batcher=self.voice_batcher,
+                )
+        return tenant.companion
+
+    def get_sms_sender(self, config: Dict):
+        """
+        Return an SMSSender shared by every tenant with the same Twilio credentials
+
+        Args:
+            config: Tenant configuration
+
+        Returns:
+            Shared SMSSender, or None if the SMS module is unavailable
+        """
+        api_keys = config.get("api_keys", {})
+        credentials = (
+            api_keys.get("twilio_account_sid") or os.getenv("TWILIO_ACCOUNT_SID"),
+            api_keys.get("twilio_auth_token") or os.getenv("TWILIO_AUTH_TOKEN"),
+            api_keys.get("twilio_phone_number") or os.getenv("TWILIO_PHONE_NUMBER"),
+        )
+        if credentials not in self._sms_senders:
+            try:
+                from sms_sender import SMSSender
+                self._sms_senders[credentials] = SMSSender(*credentials)
+            except ImportError:
+                print("SMS sender module not available")
+                self._sms_senders[credentials] = None
+        return self._sms_senders[credentials]
+
+    def tenant_ids(self) -> List[str]:
+        """Return the IDs of all registered tenants"""
+        return list(self.tenants)
+
+    def generate_messages(self, tenant_ids: Optional[List[str]] = None,
+                          max_workers: int = 16) -> List[GenerationResult]:
+        """
+        Generate one check-in message per tenant concurrently
+
+        Args:
+            tenant_ids: Tenants to generate for (defaults to all)
+            max_workers: Worker pool size shared by all tenants
+
+        Returns:
+            One GenerationResult per tenant, in the order of tenant_ids.
+            Each result's context is the tenant ID.
+        """
+        if tenant_ids is None:
+            tenant_ids = self.tenant_ids()
+
+        def generate(tenant_id: str) -> str:
+            companion = self.get(tenant_id)
+            return companion.run_prompt(companion.choose_prompt())
+
+        return generate_batch(generate, tenant_ids, max_workers=max_workers)
+
+    def synthesize_voices(self, messages: Dict[str, str], workers: Optional[int] = None,
+                          engine: str = "gtts", progress: Optional[BulkProgress] = None) -> List[VoiceResult]:
+        """
+        Synthesize a voice note per tenant across a process pool
+
+        Args:
+            messages: Tenant ID -> message text
+            workers: Worker processes (defaults to the CPU count)
+            engine: "gtts" or "pyttsx3"
+            progress: Counters to watch the run from another thread
+
+        Returns:
+            One VoiceResult per tenant; each result's recipient is the tenant ID
+        """
+        return synthesize_bulk(list(messages.items()), engine=engine, workers=workers,
+                               progress=progress)
+
+    async def send_scheduled_message(self, tenant_id: str, scheduler: AsyncScheduler):
+        """Run one scheduled send for a tenant"""
+        try:
+            companion = await scheduler.run_stage("setup", self.get, tenant_id)
+            await companion.send_scheduled_message_async(scheduler)
+        except Exception as e:
+            # One failing tenant must not stop the others
+            print(f"Error sending scheduled message for {tenant_id}: {e}")
+
+    def register_schedule(self, scheduler: AsyncScheduler) -> int:
+        """
+        Register every tenant's daily messages on a scheduler
+
+        Args:
+            scheduler: Scheduler to add the jobs to
+
+        Returns:
+            Number of jobs registered
+        """
+        count = 0
+        for tenant_id in self.tenants:
+            count += self.register_tenant_schedule(tenant_id, scheduler)
+        return count
+
+    def register_tenant_schedule(self, tenant_id: str, scheduler: AsyncScheduler) -> int:
+        """Make a tenant's jobs match its schedule; returns the number added or moved"""
+        tenant = self.tenants[tenant_id]
+        return scheduler.sync_daily(tenant.jobs, schedule_times(tenant.settings),
+                                    self.send_scheduled_message, tenant_id, scheduler, name=tenant_id)
+
+    def reload_tenant(self, tenant_id: str, config: Dict, settings: ConfigSnapshot,
+                      scheduler: Optional[AsyncScheduler] = None) -> List[str]:
+        """
+        Apply an edited tenant config while running
+
+        Args:
+            tenant_id: Tenant whose config file changed
+            config: New config dict
+            settings: Its validated snapshot
+            scheduler: Scheduler running the tenant's jobs (moved messages are
+                       re-registered on it)
+
+        Returns:
+            Names of the sections that changed
+        """
+        tenant = self.tenants[tenant_id]
+        changed = settings.changed_sections(tenant.settings)
+        tenant.config, tenant.settings = config, settings
+        if tenant.companion is not None:
+            tenant.companion.apply_config(config)
+        if changed:
+            print(f"Config reloaded ({tenant_id}): {', '.join(changed)} changed")
+        if scheduler is not None and "schedule" in changed:
+            self.register_tenant_schedule(tenant_id, scheduler)
+        return changed
+
+    async def run_with_watcher(self, scheduler: AsyncScheduler, interval: float = 2.0):
+        """
+        Run a scheduler while applying edits to tenant config files as they are saved
+
+        Voice notes of scheduled sends are synthesized in bulk on a process
+        pool with as many workers as the scheduler's "voice" stage limit.
+        """
+        if self.voice_batcher is None:
+            self.set_voice_batcher(VoiceBatcher(workers=scheduler.stage_limits.get("voice")))
+        batcher = self.voice_batcher
+        watcher = ConfigWatcher(interval)
+        for tenant_id, tenant in self.tenants.items():
+            watcher.watch(tenant.config_path,
+                          lambda config, settings, tenant_id=tenant_id:
+                          self.reload_tenant(tenant_id, config, settings, scheduler))
+        stop_event = asyncio.Event()
+        watch_task = asyncio.create_task(watcher.run(stop_event))
+        try:
+            await scheduler.run()
+        finally:
+            stop_event.set()
+            await watch_task
+            await close_llm_clients()
+            await asyncio.to_thread(batcher.close)
+
+    def set_voice_batcher(self, batcher: Optional[VoiceBatcher]):
+        """Share a VoiceBatcher between all tenants' scheduled sends (None to stop batching)"""
+        self.voice_batcher = batcher
+        with self._lock:
+            for tenant in self.tenants.values():
+                if tenant.companion is not None:
+                    tenant.companion.voice_batcher = batcher
+
+    def create_scheduler(self, config: Optional[Dict] = None) -> AsyncScheduler:
+        """
+        Create the shared scheduler for all tenants
+
+        Args:
+            config: Config whose "schedule" section holds the concurrency
+                    limits (defaults to the first tenant's config)
+        """
+        if config is None:
+            config = next(iter(self.tenants.values())).config if self.tenants else {}
+        return create_scheduler(parse_config(config))
+
+    def run_scheduled(self):
+        """Run scheduled messages for every tenant"""
+        print(f"\n{'='*60}")
+        print(f"Starting {len(self.tenants)} AI companions")
+        print(f"{'='*60}\n")
+        print("Press Ctrl+C to stop.\n")
+
+        scheduler = self.create_scheduler()
+        exporters = start_metrics(next(iter(self.tenants.values())).config.get("metrics")) if self.tenants else {}
+        count = self.register_schedule(scheduler)
+        print(f"Scheduled {count} messages per day across {len(self.tenants)} tenants")
+
+        try:
+            asyncio.run(self.run_with_watcher(scheduler))
+        except KeyboardInterrupt:
+            print(f"\nFiring jitter: {scheduler.jitter.summary()}")
+            print("\n\nStopping companions. Goodbye!")
+        finally:
+            stop_metrics(exporters)
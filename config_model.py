@@ -0,0 +1,414 @@
+"""
+Typed configuration for Anti-Grammy-Scammy
+
+config.json is validated once, when it is loaded, into an immutable
+ConfigSnapshot of typed sections (persona, schedule, content settings, SMS,
+payment, model, offline generation, and the cache, message log, memory,
+intent classifier and scam scanner stores). Code on the send path reads
+attributes of the snapshot instead of walking nested dicts, and a bad value
+is reported when the file is loaded rather than in the middle of a
+scheduled send.
+
+ConfigWatcher polls config files for changes and hands each valid new
+snapshot to a callback, so schedule times or persona traits can be edited
+while the companion runs. Edits that fail validation are reported and the
+previous snapshot stays in effect.
+"""
+
+import os
+import re
+import json
+import asyncio
+import hashlib
+from dataclasses import asdict, dataclass, field, fields
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+
+SCHEDULE_KEYS = ("morning_message", "afternoon_message", "evening_message")
+DEFAULT_TIMES = ("08:00", "14:00", "19:00")
+
+_TIME_PATTERN = re.compile(r"^([01]?\d|2[0-3]):[0-5]\d(:[0-5]\d)?$")
+
+
+class ConfigError(ValueError):
+    """Raised when a config fails validation; .errors lists every problem"""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("Invalid configuration: " + "; ".join(errors))
+
+
+@dataclass(frozen=True)
+class PersonaConfig:
+    name: str = "Alex"
+    age: int = 65
+    gender: str = "neutral"
+    personality: str = "kind and caring"
+    interests: str = "various hobbies"
+    backstory: str = "living a good life"
+
+
+@dataclass(frozen=True)
+class ScheduleConfig:
+    times: Tuple[str, ...] = DEFAULT_TIMES
+    random_messages: bool = True
+    messages_per_day: int = 3
+    max_concurrent_jobs: int = 100
+    stage_limits: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+
+
+@dataclass(frozen=True)
+class ContentSettings:
+    use_images: bool = True
+    use_voice: bool = True
+    image_frequency: str = "daily"
+    voice_frequency: str = "weekly"
+    voice_cache_mb: float = 200
+
+
+@dataclass(frozen=True)
+class SmsConfig:
+    enabled: bool = False
+    phone_number: str = ""
+    send_via_sms: bool = False
+    outbox_path: str = "sms_outbox.db"
+    max_attempts: int = 8
+    send_timeout: float = 60.0
+
+    @property
+    def delivery_enabled(self) -> bool:
+        """Whether generated messages are sent as SMS"""
+        return self.enabled and self.send_via_sms
+
+
+@dataclass(frozen=True)
+class PaymentConfig:
+    enabled: bool = False
+    cashapp_tag: str = ""
+
+    @property
+    def active(self) -> bool:
+        """Whether the Cash App offer is part of the persona"""
+        return self.enabled and bool(self.cashapp_tag)
+
+
+@dataclass(frozen=True)
+class ModelConfig:
+    name: str = "gpt-4o-mini"
+    baseurl: str = ""
+    max_workers: int = 8
+    requests_per_minute: Optional[float] = None
+    # Warm agents kept per persona (defaults to max_workers)
+    agent_pool_size: Optional[int] = None
+    # "agent" (Swarms) or "http" (llm_client.py) for scheduled sends
+    client: str = "agent"
+    timeout: float = 30.0
+    fallback_model: str = ""
+
+    @property
+    def pool_size(self) -> int:
+        """Maximum number of agents pooled for this model"""
+        return self.agent_pool_size or self.max_workers
+
+
+@dataclass(frozen=True)
+class OfflineConfig:
+    # "fallback": write check-ins offline when the model is slow or down,
+    # "always": never call the model for check-ins, "off": always wait for it
+    mode: str = "fallback"
+    latency_budget: float = 10.0
+    cooldown: float = 300.0
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    enabled: bool = False
+    path: str = "message_cache.db"
+    ttl_hours: float = 72.0
+    max_entries: int = 1000
+
+
+@dataclass(frozen=True)
+class MessageLogConfig:
+    path: str = "message_log.db"
+
+
+@dataclass(frozen=True)
+class MemoryConfig:
+    max_tokens: int = 1500
+    summary_tokens: int = 300
+    # Defaults to personas/<tenant or persona name>_memory.json
+    path: str = ""
+
+
+@dataclass(frozen=True)
+class IntentConfig:
+    enabled: bool = True
+
+
+@dataclass(frozen=True)
+class ScannerConfig:
+    enabled: bool = True
+    # JSON file of extra phrases; "" uses the built-in library only
+    phrases_path: str = ""
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Validated, immutable view of one version of a config"""
+
+    persona: PersonaConfig
+    schedule: ScheduleConfig
+    content: ContentSettings
+    sms: SmsConfig
+    payment: PaymentConfig
+    model: ModelConfig
+    offline: OfflineConfig
+    cache: CacheConfig
+    message_log: MessageLogConfig
+    memory: MemoryConfig
+    intent: IntentConfig
+    scanner: ScannerConfig
+    # Hash of the persona and payment sections: the inputs of the system prompt
+    persona_key: str
+
+    def changed_sections(self, previous: Optional["ConfigSnapshot"]) -> List[str]:
+        """Return the names of the sections that differ from a previous snapshot"""
+        names = [f.name for f in fields(self) if f.name != "persona_key"]
+        if previous is None:
+            return names
+        return [name for name in names if getattr(self, name) != getattr(previous, name)]
+
+
+class _Section:
+    """Reads typed values from one config section, collecting errors"""
+
+    def __init__(self, data: Dict, name: str, errors: List[str]):
+        self.name = name
+        self.errors = errors
+        self.values = data.get(name, {})
+        if self.values is None:
+            self.values = {}
+        if not isinstance(self.values, dict):
+            errors.append(f"{name}: expected an object")
+            self.values = {}
+
+    def get(self, key: str, kind, default, check: Optional[Callable] = None, message: str = ""):
+        value = self.values.get(key)
+        if value is None:
+            return default
+        if kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            self.errors.append(f"{self.name}.{key}: expected {kind.__name__}, got {value!r}")
+            return default
+        if check is not None and not check(value):
+            self.errors.append(f"{self.name}.{key}: {message or 'invalid value'} ({value!r})")
+            return default
+        return value
+
+
+def _positive(value) -> bool:
+    return value > 0
+
+
+def parse_config(data: Dict) -> ConfigSnapshot:
+    """
+    Validate a config dict and build its snapshot
+
+    Unknown keys and sections are allowed (other modules read them);
+    missing keys take their defaults.
+
+    Args:
+        data: Config as loaded from JSON
+
+    Returns:
+        The validated snapshot
+
+    Raises:
+        ConfigError: Listing every invalid value
+    """
+    if not isinstance(data, dict):
+        raise ConfigError(["config: expected an object"])
+    errors: List[str] = []
+
+    section = _Section(data, "persona", errors)
+    persona = PersonaConfig(
+        name=section.get("name", str, "Alex", bool, "must not be empty"),
+        age=section.get("age", int, 65, _positive, "must be positive"),
+        gender=section.get("gender", str, "neutral"),
+        personality=section.get("personality", str, "kind and caring"),
+        interests=section.get("interests", str, "various hobbies"),
+        backstory=section.get("backstory", str, "living a good life"),
+    )
+
+    section = _Section(data, "schedule", errors)
+    times = tuple(
+        section.get(key, str, default, _TIME_PATTERN.match, "expected HH:MM")
+        for key, default in zip(SCHEDULE_KEYS, DEFAULT_TIMES)
+    )
+    stage_limits = section.get("stage_limits", dict, {})
+    for stage, limit in list(stage_limits.items()):
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit <= 0:
+            errors.append(f"schedule.stage_limits.{stage}: expected a positive int, got {limit!r}")
+            stage_limits = {}
+            break
+    schedule = ScheduleConfig(
+        times=times,
+        random_messages=section.get("random_messages", bool, True),
+        messages_per_day=section.get("messages_per_day", int, 3, lambda v: v >= 0, "must not be negative"),
+        max_concurrent_jobs=section.get("max_concurrent_jobs", int, 100, _positive, "must be positive"),
+        stage_limits=MappingProxyType(dict(stage_limits)),
+    )
+
+    section = _Section(data, "content_settings", errors)
+    content = ContentSettings(
+        use_images=section.get("use_images", bool, True),
+        use_voice=section.get("use_voice", bool, True),
+        image_frequency=section.get("image_frequency", str, "daily"),
+        voice_frequency=section.get("voice_frequency", str, "weekly"),
+        voice_cache_mb=section.get("voice_cache_mb", float, 200.0, _positive, "must be positive"),
+    )
+
+    section = _Section(data, "sms", errors)
+    sms = SmsConfig(
+        enabled=section.get("enabled", bool, False),
+        phone_number=section.get("phone_number", str, ""),
+        send_via_sms=section.get("send_via_sms", bool, False),
+        outbox_path=section.get("outbox_path", str, "sms_outbox.db", bool, "must not be empty"),
+        max_attempts=section.get("max_attempts", int, 8, _positive, "must be positive"),
+        send_timeout=section.get("send_timeout", float, 60.0, _positive, "must be positive"),
+    )
+
+    section = _Section(data, "payment", errors)
+    payment = PaymentConfig(
+        enabled=section.get("enabled", bool, False),
+        cashapp_tag=section.get("cashapp_tag", str, ""),
+    )
+
+    section = _Section(data, "model", errors)
+    model = ModelConfig(
+        name=section.get("name", str, "gpt-4o-mini", bool, "must not be empty"),
+        baseurl=section.get("baseurl", str, "") or "",
+        max_workers=section.get("max_workers", int, 8, _positive, "must be positive"),
+        requests_per_minute=section.get("requests_per_minute", float, None, _positive, "must be positive"),
+        agent_pool_size=section.get("agent_pool_size", int, None, _positive, "must be positive"),
+        client=section.get("client", str, "agent", lambda v: v in ("agent", "http"), 'expected "agent" or "http"'),
+        timeout=section.get("timeout", float, 30.0, _positive, "must be positive"),
+        fallback_model=section.get("fallback_model", str, ""),
+    )
+
+    section = _Section(data, "offline", errors)
+    offline = OfflineConfig(
+        mode=section.get("mode", str, "fallback", lambda v: v in ("fallback", "always", "off"),
+                         'expected "fallback", "always" or "off"'),
+        latency_budget=section.get("latency_budget", float, 10.0, _positive, "must be positive"),
+        cooldown=section.get("cooldown", float, 300.0, lambda v: v >= 0, "must not be negative"),
+    )
+
+    section = _Section(data, "cache", errors)
+    cache = CacheConfig(
+        enabled=section.get("enabled", bool, False),
+        path=section.get("path", str, "message_cache.db", bool, "must not be empty"),
+        ttl_hours=section.get("ttl_hours", float, 72.0, _positive, "must be positive"),
+        max_entries=section.get("max_entries", int, 1000, _positive, "must be positive"),
+    )
+
+    section = _Section(data, "message_log", errors)
+    message_log = MessageLogConfig(
+        path=section.get("path", str, "message_log.db", bool, "must not be empty"),
+    )
+
+    section = _Section(data, "memory", errors)
+    memory = MemoryConfig(
+        max_tokens=section.get("max_tokens", int, 1500, _positive, "must be positive"),
+        summary_tokens=section.get("summary_tokens", int, 300, _positive, "must be positive"),
+        path=section.get("path", str, ""),
+    )
+
+    section = _Section(data, "intent", errors)
+    intent = IntentConfig(enabled=section.get("enabled", bool, True))
+
+    section = _Section(data, "scanner", errors)
+    scanner = ScannerConfig(
+        enabled=section.get("enabled", bool, True),
+        phrases_path=section.get("phrases_path", str, "") or "",
+    )
+
+    if errors:
+        raise ConfigError(errors)
+
+    persona_json = json.dumps([asdict(persona), asdict(payment)], sort_keys=True)
+    return ConfigSnapshot(
+        persona=persona, schedule=schedule, content=content, sms=sms, payment=payment, model=model,
+        offline=offline, cache=cache, message_log=message_log, memory=memory, intent=intent,
+        scanner=scanner,
+        persona_key=hashlib.sha256(persona_json.encode("utf-8")).hexdigest(),
+    )
+
+
+class ConfigWatcher:
+    """Poll config files and pass each valid new version to a callback"""
+
+    def __init__(self, interval: float = 2.0):
+        """
+        Initialize the watcher
+
+        Args:
+            interval: Seconds between checks
+        """
+        self.interval = interval
+        self.reloads = 0
+        self._watched: Dict[str, List] = {}
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def watch(self, path: str, on_change: Callable[[Dict, ConfigSnapshot], None]):
+        """
+        Watch a config file
+
+        Args:
+            path: Config file
+            on_change: Called with (config dict, snapshot) after each valid change
+        """
+        self._watched[os.path.abspath(path)] = [self._signature(path), on_change]
+
+    def check(self) -> int:
+        """Reload changed files now; returns how many were applied"""
+        applied = 0
+        for path, entry in self._watched.items():
+            signature = self._signature(path)
+            if signature is None or signature == entry[0]:
+                continue
+            entry[0] = signature
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                snapshot = parse_config(data)
+            except (OSError, json.JSONDecodeError, ConfigError) as e:
+                print(f"Ignoring config change in {path}: {e}")
+                continue
+            try:
+                entry[1](data, snapshot)
+            except Exception as e:
+                print(f"Error applying config change in {path}: {e}")
+                continue
+            self.reloads += 1
+            applied += 1
+        return applied
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        """Check for changes every interval until stop_event is set (or forever)"""
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.interval)
+            except asyncio.TimeoutError:
+                self.check()
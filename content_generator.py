@@ -8,10 +8,87 @@ This module provides image generation capabilities using:
 """
 
 import os
-from typing import Optional
-from datetime import datetime
+import uuid
+import base64
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
+from http_transport import create_gtts, get_http_session, get_openai_client, get_settings
+from image_library import ImageLibrary, make_image_key
+from metrics import span
+from media_storage import MediaStorage, open_media_storage
+from tts_worker import TTSWorker, get_tts_worker
+from voice_cache import VoiceCache, open_voice_cache
+
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def download_file(url: str, path: Path):
+    """Stream a URL to a file in chunks, without holding the body in memory"""
+    with span("image_download"):
+        with get_http_session().get(url, stream=True, timeout=get_settings()["timeout"]) as response:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+
+
+def write_base64_file(data: str, path: Path):
+    """Decode base64 data to a file in chunks"""
+    # Chunk size must be a multiple of 4 so each piece decodes on its own
+    step = DOWNLOAD_CHUNK_SIZE // 3 * 4
+    with open(path, "wb") as f:
+        for start in range(0, len(data), step):
+            f.write(base64.b64decode(data[start:start + step]))
+
+
+def convert_image(source: Path, destination: Path, resize_to: Optional[Tuple[int, int]] = None,
+                  image_format: Optional[str] = None) -> Path:
+    """
+    Decode an image file, optionally resize it, and save it in another format
+    
+    The output is written to a temporary file next to the destination and
+    renamed into place, so readers never see a partial image.
+    
+    Args:
+        source: Image file to read
+        destination: Output path (suffix replaced to match image_format)
+        resize_to: Optional (width, height)
+        image_format: Optional PIL format name such as "JPEG" or "WEBP"
+    
+    Returns:
+        Path of the written file
+    """
+    from PIL import Image
+    
+    with span("image_convert"), Image.open(source) as img:
+        if resize_to:
+            img = img.resize(resize_to)
+        if image_format:
+            destination = destination.with_suffix("." + image_format.lower().replace("jpeg", "jpg"))
+            if image_format.upper() == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+        temporary = destination.with_name(f"{destination.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            img.save(temporary, format=image_format or "PNG")
+            os.replace(temporary, destination)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+    return destination
+
+
+SCENE_PROMPTS = {
+    "garden": "Beautiful flourishing garden with colorful flowers and vegetables",
+    "sunset": "Peaceful sunset over a quiet neighborhood",
+    "coffee": "Warm cup of coffee on a wooden table with morning light",
+    "book": "Cozy reading nook with comfortable chair and open book",
+    "cooking": "Homemade meal being prepared in a bright kitchen",
+    "nature": "Serene nature scene with trees and wildlife"
+}
+
 
 class ImageGenerator:
     """Handle image generation for the AI companion
@@ -20,54 +97,57 @@ class ImageGenerator:
     or third-party endpoints) via constructor args or environment variables:
     - `model_name` or `MODEL_NAME` env var (default: "dall-e-2")
     - `baseurl` or `MODEL_BASE_URL` / `OPENAI_API_BASE` env var
+
+    Scene images are served from an ImageLibrary when its reuse policy allows
+    (pass `reuse_images=False` to always generate new ones).
     """
 
-    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None, baseurl: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, model_name: Optional[str] = None, baseurl: Optional[str] = None,
+                 size: str = "512x512", response_format: str = "url", library: Optional[ImageLibrary] = None,
+                 reuse_images: bool = True, storage: Optional[MediaStorage] = None):
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         # Allow overriding the image model (useful for custom deployments)
         self.model_name = model_name or os.getenv("MODEL_NAME") or "dall-e-2"
         # Allow specifying a custom OpenAI-compatible base URL
         self.baseurl = baseurl or os.getenv("MODEL_BASE_URL") or os.getenv("OPENAI_API_BASE") or ""
-
-        # If a custom base URL is provided, set the env var many SDKs respect
-        if self.baseurl:
-            os.environ["OPENAI_API_BASE"] = self.baseurl
+        self.size = size
+        # "url" downloads the image; "b64_json" returns it inline in the API response
+        self.response_format = response_format
 
         self.output_dir = Path("generated_images")
         self.output_dir.mkdir(exist_ok=True)
+        # Files go to date/persona shards indexed by a manifest
+        self.storage = storage or open_media_storage(str(self.output_dir))
+        
+        # Scene images are reused from the library according to its policy
+        if library is None and reuse_images:
+            library = ImageLibrary(str(self.output_dir / "library.db"))
+        if library is not None and library.storage is None:
+            # The storage owns the files: eviction and retention stay in step
+            library.attach_storage(self.storage)
+        self.library = library
     
-    def generate_dalle_image(self, prompt: str, persona_name: str) -> Optional[str]:
-        """Generate image using DALL-E (requires OpenAI API)"""
+    def generate_dalle_image(self, prompt: str, persona_name: str, resize_to: Optional[Tuple[int, int]] = None,
+                             image_format: Optional[str] = None) -> Optional[str]:
+        """
+        Generate image using DALL-E (requires OpenAI API)
+        
+        The image is streamed straight to disk as returned by the API (PNG).
+        It is only decoded when resize_to or image_format asks for a change.
+        
+        Args:
+            prompt: Description of the image
+            persona_name: Used to name the output file
+            resize_to: Optional (width, height) to resize to
+            image_format: Optional output format such as "JPEG" or "WEBP"
+        
+        Returns:
+            Path of the saved image, or None on failure
+        """
         try:
-            from openai import OpenAI
-            
-            # Create client. SDKs will pick up `OPENAI_API_BASE` if set above.
-            client = OpenAI(api_key=self.api_key)
-            
-            # Enhance prompt with persona context
-            enhanced_prompt = f"A warm, friendly photo suitable for a companion message: {prompt}"
-            
-            # Use OpenAI v1.x API
-            response = client.images.generate(
-                model=self.model_name,
-                prompt=enhanced_prompt,
-                n=1,
-                size="512x512"
-            )
+            image = self.request_images(prompt, n=1)[0]
             
-            image_url = response.data[0].url
-            
-            # Download and save image
-            import requests
-            from PIL import Image
-            from io import BytesIO
-            
-            img_data = requests.get(image_url).content
-            img = Image.open(BytesIO(img_data))
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = self.output_dir / f"{persona_name}_{timestamp}.png"
-            img.save(filename)
+            filename = self.store_image(image, persona_name, resize_to=resize_to, image_format=image_format)
             
             print(f"Image saved: {filename}")
             return str(filename)
@@ -79,19 +159,171 @@ class ImageGenerator:
             print(f"Error generating image: {e}")
             return None
     
+    def request_images(self, prompt: str, n: int = 1) -> List:
+        """
+        Request n images for one prompt from the images API
+        
+        Args:
+            prompt: Description of the image
+            n: Number of images to generate in a single request
+        
+        Returns:
+            The response's data items (each with .url or .b64_json)
+        """
+        # Shared, connection-pooled client (reused across images)
+        client = get_openai_client(self.api_key, self.baseurl)
+        
+        # Enhance prompt with persona context
+        enhanced_prompt = f"A warm, friendly photo suitable for a companion message: {prompt}"
+        
+        # Use OpenAI v1.x API
+        with span("image_api"):
+            response = client.images.generate(
+                model=self.model_name,
+                prompt=enhanced_prompt,
+                n=n,
+                size=self.size,
+                response_format=self.response_format
+            )
+        return response.data
+    
+    def max_images_per_request(self) -> int:
+        """Return the largest n the image model accepts in one request"""
+        # DALL-E 3 only supports n=1; DALL-E 2 allows up to 10
+        return 1 if "dall-e-3" in self.model_name else 10
+    
+    def generate_scenes(self, scene_keys: List[str], persona_name: str,
+                        max_concurrency: int = 4) -> List[Optional[str]]:
+        """
+        Generate images for several scenes concurrently
+        
+        Scenes that resolve to the same prompt are fetched in one request
+        using the API's n parameter. Scenes the image library can serve
+        are not requested at all. A scene listed several times gets that
+        many images.
+        
+        Args:
+            scene_keys: Scene keys ("garden", "coffee", ...) or free-form descriptions
+            persona_name: Used to name the output files
+            max_concurrency: Maximum number of API requests in flight
+        
+        Returns:
+            One image path per scene key, in the same order (None if it failed)
+        """
+        results: List[Optional[str]] = [None] * len(scene_keys)
+        prompts = {key: self.scene_prompt(key) for key in dict.fromkeys(scene_keys)}
+        
+        # Prompt -> positions in scene_keys still needing a new image
+        groups: Dict[str, List[int]] = {}
+        for index, key in enumerate(scene_keys):
+            reused = self.reuse_image(prompts[key])
+            if reused:
+                results[index] = reused
+            else:
+                groups.setdefault(prompts[key], []).append(index)
+        
+        # Split groups that exceed the model's per-request limit
+        limit = self.max_images_per_request()
+        batches = [
+            (prompt, indexes[i:i + limit])
+            for prompt, indexes in groups.items()
+            for i in range(0, len(indexes), limit)
+        ]
+        
+        def run_batch(batch):
+            prompt, indexes = batch
+            try:
+                images = self.request_images(prompt, n=len(indexes))
+                paths = {}
+                for index, image in zip(indexes, images):
+                    paths[index] = str(self.store_image(image, persona_name, label=scene_keys[index]))
+                    self.add_to_library(prompt, paths[index])
+                    print(f"Image saved: {paths[index]}")
+                return paths
+            except Exception as e:
+                print(f"Error generating images for {', '.join(scene_keys[i] for i in indexes)}: {e}")
+                return {}
+        
+        if not batches:
+            return results
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches))),
+                                thread_name_prefix="images") as pool:
+            for paths in pool.map(run_batch, batches):
+                for index, path in paths.items():
+                    results[index] = path
+        return results
+    
+    def store_image(self, image, persona_name: str, label: str = "",
+                    resize_to: Optional[Tuple[int, int]] = None, image_format: Optional[str] = None) -> Path:
+        """Save an image under a new unique path in storage and record it in the manifest"""
+        filename = self.save_image(image, self.storage.new_path("png", persona_name, label),
+                                   resize_to, image_format)
+        self.storage.register(filename, persona_name, "image")
+        return filename
+    
+    def save_image(self, image, filename: Path, resize_to: Optional[Tuple[int, int]] = None,
+                   image_format: Optional[str] = None) -> Path:
+        """
+        Write one image from an images API response to disk
+        
+        Args:
+            image: Item of response.data (with .url or .b64_json)
+            filename: Destination path (PNG unless image_format is given)
+            resize_to: Optional (width, height) to resize to
+            image_format: Optional output format such as "JPEG"
+        
+        Returns:
+            Path of the saved file (its suffix follows image_format)
+        """
+        # Write to a temporary name first so readers never see a partial file
+        partial = filename.with_name(filename.name + ".part")
+        try:
+            if getattr(image, "b64_json", None):
+                write_base64_file(image.b64_json, partial)
+            else:
+                download_file(image.url, partial)
+            
+            if resize_to or image_format:
+                filename = convert_image(partial, filename, resize_to, image_format)
+                partial.unlink()
+            else:
+                os.replace(partial, filename)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        return filename
+    
+    def scene_prompt(self, scene_description: str) -> str:
+        """Return the image prompt for a scene key, or the description itself"""
+        return SCENE_PROMPTS.get(scene_description, scene_description)
+    
     def generate_scene_image(self, scene_description: str, persona_name: str) -> Optional[str]:
-        """Generate a scene image (garden, sunset, coffee, etc.)"""
-        scene_prompts = {
-            "garden": "Beautiful flourishing garden with colorful flowers and vegetables",
-            "sunset": "Peaceful sunset over a quiet neighborhood",
-            "coffee": "Warm cup of coffee on a wooden table with morning light",
-            "book": "Cozy reading nook with comfortable chair and open book",
-            "cooking": "Homemade meal being prepared in a bright kitchen",
-            "nature": "Serene nature scene with trees and wildlife"
-        }
-        
-        prompt = scene_prompts.get(scene_description, scene_description)
-        return self.generate_dalle_image(prompt, persona_name)
+        """Generate a scene image (garden, sunset, coffee, etc.), reusing a library image when allowed"""
+        prompt = self.scene_prompt(scene_description)
+        reused = self.reuse_image(prompt)
+        if reused:
+            print(f"Reusing image: {reused}")
+            return reused
+        
+        filename = self.generate_dalle_image(prompt, persona_name)
+        if filename:
+            self.add_to_library(prompt, filename)
+        return filename
+    
+    def image_key(self, prompt: str) -> str:
+        """Return the library key for a prompt with this generator's model and size"""
+        return make_image_key(prompt, self.model_name, self.size)
+    
+    def reuse_image(self, prompt: str) -> Optional[str]:
+        """Return a library image for a prompt if the reuse policy allows, else None"""
+        if self.library is None:
+            return None
+        return self.library.choose(self.image_key(prompt))
+    
+    def add_to_library(self, prompt: str, filename: str):
+        """Index a newly generated image in the library"""
+        if self.library is not None:
+            self.library.add(self.image_key(prompt), filename)
     
     def generate_selfie_style_image(self, persona_description: str, persona_name: str) -> Optional[str]:
         """Generate a persona 'selfie' style image"""
@@ -103,23 +335,43 @@ class ImageGenerator:
 class VoiceGenerator:
     """Enhanced voice generation capabilities"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[VoiceCache] = None, use_cache: bool = True,
+                 tts_worker: Optional[TTSWorker] = None, storage: Optional[MediaStorage] = None):
+        """
+        Initialize voice generator
+        
+        Args:
+            cache: Voice cache to use (default: generated_voices/cache)
+            use_cache: Reuse audio for text that was synthesized before
+            tts_worker: Offline TTS worker for pyttsx3 (default: shared worker)
+            storage: Where uncached voice files are stored (default: generated_voices)
+        """
+        self.tts_worker = tts_worker
         self.output_dir = Path("generated_voices")
         self.output_dir.mkdir(exist_ok=True)
+        self.storage = storage or open_media_storage(str(self.output_dir))
+        if use_cache and cache is None:
+            cache = open_voice_cache(str(self.output_dir / "cache"))
+        self.cache = cache
+    
+    def synthesize(self, text: str, persona_name: str, engine: str, lang: str,
+                   settings: Dict, synthesize, extension: str) -> str:
+        """Write audio through the cache, or to a new file in storage without one"""
+        if self.cache is not None:
+            return self.cache.get_or_create(text, lang, engine, settings, synthesize, extension)
+        return str(self.storage.save(synthesize, extension, tenant=persona_name, kind="voice"))
     
     def generate_gtts(self, text: str, persona_name: str, lang: str = 'en') -> Optional[str]:
         """Generate voice using Google Text-to-Speech"""
+        def synthesize(path: str):
+            with span("tts_gtts"):
+                create_gtts(text=text, lang=lang, slow=False).save(path)
+        
         try:
-            from gtts import gTTS
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = self.output_dir / f"{persona_name}_{timestamp}.mp3"
-            
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(str(filename))
-            
+            filename = self.synthesize(text, persona_name, "gtts", lang, {"slow": False},
+                                       synthesize, "mp3")
             print(f"Voice message saved: {filename}")
-            return str(filename)
+            return filename
             
         except ImportError:
             print("gTTS not installed. Run: pip install gTTS")
@@ -130,28 +382,19 @@ class VoiceGenerator:
     
     def generate_pyttsx3(self, text: str, persona_name: str) -> Optional[str]:
         """Generate voice using pyttsx3 (offline)"""
+        worker = self.tts_worker or get_tts_worker()
+        settings = worker.settings
+        
+        def synthesize(path: str):
+            # The worker keeps one engine alive, so only the first job pays for init
+            with span("tts_pyttsx3"):
+                worker.synthesize(text, path)
+        
         try:
-            import pyttsx3
-            
-            engine = pyttsx3.init()
-            
-            # Adjust voice properties for warmer tone
-            voices = engine.getProperty('voices')
-            # Try to set a more pleasant voice
-            if len(voices) > 1:
-                engine.setProperty('voice', voices[1].id)  # Often female voice
-            
-            engine.setProperty('rate', 150)  # Slower, more gentle pace
-            engine.setProperty('volume', 0.9)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = self.output_dir / f"{persona_name}_{timestamp}.wav"
-            
-            engine.save_to_file(text, str(filename))
-            engine.runAndWait()
-            
+            filename = self.synthesize(text, persona_name, "pyttsx3", "en", settings,
+                                       synthesize, "wav")
             print(f"Voice message saved: {filename}")
-            return str(filename)
+            return filename
             
         except ImportError:
             print("pyttsx3 not installed. Run: pip install pyttsx3")
@@ -168,15 +411,14 @@ def demo_image_generation():
     
     generator = ImageGenerator()
     
-    # Test scene generation
+    # Test scene generation (all scenes are requested concurrently)
     scenes = ["garden", "coffee", "sunset"]
-    for scene in scenes:
-        print(f"\nGenerating {scene} image...")
-        result = generator.generate_scene_image(scene, "Alex")
+    print(f"\nGenerating {', '.join(scenes)} images...")
+    for scene, result in zip(scenes, generator.generate_scenes(scenes, "Alex")):
         if result:
-            print(f"✓ Success: {result}")
+            print(f"✓ {scene}: {result}")
         else:
-            print("✗ Failed")
+            print(f"✗ {scene}: Failed")
 
 
 def demo_voice_generation():
@@ -0,0 +1,180 @@
+"""
+Conversation memory for Anti-Grammy-Scammy
+
+Chats with grandma can go on for weeks. Re-sending the whole history on every
+turn makes each reply slower and more expensive than the last, so replies are
+built from a bounded memory instead:
+- The most recent turns are kept verbatim, as many as fit in a token budget
+- Older turns are folded into a rolling summary of bounded size
+- Every prompt's token count is recorded per turn
+
+The memory is saved to a small JSON file per persona, so it survives restarts
+without growing.
+"""
+
+import json
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the token count of text (about four characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def extractive_summary(previous: str, turns: List[Dict], max_tokens: int,
+                       count_tokens: Callable[[str], int] = estimate_tokens) -> str:
+    """
+    Fold turns into a summary by keeping the first sentence of each
+
+    The oldest summary lines are dropped once the summary exceeds max_tokens.
+
+    Args:
+        previous: Summary so far
+        turns: Turns (role and text) leaving the window
+        max_tokens: Token budget for the summary
+        count_tokens: Token counting function
+
+    Returns:
+        Updated summary
+    """
+    lines = previous.splitlines() if previous else []
+    for turn in turns:
+        sentence = turn["text"].strip().split("\n")[0]
+        for mark in ".!?":
+            if mark in sentence:
+                sentence = sentence[:sentence.index(mark) + 1]
+                break
+        speaker = "They" if turn["role"] == "user" else "You"
+        lines.append(f"- {speaker}: {sentence[:200]}")
+    while len(lines) > 1 and count_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Token-budgeted sliding window of turns plus a rolling summary"""
+
+    def __init__(self, max_tokens: int = 1500, summary_tokens: int = 300,
+                 summarize: Optional[Callable[[str, List[Dict], int], str]] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 path: Optional[str] = None):
+        """
+        Initialize the memory
+
+        Args:
+            max_tokens: Budget for the whole reply prompt (summary, recent
+                turns and the new message)
+            summary_tokens: Budget for the rolling summary
+            summarize: Function (previous summary, dropped turns, budget) ->
+                new summary (default: extractive_summary)
+            count_tokens: Token counting function (default: an estimate;
+                pass a tokenizer's counter for exact numbers)
+            path: JSON file to persist the memory in
+        """
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.count_tokens = count_tokens
+        self.summarize = summarize or (
+            lambda previous, turns, budget: extractive_summary(previous, turns, budget, count_tokens)
+        )
+        self.path = path
+        self.summary = ""
+        self.turns: List[Dict] = []
+        # Per-turn prompt statistics for the most recent 1000 turns
+        self.turn_stats: deque = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        if path and Path(path).exists():
+            self.load()
+
+    def add(self, role: str, text: str):
+        """Append a turn ("user" or "assistant")"""
+        line = self._format_turn(role, text)
+        with self._lock:
+            self.turns.append({"role": role, "text": text, "tokens": self.count_tokens(line + "\n")})
+
+    @staticmethod
+    def _format_turn(role: str, text: str) -> str:
+        return f"{'They' if role == 'user' else 'You'}: {text}"
+
+    def build_prompt(self, user_message: str) -> str:
+        """
+        Build the reply prompt for a new message within the token budget
+
+        Turns that no longer fit are folded into the summary first. Room for
+        a full-size summary is always reserved, so the prompt stays within
+        max_tokens as long as the summarizer respects summary_tokens.
+
+        Args:
+            user_message: The message to respond to
+
+        Returns:
+            Prompt containing the summary, recent turns and the new message
+        """
+        summary_header = "Summary of your earlier conversation:\n"
+        history_header = "Recent conversation:\n"
+        request = (f"The person you're talking to said: \"{user_message}\"\n\n"
+                   "Respond warmly and appropriately to what they said.")
+        with self._lock:
+            budget = (self.max_tokens - self.count_tokens(request) - self.summary_tokens
+                      - self.count_tokens(summary_header + history_header + "\n\n" * 2))
+            dropped = []
+            while self.turns and sum(turn["tokens"] for turn in self.turns) > budget:
+                dropped.append(self.turns.pop(0))
+            if dropped:
+                self.summary = self.summarize(self.summary, dropped, self.summary_tokens)
+
+            sections = []
+            if self.summary:
+                sections.append(summary_header + self.summary)
+            if self.turns:
+                sections.append(history_header + "\n".join(
+                    self._format_turn(turn["role"], turn["text"]) for turn in self.turns
+                ))
+            sections.append(request)
+            prompt = "\n\n".join(sections)
+
+            self.turn_stats.append({
+                "turn": self.turn_stats[-1]["turn"] + 1 if self.turn_stats else 1,
+                "prompt_tokens": self.count_tokens(prompt),
+                "window_turns": len(self.turns),
+                "summary_tokens": self.count_tokens(self.summary),
+            })
+            return prompt
+
+    @property
+    def last_prompt_tokens(self) -> int:
+        """Token count of the most recent prompt"""
+        return self.turn_stats[-1]["prompt_tokens"] if self.turn_stats else 0
+
+    def save(self):
+        """Write the summary and recent turns to the memory file"""
+        if not self.path:
+            return
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path + ".part"
+        # Held for the whole write so concurrent saves don't share the partial file
+        with self._lock:
+            with open(partial, "w") as f:
+                json.dump({"summary": self.summary, "turns": self.turns}, f)
+            Path(partial).replace(self.path)
+
+    def load(self):
+        """Read the summary and recent turns from the memory file"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading conversation memory: {e}")
+            return
+        with self._lock:
+            self.summary = data.get("summary", "")
+            self.turns = data.get("turns", [])
+
+    def clear(self):
+        """Forget the conversation"""
+        with self._lock:
+            self.summary = ""
+            self.turns = []
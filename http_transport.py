@@ -0,0 +1,214 @@
+"""
+Shared HTTP transport for Anti-Grammy-Scammy
+
+Every outbound HTTP call (OpenAI image requests, image downloads, gTTS,
+Twilio) goes through process-wide clients with keep-alive connection pools,
+so repeated messages and images reuse open TLS connections instead of paying
+a new handshake each time.
+
+Pool sizes and timeouts come from the optional "transport" config section.
+They apply to the whole process, so call configure_transport() once at
+startup (anti_scammy.py does it for the config it was started with):
+
+    "transport": {
+        "pool_connections": 10,   # hosts kept in the pool
+        "pool_maxsize": 20,       # connections kept per host
+        "timeout": 30,            # seconds per request
+        "max_retries": 2          # connection-level retries
+    }
+
+Client libraries are imported lazily, the first time a client is requested.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+
+DEFAULT_SETTINGS = {
+    "pool_connections": 10,
+    "pool_maxsize": 20,
+    "timeout": 30.0,
+    "max_retries": 2,
+}
+
+_settings = dict(DEFAULT_SETTINGS)
+_session = None
+_gtts_class = None
+_openai_clients: Dict[Tuple, object] = {}
+_twilio_clients: Dict[Tuple, object] = {}
+_lock = threading.Lock()
+
+
+def configure_transport(settings: Optional[Dict] = None):
+    """
+    Set pool sizes and timeouts for the shared clients
+
+    Clients already created with different settings are discarded, so the
+    new settings apply to the next request.
+
+    Args:
+        settings: The "transport" config section (missing keys use defaults)
+    """
+    global _session
+    new_settings = dict(DEFAULT_SETTINGS)
+    new_settings.update(settings or {})
+    with _lock:
+        if new_settings == _settings:
+            return
+        _settings.update(new_settings)
+        _session = None
+        _openai_clients.clear()
+        _twilio_clients.clear()
+
+
+def get_settings() -> Dict:
+    """Return the current transport settings"""
+    return dict(_settings)
+
+
+def get_http_session():
+    """Return the shared requests.Session with a keep-alive connection pool"""
+    global _session
+    with _lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=_settings["pool_connections"],
+                pool_maxsize=_settings["pool_maxsize"],
+                max_retries=_settings["max_retries"],
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def get_openai_client(api_key: Optional[str], base_url: Optional[str] = None):
+    """
+    Return a shared OpenAI client for an API key and base URL
+
+    Args:
+        api_key: OpenAI API key
+        base_url: Optional OpenAI-compatible endpoint
+
+    Returns:
+        openai.OpenAI instance backed by a pooled httpx client
+    """
+    key = (api_key, base_url or None)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            import httpx
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                limits=httpx.Limits(
+                    max_connections=_settings["pool_maxsize"],
+                    max_keepalive_connections=_settings["pool_maxsize"],
+                ),
+                timeout=_settings["timeout"],
+            )
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url or None,
+                http_client=http_client,
+                max_retries=_settings["max_retries"],
+            )
+            _openai_clients[key] = client
+        return client
+
+
+def get_twilio_client(account_sid: str, auth_token: str):
+    """
+    Return a shared Twilio REST client for a set of credentials
+
+    Args:
+        account_sid: Twilio account SID
+        auth_token: Twilio auth token
+
+    Returns:
+        twilio.rest.Client using a pooled, keep-alive HTTP session
+    """
+    key = (account_sid, auth_token)
+    with _lock:
+        client = _twilio_clients.get(key)
+        if client is None:
+            from requests.adapters import HTTPAdapter
+            from twilio.rest import Client
+            from twilio.http.http_client import TwilioHttpClient
+
+            http_client = TwilioHttpClient(pool_connections=True, timeout=_settings["timeout"])
+            http_client.session.mount("https://", HTTPAdapter(
+                pool_connections=_settings["pool_connections"],
+                pool_maxsize=_settings["pool_maxsize"],
+                max_retries=_settings["max_retries"],
+            ))
+            client = Client(account_sid, auth_token, http_client=http_client)
+            _twilio_clients[key] = client
+        return client
+
+
+def _pooled_gtts_class():
+    """Return a gTTS subclass that sends its requests over the shared session"""
+    global _gtts_class
+    with _lock:
+        if _gtts_class is None:
+            import base64
+            import re
+
+            import requests
+            from gtts import gTTS
+            from gtts.tts import gTTSError
+
+            class PooledGTTS(gTTS):
+                """
+                gTTS that reuses pooled connections
+
+                Stock gTTS opens (and closes) a new requests.Session for every
+                request. This builds the same requests and parses the same
+                responses, but sends them with get_http_session().
+                """
+
+                def stream(self):
+                    session = get_http_session()
+                    for idx, prepared in enumerate(self._prepare_requests()):
+                        try:
+                            response = session.send(prepared, timeout=self.timeout)
+                            response.raise_for_status()
+                        except requests.exceptions.HTTPError:
+                            raise gTTSError(tts=self, response=response)
+                        except requests.exceptions.RequestException:
+                            raise gTTSError(tts=self)
+
+                        for line in response.iter_lines(chunk_size=1024):
+                            decoded_line = line.decode("utf-8")
+                            if "jQ1olc" in decoded_line:
+                                audio_search = re.search(r'jQ1olc","\[\\"(.*)\\"]', decoded_line)
+                                if not audio_search:
+                                    # Good response without an audio stream
+                                    raise gTTSError(tts=self, response=response)
+                                yield base64.b64decode(audio_search.group(1).encode("ascii"))
+
+            _gtts_class = PooledGTTS
+        return _gtts_class
+
+
+def create_gtts(text: str, lang: str = "en", slow: bool = False):
+    """
+    Create a gTTS object whose requests reuse pooled connections
+
+    gTTS opens a new HTTPS session for every request; this one sends them
+    over the shared session instead of paying a new TLS handshake each time.
+
+    Args:
+        text: Text to speak
+        lang: Language code
+        slow: Speak slowly
+
+    Returns:
+        gTTS instance (save() and write_to_fp() work as usual)
+    """
+    return _pooled_gtts_class()(text=text, lang=lang, slow=slow, timeout=_settings["timeout"])
@@ -0,0 +1,178 @@
+"""
+Reusable image library for Anti-Grammy-Scammy
+
+Scene images come from a small fixed set of prompts, so most requests can be
+served from images generated earlier. The library indexes every generated
+image in SQLite by a hash of (prompt, model, size) and applies a reuse policy:
+- Keep up to `variants` images per prompt and rotate through them, least
+  recently used first
+- Only reuse images younger than `reuse_days`; older ones are replaced by
+  fresh generations
+- When the library grows past `max_bytes`, the least recently used image
+  files are deleted from disk
+
+Images kept in a MediaStorage (see attach_storage) are deleted through it,
+so its manifest stays in step, and images its retention deletes are dropped
+from the library.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+def make_image_key(prompt: str, model_name: str, size: str) -> str:
+    """Return the content address for an image request"""
+    return hashlib.sha256("\0".join((prompt, model_name, size)).encode("utf-8")).hexdigest()
+
+
+class ImageLibrary:
+    """Index of generated images with rotation, expiry and size-based eviction"""
+
+    def __init__(self, path: str = "generated_images/library.db", reuse_days: float = 7,
+                 variants: int = 3, max_bytes: int = 500 * 1024 * 1024):
+        """
+        Initialize the library
+
+        Args:
+            path: SQLite index file
+            reuse_days: Maximum age of an image that may be reused
+            variants: Number of different images to rotate through per prompt
+            max_bytes: Total size of indexed image files before eviction
+        """
+        self.path = path
+        self.reuse_days = reuse_days
+        self.variants = variants
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.storage = None
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                image_key TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                use_count INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_images_key ON images (image_key, created_at);
+            CREATE INDEX IF NOT EXISTS idx_images_used ON images (last_used);
+        """)
+        self._conn.commit()
+
+    def attach_storage(self, storage):
+        """
+        Let a MediaStorage own the image files
+
+        Evicted images are deleted through the storage, and images the
+        storage deletes are forgotten by the library.
+
+        Args:
+            storage: MediaStorage the indexed images are saved in
+        """
+        self.storage = storage
+        storage.add_delete_listener(self.forget)
+
+    def forget(self, paths: List[str]):
+        """Drop deleted image files from the index"""
+        with self._lock:
+            self._conn.executemany("DELETE FROM images WHERE path = ?", [(str(path),) for path in paths])
+            self._conn.commit()
+
+    def choose(self, key: str) -> Optional[str]:
+        """
+        Return an existing image to reuse for a key, if the policy allows
+
+        An image is reused once `variants` fresh images exist for the key;
+        until then, None tells the caller to generate a new variant.
+
+        Args:
+            key: Image key from make_image_key
+
+        Returns:
+            Path of the least recently used fresh variant, or None
+        """
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path FROM images WHERE image_key = ? AND created_at >= ? ORDER BY last_used",
+                (key, now - self.reuse_days * 86400),
+            ).fetchall()
+            fresh = [row[0] for row in rows if os.path.exists(row[0])]
+            if len(fresh) < self.variants:
+                self.misses += 1
+                return None
+            path = fresh[0]
+            self._conn.execute(
+                "UPDATE images SET last_used = ?, use_count = use_count + 1 WHERE path = ?",
+                (now, path),
+            )
+            self._conn.commit()
+            self.hits += 1
+            return path
+
+    def add(self, key: str, path: str):
+        """Index a newly generated image and evict old files if over the size limit"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO images (path, image_key, size_bytes, created_at, last_used, use_count) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                (str(path), key, os.path.getsize(path), now, now),
+            )
+            evicted = self._evict()
+            self._conn.commit()
+        # Outside the lock: the storage calls forget() back
+        for path in evicted:
+            if self.storage is not None:
+                self.storage.delete(path)
+            else:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _evict(self) -> List[str]:
+        """Drop least recently used images until under max_bytes; returns the files to delete"""
+        evicted = []
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM images").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        for path, size_bytes in self._conn.execute(
+                "SELECT path, size_bytes FROM images ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM images WHERE path = ?", (path,))
+            evicted.append(path)
+            total -= size_bytes
+        return evicted
+
+    def total_bytes(self) -> int:
+        """Return the total size of indexed images"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM images").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Return reuse statistics and library size"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "images": count,
+            "total_bytes": self.total_bytes(),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,220 @@
+"""
+Payment intent classifier for Anti-Grammy-Scammy
+
+Whether a message mentions wanting or needing something used to be left to
+the LLM on every reply. This module decides it locally with precompiled
+regular expressions, in microseconds, before the LLM is called:
+- "scam": high-risk signals such as gift cards, wire transfers or being asked
+  to send money to someone, together with a payment or a request ("he
+  wants me to buy gift cards"); answered at once with a warning template
+- "caution": a scam keyword with nobody paying or asking ("I got a gift card
+  from my daughter"); the LLM answers, and the prompt asks it to check
+  gently whether anyone wants money
+- "purchase": wanting, needing or wishing for something; the reply prompt is
+  told so, which is when the Cash App offer may be made
+- "none": ordinary conversation; the reply prompt says not to bring up money
+
+Scam signals win over purchase intent ("I need to buy gift cards for the IRS"
+is a scam, not a shopping list). Signals that are everyday on their own
+(sending money, a hospital visit) only count when someone else is asking
+for the money, so "I sent money to my grandson for his birthday" is not a
+scam. Other signals are keywords: one of them alone is only a caution, unless
+the message also pays, is asked to pay, or has a second kind of signal.
+"""
+
+import re
+import time
+from typing import Dict, List, Optional
+
+
+SCAM = "scam"
+CAUTION = "caution"
+PURCHASE = "purchase"
+NONE = "none"
+
+# Someone other than the resident asking for something ("needs", "told me to")
+_REQUEST = (r"\b(?:needs|wants|(?:want|wanted|need|needed|asked|asking|asks|told|tells|begged|begging)"
+            r" me|says i|said i)\b")
+
+SCAM_PATTERNS = {
+    # Store names alone are store or credit cards ("my Target card"); gift cards need "gift"
+    "gift_card": r"\b(?:gift\s*cards?|(?:itunes|google play|steam)\s*cards?)\b",
+    "wire_transfer": r"\bwir(?:e|ed|ing)\b.{0,30}(?:\b(?:money|transfer|funds|cash)\b|\$\s?\d)"
+                     r"|\bwire transfer\b|\b(?:western union|moneygram)\b",
+    "send_money": _REQUEST + r".{0,20}\b(?:send|sending|sent|transfer)\b.{0,20}"
+                  r"(?:\b(?:money|cash|funds)\b|\$\s?\d[\d,]*)(?!\s+to\s+(?:you|your)\b)"
+                  r"|\b(?:send|sending|sent)\b.{0,20}(?:\b(?:money|cash|funds)\b|\$\s?\d[\d,]*)"
+                  r".{0,40}\b(?:who|that) (?:called|phoned|emailed|texted|messaged|contacted)\b",
+    "prize": r"\b(?:lottery|sweepstakes|prize|winnings|inheritance)\b.{0,60}\b(?:pay|send|fee|taxes)\b"
+             r"|\b(?:pay|send|sending|sent)\b.{0,60}\b(?:lottery|sweepstakes|prize|winnings|inheritance)\b",
+    "crypto": r"\b(?:bitcoin|btc|crypto(?:currency)?|ethereum|usdt)\b",
+    "emergency": r"\b(?:jail|bail|arrested|accident|hospital|lawyer)\b.{0,60}" + _REQUEST +
+                 r".{0,30}\b(?:money|pay|send|wire|fee|bail|cash)\b"
+                 r"|" + _REQUEST + r".{0,30}\b(?:money|pay|send|wire|fee|bail|cash)\b.{0,60}"
+                 r"\b(?:jail|bail|arrested|accident|hospital|lawyer)\b",
+    "authority_threat": r"\b(?:irs|social security|medicare|warrant|arrest|customs)\b"
+                        r".{0,60}\b(?:pay|payment|fee|fine|money|owe|send)\b",
+    "secrecy": r"\b(?:not|don'?t|never) (?:to )?tell (?:anyone|anybody|my|your) ?(?:family|kids|children|son|daughter)?\b"
+               r"|\bkeep (?:it|this) (?:a )?secret\b",
+    "account_details": r"\b(?:bank|account|routing|card|pin|social security) (?:number|details|info(?:rmation)?|code)\b",
+}
+
+# Signals whose pattern already includes someone asking for money
+REQUEST_SIGNALS = ("send_money", "emergency", "prize")
+
+# Paying, or being asked to pay or hand something over; "didn't have to pay" is
+# handled by _NEGATION
+ACTION_PATTERN = (
+    r"\b(?:pay|paid|paying|send|sent|sending|wire|wired|wiring|buy|bought|buying|purchase|transfer"
+    r"|deposit|withdraw|owe|read (?:him|her|them|it)|give (?:him|her|them))\b"
+    r"|" + _REQUEST + r"|\b(?:ask(?:ed|ing|s)?|want(?:s|ed)?) (?:me )?for\b"
+    r"|\b(?:he|she|they|man|woman|lady|guy|caller|someone|somebody) (?:asked|told|wants|said|says|insisted)\b"
+)
+_NEGATION = re.compile(r"\b(?:not|never|no|didn't|don't|doesn't|won't|wasn't|didnt|dont)\b[^.!?]{0,20}$",
+                       re.IGNORECASE)
+
+PURCHASE_PATTERNS = {
+    "want": r"\b(?:i|we)(?: would|'d)? (?:really )?want (?:a|an|some|new|one|to (?:get|buy|have))\b"
+            r"|\b(?:i|we)(?: would|'d) (?:really )?(?:like|love) (?:a|an|some|new|one|to (?:get|buy|have))\b"
+            r"|\b(?:i|we) wish (?:i|we) had\b|\bwhat i want\b",
+    "need": r"\b(?:i|we) (?:really |badly |desperately )?need (?:a|an|some|new|to (?:buy|get|replace))\b",
+    # An object and a request, not just a shopping word ("in order to", "can I buy you a coffee")
+    "buy": r"\b(?:can|could|would|will) you (?:please )?(?:get|buy|order|pick up) me (?:a|an|some|new|one)\b"
+           r"|\b(?:can'?t|cannot|couldn'?t) afford (?:a|an|some|new|to (?:buy|get|replace))\b"
+           r"|\bsav(?:e|ing) (?:up )?for (?:a|an|some|new)\b"
+           r"|\b(?:looking|shopping) for (?:a|an|some) (?:new|good|nice|cheap|decent|warm)\b"
+           r"|\bshopping for (?:a|an|some)\b|\blooking to (?:buy|get|order) (?:a|an|some|new)\b",
+    "broken": r"\bmy [a-z ]{1,20} (?:broke|(?:is|are) broken|stopped working|wore out|(?:is|are) worn out)\b",
+    "gift": r"\b(?:for my birthday|for christmas|as a (?:gift|present))\b",
+}
+
+
+def _compile(patterns: Dict[str, str]) -> "re.Pattern":
+    """Combine named patterns into one case-insensitive alternation"""
+    return re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in patterns.items()),
+                      re.IGNORECASE)
+
+
+class Intent:
+    """Classification of one message"""
+
+    def __init__(self, label: str, signals: Optional[List[str]] = None, latency: float = 0.0):
+        self.label = label
+        self.signals = signals or []
+        self.latency = latency
+
+    @property
+    def is_scam(self) -> bool:
+        return self.label == SCAM
+
+    @property
+    def is_caution(self) -> bool:
+        return self.label == CAUTION
+
+    @property
+    def is_purchase(self) -> bool:
+        return self.label == PURCHASE
+
+    def __repr__(self) -> str:
+        return f"Intent({self.label!r}, signals={self.signals})"
+
+
+class IntentClassifier:
+    """Classify messages as scam signals, purchase intent or neither"""
+
+    def __init__(self, scam_patterns: Optional[Dict[str, str]] = None,
+                 purchase_patterns: Optional[Dict[str, str]] = None):
+        """
+        Initialize the classifier
+
+        Args:
+            scam_patterns: Signal name -> regex (default: SCAM_PATTERNS)
+            purchase_patterns: Signal name -> regex (default: PURCHASE_PATTERNS)
+        """
+        self._scam = _compile(scam_patterns or SCAM_PATTERNS)
+        self._purchase = _compile(purchase_patterns or PURCHASE_PATTERNS)
+        self._action = re.compile(ACTION_PATTERN, re.IGNORECASE)
+
+    @staticmethod
+    def _signals(pattern: "re.Pattern", text: str) -> List[str]:
+        signals = []
+        for match in pattern.finditer(text):
+            if match.lastgroup not in signals:
+                signals.append(match.lastgroup)
+        return signals
+
+    def _has_action(self, text: str) -> bool:
+        """Whether someone pays or asks for something (not "I didn't have to pay")"""
+        return any(not _NEGATION.search(text[:match.start()]) for match in self._action.finditer(text))
+
+    def classify(self, text: str) -> Intent:
+        """
+        Classify a message
+
+        Args:
+            text: Message from the person the companion is talking to
+
+        Returns:
+            Intent with the label and the names of the signals that matched
+        """
+        started = time.perf_counter()
+        # Curly apostrophes from phone keyboards
+        text = text.replace("’", "'")
+        signals = self._signals(self._scam, text)
+        label = NONE
+        if signals:
+            keywords = [signal for signal in signals if signal not in REQUEST_SIGNALS]
+            strong = len(keywords) < len(signals) or len(keywords) > 1 or self._has_action(text)
+            label = SCAM if strong else CAUTION
+        else:
+            signals = self._signals(self._purchase, text)
+            label = PURCHASE if signals else NONE
+        return Intent(label, signals, time.perf_counter() - started)
+
+
+SCAM_REPLY_TEMPLATES = {
+    "gift_card": ("Oh, please be careful! Nobody honest asks to be paid in gift cards, not the bank, "
+                  "not the government and not a relative in trouble. Could you call someone in your "
+                  "family before buying any? I'd feel so much better."),
+    "wire_transfer": ("That worries me a little. Wiring money is how a lot of people get cheated, because "
+                      "once it's sent it can't be taken back. Please check with someone in your family "
+                      "before you send anything, will you?"),
+    "crypto": ("Please be careful with anything involving Bitcoin or crypto. Scammers love it because the "
+               "money can't be traced or returned. Talk it over with your family first, okay?"),
+    "emergency": ("If someone says a grandchild or friend is in trouble and needs money fast, please hang "
+                  "up and call them or their parents yourself first. Scammers pretend to be family all "
+                  "the time, and real family will understand."),
+    "authority_threat": ("The IRS, Social Security and the police never call asking for payment or "
+                         "threatening arrest. That sounds like a scam. Hang up and call the official "
+                         "number yourself, or ask your family to help. You did nothing wrong!"),
+    "prize": ("Real lotteries and sweepstakes never ask winners to pay fees or taxes up front. If you "
+              "have to send money to collect a prize, it's a scam. Please check with your family first."),
+    "secrecy": ("Anyone who asks you to keep money matters secret from your family is not looking out "
+                "for you. Please tell someone you trust. I promise nobody will be upset with you."),
+    "account_details": ("Please don't give your bank, card or Social Security details to anyone who "
+                        "contacts you. Real companies never ask for them that way. Let's be safe!"),
+}
+DEFAULT_SCAM_REPLY = ("That sounds like it could be a scam, and I care about you too much not to say so. "
+                      "Please don't send money to anyone until you've talked it over with your family.")
+
+
+def scam_reply(intent: Intent) -> str:
+    """Return the warning reply for the first recognized scam signal"""
+    for signal in intent.signals:
+        if signal in SCAM_REPLY_TEMPLATES:
+            return SCAM_REPLY_TEMPLATES[signal]
+    return DEFAULT_SCAM_REPLY
+
+
+def prompt_guidance(intent: Intent, payment_enabled: bool) -> str:
+    """Return the note added to the reply prompt for a purchase, caution or ordinary message"""
+    if intent.is_caution:
+        return ("(Their message mentions something scammers use (" + ", ".join(intent.signals).replace("_", " ")
+                + "). Reply normally, but if anyone is asking them for money or personal details, "
+                  "gently suggest checking with family first. Do not bring up money or gifts yourself.)")
+    if intent.is_purchase and payment_enabled:
+        return ("(They mentioned wanting or needing something, so this is a good moment to offer "
+                "to get it for them as described in your instructions.)")
+    if intent.is_purchase:
+        return "(They mentioned wanting or needing something. Be supportive, but don't offer money or gifts.)"
+    return "(They did not ask for anything, so do not bring up money, gifts or payment.)"
@@ -112,7 +112,7 @@ Robert"""
     print("="*70 + "\n")
     
     time.sleep(1)
-    typing_print("✓ Message saved to message_log.txt", 0.02)
+    typing_print("✓ Message saved to message_log.db", 0.02)
 
 def demo_scheduled_run():
     """Demonstrate scheduled message mode"""
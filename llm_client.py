@@ -0,0 +1,256 @@
+"""
+Async LLM client for Anti-Grammy-Scammy
+
+Scheduled sends can call the model directly over the OpenAI-compatible
+chat completions API (`model.baseurl`, or api.openai.com) instead of going
+through a Swarms agent in a worker thread:
+- Every request has a deadline; a request that misses it is cancelled,
+  unless the caller asked to be handed the late answer (on_late)
+- Identical requests in flight at the same time (same model, system prompt
+  and prompt) share one HTTP call, e.g. tenants with the same persona asking
+  for the same check-in at 08:00
+- A request to the primary model that times out is retried once on a
+  fallback model
+- Clients keep a connection pool and are shared per endpoint and API key
+
+Any server that implements POST {baseurl}/chat/completions works (OpenAI,
+vLLM, Ollama, LM Studio, ...).
+"""
+
+import time
+import asyncio
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import span
+
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+
+class LLMError(RuntimeError):
+    """Raised when the provider returns an error or an unreadable response"""
+
+
+class Completion:
+    """Result of one completion request"""
+
+    def __init__(self, text: str, model: str, latency: float = 0.0,
+                 coalesced: bool = False, fallback: bool = False):
+        self.text = text
+        self.model = model
+        self.latency = latency
+        # Shared the HTTP call of an identical request already in flight
+        self.coalesced = coalesced
+        # Answered by the fallback model after the primary timed out
+        self.fallback = fallback
+
+    def __repr__(self):
+        return f"Completion(model={self.model!r}, latency={self.latency:.2f}s, fallback={self.fallback})"
+
+
+class _Flight:
+    """One HTTP call and the number of requests waiting on it"""
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class LLMClient:
+    """Async client for an OpenAI-compatible chat completions endpoint"""
+
+    def __init__(self, baseurl: str = DEFAULT_BASE_URL, api_key: str = "", max_connections: int = 100):
+        """
+        Initialize the client
+
+        Args:
+            baseurl: API base URL (the part before /chat/completions)
+            api_key: Bearer token sent with every request
+            max_connections: Size of the connection pool
+        """
+        self.url = (baseurl or DEFAULT_BASE_URL).rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.requests = 0
+        self.http_calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.fallbacks = 0
+        self._session = None
+        self._loop = None
+        self._inflight: Dict[Tuple, _Flight] = {}
+        self._late: set = set()
+
+    def _get_session(self):
+        try:
+            import aiohttp
+        except ImportError:
+            print("aiohttp not installed. Run: pip install aiohttp")
+            raise
+
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._loop is not loop or self._session.closed:
+            # Sessions and in-flight calls belong to one event loop
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=None),
+            )
+            self._loop = loop
+            self._inflight = {}
+        return self._session
+
+    async def complete(self, prompt: str, model: str, system_prompt: Optional[str] = None,
+                       timeout: float = 30.0, fallback_model: str = "",
+                       on_late: Optional[Callable[[str], None]] = None, late_timeout: float = 0.0) -> Completion:
+        """
+        Get a completion for a prompt
+
+        Args:
+            prompt: User message
+            model: Model name
+            system_prompt: Optional system message (e.g. the persona prompt)
+            timeout: Deadline in seconds for each model tried
+            fallback_model: Model to try once if the primary times out ("" for none)
+            on_late: Called with the primary model's text if it answers after
+                     its deadline, within late_timeout more seconds (the call
+                     keeps running instead of being cancelled)
+            late_timeout: Extra seconds the primary call may take for on_late
+
+        Returns:
+            The completion
+
+        Raises:
+            TimeoutError: If no model answered in time
+            LLMError: If the provider returned an error
+        """
+        self.requests += 1
+        started = time.perf_counter()
+        try:
+            text, coalesced = await self._single_flight(model, system_prompt, prompt, timeout,
+                                                        on_late, late_timeout)
+            return Completion(text, model, time.perf_counter() - started, coalesced)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if not fallback_model or fallback_model == model:
+                raise
+            print(f"LLM request to {model} timed out after {timeout}s; trying {fallback_model}")
+
+        self.fallbacks += 1
+        text, coalesced = await self._single_flight(fallback_model, system_prompt, prompt, timeout)
+        return Completion(text, fallback_model, time.perf_counter() - started, coalesced, fallback=True)
+
+    async def _single_flight(self, model: str, system_prompt: Optional[str], prompt: str, timeout: float,
+                             on_late: Optional[Callable] = None, late_timeout: float = 0.0) -> Tuple[str, bool]:
+        """Wait for the shared call for this request, starting it if none is in flight"""
+        self._get_session()
+        key = (model, system_prompt, prompt)
+        flight = self._inflight.get(key)
+        coalesced = flight is not None
+        if flight is None:
+            flight = self._inflight[key] = _Flight(asyncio.ensure_future(self._post(model, system_prompt, prompt)))
+            flight.task.add_done_callback(lambda task: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        waiting_late = False
+        try:
+            # shield: one request's deadline must not cancel the call for the others
+            return await asyncio.wait_for(asyncio.shield(flight.task), timeout), coalesced
+        except asyncio.TimeoutError:
+            if on_late is not None and late_timeout > 0:
+                # Stay a waiter so the call is not cancelled, and hand over the late text
+                waiting_late = True
+                task = asyncio.ensure_future(self._wait_late(key, flight, late_timeout, on_late))
+                self._late.add(task)
+                task.add_done_callback(self._late.discard)
+            raise
+        finally:
+            if not waiting_late:
+                self._leave(key, flight)
+
+    async def _wait_late(self, key: Tuple, flight: _Flight, late_timeout: float, on_late: Callable):
+        try:
+            text = await asyncio.wait_for(asyncio.shield(flight.task), late_timeout)
+        except Exception:
+            return
+        finally:
+            self._leave(key, flight)
+        on_late(text)
+
+    def _leave(self, key: Tuple, flight: _Flight):
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            # Nobody is waiting any more
+            flight.task.cancel()
+            self._forget(key, flight)
+
+    def _forget(self, key: Tuple, flight: _Flight):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+
+    async def _post(self, model: str, system_prompt: Optional[str], prompt: str) -> str:
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+
+        self.http_calls += 1
+        with span("llm_http"):
+            async with self._get_session().post(self.url, json={"model": model, "messages": messages},
+                                                headers=headers) as response:
+                if response.status != 200:
+                    body = await response.text()
+                    raise LLMError(f"{model}: HTTP {response.status}: {body[:200]}")
+                data = await response.json(content_type=None)
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise LLMError(f"{model}: unexpected response: {str(data)[:200]}")
+
+    def stats(self) -> Dict:
+        """Return request, HTTP call, coalesced, timeout and fallback counts"""
+        return {
+            "requests": self.requests,
+            "http_calls": self.http_calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "fallbacks": self.fallbacks,
+        }
+
+    async def close(self):
+        """Close the connection pool (if it belongs to the running event loop)"""
+        if self._session is not None and self._loop is asyncio.get_running_loop():
+            await self._session.close()
+        self._session = None
+        self._loop = None
+
+
+_clients: Dict[Tuple[str, str], LLMClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_llm_client(baseurl: Optional[str] = None, api_key: str = "") -> LLMClient:
+    """
+    Return the shared client for an endpoint and API key, creating it on first use
+
+    Args:
+        baseurl: API base URL (defaults to OpenAI)
+        api_key: API key
+    """
+    key = ((baseurl or DEFAULT_BASE_URL).rstrip("/"), api_key)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = LLMClient(key[0], api_key)
+        return client
+
+
+async def close_llm_clients():
+    """Close the connection pools of every shared client"""
+    with _clients_lock:
+        clients = list(_clients.values())
+    for client in clients:
+        await client.close()
@@ -0,0 +1,249 @@
+"""
+Generated media storage for Anti-Grammy-Scammy
+
+Images and voice notes used to be written to one flat directory with
+second-resolution timestamps, so two files in the same second overwrote each
+other and the directory grew without bound. This module stores them as:
+
+    <root>/<YYYY>/<MM>/<DD>/<tenant>/<label>_<unique id>.<ext>
+
+- Every file gets a random unique ID, so names never collide
+- Files are written to a temporary name and renamed into place, so readers
+  never see a partial file
+- An SQLite manifest records each file's tenant, kind, size and creation
+  time, so lookups and retention never walk the directory tree
+- Stored files are only deleted through the storage (delete() and
+  retention), which tells listeners such as the image library
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import weakref
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def _slug(value: str, limit: int = 40) -> str:
+    """Make a string safe to use in a file or directory name"""
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in value)[:limit]
+
+
+class MediaStorage:
+    """Date- and tenant-sharded media directory with a manifest index"""
+
+    def __init__(self, root: str, manifest_path: Optional[str] = None):
+        """
+        Initialize storage
+
+        Args:
+            root: Base directory for stored files
+            manifest_path: SQLite manifest (default: <root>/manifest.db)
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._delete_listeners: List = []
+        self._conn = sqlite3.connect(manifest_path or str(self.root / "manifest.db"),
+                                     check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS media (
+                media_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL UNIQUE,
+                tenant TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_media_tenant ON media (tenant, created_at);
+            CREATE INDEX IF NOT EXISTS idx_media_created ON media (created_at);
+        """)
+        self._conn.commit()
+
+    def new_path(self, extension: str, tenant: str = "", label: str = "") -> Path:
+        """
+        Return a new, unique path in today's shard for a tenant
+
+        Args:
+            extension: File extension without the dot
+            tenant: Tenant or persona the file belongs to
+            label: Optional readable prefix for the file name
+
+        Returns:
+            Path whose parent directory exists
+        """
+        directory = self.root / datetime.now().strftime("%Y/%m/%d") / (_slug(tenant) or "_shared")
+        directory.mkdir(parents=True, exist_ok=True)
+        name = "_".join(part for part in (_slug(label), uuid.uuid4().hex) if part)
+        return directory / f"{name}.{extension}"
+
+    def save(self, write: Callable[[str], None], extension: str, tenant: str = "",
+             label: str = "", kind: str = "") -> Path:
+        """
+        Write a file atomically and record it in the manifest
+
+        Args:
+            write: Function that writes the content to the path it is given
+            extension: File extension without the dot
+            tenant: Tenant or persona the file belongs to
+            label: Optional readable prefix for the file name
+            kind: Media kind recorded in the manifest ("image", "voice", ...)
+
+        Returns:
+            Path of the stored file
+        """
+        path = self.new_path(extension, tenant, label)
+        partial = path.with_name(path.name + ".part")
+        try:
+            write(str(partial))
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        self.register(path, tenant, kind)
+        return path
+
+    def register(self, path, tenant: str = "", kind: str = "") -> str:
+        """Record an existing file in the manifest and return its media ID"""
+        media_id = Path(path).stem.rsplit("_", 1)[-1]
+        if len(media_id) != 32:
+            media_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO media (media_id, path, tenant, kind, size_bytes, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (media_id, str(path), tenant, kind, os.path.getsize(path), time.time()),
+            )
+            self._conn.commit()
+        return media_id
+
+    def find(self, tenant: Optional[str] = None, kind: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None,
+             limit: Optional[int] = None) -> List[Dict]:
+        """
+        Look up stored files in the manifest, newest first
+
+        Args:
+            tenant: Only files for this tenant
+            kind: Only files of this kind
+            since: Only files created at or after this Unix time
+            until: Only files created before this Unix time
+            limit: Maximum number of rows
+
+        Returns:
+            Rows with media_id, path, tenant, kind, size_bytes and created_at
+        """
+        clauses, params = [], []
+        for column, op, value in (("tenant", "=", tenant), ("kind", "=", kind),
+                                  ("created_at", ">=", since), ("created_at", "<", until)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        query = "SELECT media_id, path, tenant, kind, size_bytes, created_at FROM media"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        columns = ("media_id", "path", "tenant", "kind", "size_bytes", "created_at")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def add_delete_listener(self, callback: Callable[[List[str]], None]):
+        """
+        Call a function with the paths of files this storage deletes
+
+        Bound methods are held weakly, so a listener does not keep its
+        object alive.
+
+        Args:
+            callback: Called with a list of deleted paths
+        """
+        try:
+            reference = weakref.WeakMethod(callback)
+        except TypeError:
+            reference = lambda: callback
+        with self._lock:
+            self._delete_listeners.append(reference)
+
+    def _notify_deleted(self, paths: List[str]):
+        if not paths:
+            return
+        with self._lock:
+            self._delete_listeners = [ref for ref in self._delete_listeners if ref() is not None]
+            callbacks = [ref() for ref in self._delete_listeners]
+        for callback in callbacks:
+            if callback is not None:
+                callback(paths)
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        # Drop shard directories left empty
+        for directory in list(Path(path).parents)[:4]:
+            try:
+                directory.rmdir()
+            except OSError:
+                break
+
+    def delete(self, path) -> bool:
+        """
+        Delete one stored file and its manifest row
+
+        Args:
+            path: Path as returned by save() or register()
+
+        Returns:
+            True if the file was in the manifest
+        """
+        path = str(path)
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM media WHERE path = ?", (path,)).rowcount
+            self._conn.commit()
+            self._remove_file(path)
+        self._notify_deleted([path])
+        return bool(removed)
+
+    def delete_older_than(self, days: float) -> int:
+        """
+        Retention: delete files created more than `days` ago
+
+        Returns:
+            Number of files removed
+        """
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT media_id, path FROM media WHERE created_at < ?", (cutoff,)).fetchall()
+            for media_id, path in rows:
+                self._remove_file(path)
+            self._conn.execute("DELETE FROM media WHERE created_at < ?", (cutoff,))
+            self._conn.commit()
+        self._notify_deleted([path for media_id, path in rows])
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_open_storages: Dict[str, MediaStorage] = {}
+_open_storages_lock = threading.Lock()
+
+
+def open_media_storage(root: str) -> MediaStorage:
+    """Return the process-wide storage for a root directory"""
+    key = os.path.abspath(root)
+    with _open_storages_lock:
+        storage = _open_storages.get(key)
+        if storage is None:
+            storage = MediaStorage(root)
+            _open_storages[key] = storage
+        return storage
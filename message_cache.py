@@ -0,0 +1,218 @@
+"""
+Persistent message cache for Anti-Grammy-Scammy
+
+Scheduled check-in messages come from a handful of canned prompts sent to
+the same persona, so the LLM call can be made ahead of time. This module
+stores generated responses in SQLite, addressed by a hash of
+(system prompt, prompt, model name):
+- A key can hold a pool of several responses, filled during off-peak hours
+  and served at send time with near-zero latency
+- Entries expire after a TTL and the least recently used entries are evicted
+  once the cache exceeds its size limit
+- Hit/miss statistics are kept for the lifetime of the cache object
+"""
+
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def make_cache_key(system_prompt: str, prompt: str, model_name: str) -> str:
+    """Return the content address for a prompt sent to a persona and model"""
+    digest = hashlib.sha256()
+    for part in (system_prompt, prompt, model_name):
+        encoded = part.encode("utf-8")
+        # Length-prefix each part so ("ab", "c") and ("a", "bc") differ
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+_open_caches: Dict[str, "MessageCache"] = {}
+_open_caches_lock = threading.Lock()
+
+
+def open_message_cache(path: str = "message_cache.db", ttl_seconds: Optional[float] = None,
+                       max_entries: Optional[int] = None, owner: str = "") -> "MessageCache":
+    """
+    Return the process-wide cache for a database path
+
+    Companions (and tenants) configured with the same path share one
+    connection and one set of statistics. Each owner's limits are applied on
+    every call, so a config reload takes effect; when owners ask for
+    different limits, the largest is used (see MessageCache.set_limits).
+
+    Args:
+        path: SQLite database file
+        ttl_seconds: Requested entry lifetime (None for the default)
+        max_entries: Requested size limit (None for the default)
+        owner: Who is asking, e.g. the tenant ID
+    """
+    with _open_caches_lock:
+        cache = _open_caches.get(path)
+        if cache is None:
+            cache = MessageCache(path)
+            _open_caches[path] = cache
+    if ttl_seconds is not None or max_entries is not None:
+        cache.set_limits(owner, ttl_seconds, max_entries)
+    return cache
+
+
+class MessageCache:
+    """SQLite-backed cache of generated messages with TTL and LRU eviction"""
+
+    def __init__(self, path: str = "message_cache.db", ttl_seconds: float = 72 * 3600,
+                 max_entries: int = 1000):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite database file (":memory:" for a temporary cache)
+            ttl_seconds: Age after which an entry is no longer served
+            max_entries: Maximum number of stored responses before LRU eviction
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.default_limits = (ttl_seconds, max_entries)
+        # Owner -> (ttl_seconds, max_entries) it asked for
+        self._limits: Dict[str, Tuple[float, int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                cache_key TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_key ON messages (cache_key, created_at);
+            CREATE INDEX IF NOT EXISTS idx_messages_access ON messages (last_access);
+        """)
+        self._conn.commit()
+
+    def get(self, key: str, consume: bool = True) -> Optional[str]:
+        """
+        Return a cached response for a key
+
+        Args:
+            key: Cache key from make_cache_key
+            consume: Remove the response once served, so a pool of
+                     pre-generated messages never repeats the same text
+
+        Returns:
+            The oldest fresh response for the key, or None on a miss
+        """
+        return self.get_any([key], consume=consume)
+
+    def get_any(self, keys: Iterable[str], consume: bool = True) -> Optional[str]:
+        """Return a cached response for any of several keys (see get)"""
+        keys = list(keys)
+        if not keys:
+            return None
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT id, response FROM messages WHERE cache_key IN ({placeholders}) "
+                "AND created_at >= ? ORDER BY created_at LIMIT 1",
+                (*keys, now - self.ttl_seconds),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            if consume:
+                self._conn.execute("DELETE FROM messages WHERE id = ?", (row[0],))
+            else:
+                self._conn.execute("UPDATE messages SET last_access = ? WHERE id = ?", (now, row[0]))
+            self._conn.commit()
+            self.hits += 1
+            return row[1]
+
+    def put(self, key: str, response: str):
+        """Add a response to the pool for a key, evicting old entries if needed"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO messages (cache_key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def set_limits(self, owner: str, ttl_seconds: Optional[float] = None,
+                   max_entries: Optional[int] = None):
+        """
+        Record the limits an owner wants and apply the largest requested
+
+        Calling again for the same owner replaces its earlier request, so a
+        reload can shrink the cache. Shrinking evicts at once.
+
+        Args:
+            owner: Who is asking, e.g. the tenant ID
+            ttl_seconds: Requested entry lifetime (None for the default)
+            max_entries: Requested size limit (None for the default)
+        """
+        default_ttl, default_entries = self.default_limits
+        with self._lock:
+            self._limits[owner] = (
+                default_ttl if ttl_seconds is None else ttl_seconds,
+                default_entries if max_entries is None else max_entries,
+            )
+            ttl_seconds = max(ttl for ttl, _ in self._limits.values())
+            max_entries = max(entries for _, entries in self._limits.values())
+            if (ttl_seconds, max_entries) == (self.ttl_seconds, self.max_entries):
+                return
+            self.ttl_seconds, self.max_entries = ttl_seconds, max_entries
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used beyond max_entries"""
+        self._conn.execute("DELETE FROM messages WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        overflow = self._count() - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM messages WHERE id IN "
+                "(SELECT id FROM messages ORDER BY last_access LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def _count(self, key: Optional[str] = None) -> int:
+        if key is None:
+            return self._conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        return self._conn.execute(
+            "SELECT COUNT(*) FROM messages WHERE cache_key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl_seconds),
+        ).fetchone()[0]
+
+    def pool_size(self, key: str) -> int:
+        """Return the number of fresh responses stored for a key"""
+        with self._lock:
+            return self._count(key)
+
+    def stats(self) -> Dict:
+        """Return hit/miss statistics and the current number of entries"""
+        with self._lock:
+            entries = self._count()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,221 @@
+"""
+Message history log for Anti-Grammy-Scammy
+
+Every sent message is recorded as a structured row in SQLite instead of being
+appended as free text to message_log.txt:
+- Each entry has the timestamp, tenant, recipient, prompt, model, generation
+  latency, SMS status and the paths of any media sent with it
+- Entries are buffered in memory and written in batches by a background
+  thread, so the send path never waits on disk I/O. A batch that fails to
+  write (disk full, database locked) stays buffered and is retried
+- Indexes on recipient, tenant and day make history lookups fast no matter
+  how large the log grows
+"""
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+COLUMNS = ("timestamp", "day", "tenant", "recipient", "message", "prompt", "model",
+           "latency", "source", "sms_status", "media")
+
+
+class MessageLog:
+    """Buffered, indexed SQLite log of sent messages"""
+
+    def __init__(self, path: str = "message_log.db", flush_interval: float = 1.0,
+                 batch_size: int = 100, max_buffer: int = 10000):
+        """
+        Initialize the log
+
+        Args:
+            path: SQLite database file
+            flush_interval: Seconds between background flushes
+            batch_size: Buffered entries that trigger an immediate flush
+            max_buffer: Entries kept while writes are failing; the oldest
+                        are dropped beyond this
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._buffer: List[tuple] = []
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp REAL NOT NULL,
+                day TEXT NOT NULL,
+                tenant TEXT NOT NULL,
+                recipient TEXT NOT NULL,
+                message TEXT NOT NULL,
+                prompt TEXT,
+                model TEXT,
+                latency REAL,
+                source TEXT,
+                sms_status TEXT,
+                media TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_recipient ON messages (recipient, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_messages_tenant ON messages (tenant, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_messages_day ON messages (day, timestamp);
+        """)
+        self._conn.commit()
+        self._thread = threading.Thread(target=self._run, name="message-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, message: str, tenant: str = "", recipient: str = "",
+               prompt: Optional[str] = None, model: Optional[str] = None,
+               latency: Optional[float] = None, source: Optional[str] = None,
+               sms_status: Optional[str] = None, media: Optional[List[str]] = None,
+               timestamp: Optional[float] = None):
+        """
+        Buffer one sent message for writing
+
+        Args:
+            message: Message text
+            tenant: Tenant ID or persona name
+            recipient: Recipient phone number (or "" when not sent by SMS)
+            prompt: Prompt the message was generated from
+            model: Model name
+            latency: Generation time in seconds
+            source: Where the message came from ("llm", "cache", "fallback")
+            sms_status: "queued", "failed", or None when SMS was not used
+            media: Paths of images or voice files sent with the message
+            timestamp: Unix time of the send (defaults to now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        day = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+        row = (timestamp, day, tenant, recipient, message, prompt, model, latency, source,
+               sms_status, json.dumps(media or []))
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Write all buffered entries in one transaction"""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        try:
+            with self._db_lock:
+                try:
+                    self._conn.executemany(
+                        f"INSERT INTO messages ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        rows,
+                    )
+                    self._conn.commit()
+                except sqlite3.Error:
+                    self._conn.rollback()
+                    raise
+        except sqlite3.Error:
+            # Keep the batch, ahead of anything recorded since, for the next flush
+            with self._lock:
+                self._buffer = (rows + self._buffer)[-self.max_buffer:]
+            raise
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"Error writing message log: {e}")
+
+    def query(self, recipient: Optional[str] = None, tenant: Optional[str] = None,
+              day: Optional[str] = None, limit: Optional[int] = 50) -> List[Dict]:
+        """
+        Look up logged messages, newest first
+
+        Args:
+            recipient: Only messages to this phone number
+            tenant: Only messages from this tenant
+            day: Only messages from this day ("YYYY-MM-DD")
+            limit: Maximum number of entries (None for all)
+
+        Returns:
+            Entries as dicts with the fields passed to record()
+        """
+        self.flush()
+        clauses, params = [], []
+        for column, value in (("recipient", recipient), ("tenant", tenant), ("day", day)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        query = f"SELECT {', '.join(COLUMNS)} FROM messages"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY timestamp DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._db_lock:
+            rows = self._conn.execute(query, params).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(zip(COLUMNS, row))
+            entry["media"] = json.loads(entry["media"] or "[]")
+            entries.append(entry)
+        return entries
+
+    def close(self):
+        """Flush remaining entries and stop the writer thread"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        try:
+            self.flush()
+        except sqlite3.Error as e:
+            print(f"Error writing message log: {e}")
+        with self._db_lock:
+            self._conn.close()
+
+
+_open_logs: Dict[str, MessageLog] = {}
+_open_logs_lock = threading.Lock()
+
+
+def open_message_log(path: str = "message_log.db", **kwargs) -> MessageLog:
+    """Return the process-wide log for a database file"""
+    key = os.path.abspath(path)
+    with _open_logs_lock:
+        log = _open_logs.get(key)
+        if log is None or log._closed:
+            log = MessageLog(path, **kwargs)
+            _open_logs[key] = log
+        return log
+
+
+def format_entry(entry: Dict) -> str:
+    """Format a log entry for display"""
+    timestamp = datetime.fromtimestamp(entry["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+    details = [part for part in (
+        entry["tenant"],
+        f"to {entry['recipient']}" if entry["recipient"] else "",
+        f"SMS {entry['sms_status']}" if entry["sms_status"] else "",
+        f"{entry['latency']:.2f}s" if entry["latency"] is not None else "",
+    ) if part]
+    lines = [f"[{timestamp}] {' | '.join(details)}", entry["message"]]
+    lines += [f"  media: {path}" for path in entry["media"]]
+    return "\n".join(lines)
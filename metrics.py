@@ -0,0 +1,321 @@
+"""
+Latency metrics for Anti-Grammy-Scammy
+
+Records how long each stage of the pipeline takes (LLM call, cache lookup,
+gTTS, DALL-E request and download, Twilio send, ...) in per-stage
+histograms, so a late scheduled send can be traced to the slow stage:
+
+    with span("llm"):
+        reply = agent.run(prompt)
+
+Metrics are off by default. While disabled, span() returns a shared no-op
+object, which costs well under a microsecond (see bench_metrics.py). Enable
+them with the "metrics" config section:
+
+    "metrics": {
+        "enabled": true,
+        "port": 9100,            # Prometheus text at http://host:9100/metrics (0 = off)
+        "dump_path": "",         # also write a JSON snapshot to this file...
+        "dump_interval": 60      # ...every this many seconds
+    }
+
+The webhook server (--serve) also answers GET /metrics.
+"""
+
+import os
+import json
+import time
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Bucketed distribution of durations for one stage"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, error: bool = False):
+        """Record one duration"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+            if error:
+                self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile in seconds (the upper bound of its bucket)"""
+        with self._lock:
+            counts, total, largest = list(self.counts), self.count, self.max
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], largest) if index < len(self.buckets) else largest
+        return largest
+
+    def snapshot(self) -> Dict:
+        """Return count, errors and timings in milliseconds"""
+        with self._lock:
+            count, total, largest, errors = self.count, self.sum, self.max, self.errors
+            cumulative, running = [], 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), self.counts):
+                running += bucket
+                cumulative.append(("+Inf" if bound == float("inf") else bound, running))
+        return {
+            "count": count,
+            "errors": errors,
+            "mean_ms": total / count * 1000 if count else 0.0,
+            "p50_ms": self.quantile(0.5) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": largest * 1000,
+            "sum_seconds": total,
+            "buckets": cumulative,
+        }
+
+
+class _NoopSpan:
+    """Returned by span() while metrics are disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Times one stage and records it when the block exits"""
+
+    __slots__ = ("registry", "stage", "started")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self.registry = registry
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.stage, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+
+class MetricsRegistry:
+    """Per-stage latency histograms"""
+
+    def __init__(self, enabled: bool = False, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.started = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def span(self, stage: str):
+        """Context manager timing a stage (a no-op while disabled)"""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        """Record a duration for a stage"""
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        histogram.observe(seconds, error)
+
+    def stages(self) -> List[str]:
+        """Names of the stages recorded so far"""
+        with self._lock:
+            return sorted(self._histograms)
+
+    def snapshot(self) -> Dict:
+        """Return every stage's statistics (see Histogram.snapshot)"""
+        return {stage: self._histograms[stage].snapshot() for stage in self.stages()}
+
+    def render_prometheus(self, prefix: str = "antiscammy") -> str:
+        """Return the histograms in the Prometheus text exposition format"""
+        name = f"{prefix}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each pipeline stage",
+                 f"# TYPE {name} histogram"]
+        errors = [f"# HELP {prefix}_stage_errors_total Stage runs that raised an exception",
+                  f"# TYPE {prefix}_stage_errors_total counter"]
+        for stage, stats in self.snapshot().items():
+            label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in stats["buckets"]:
+                lines.append(f'{name}_bucket{{stage="{label}",le="{bound}"}} {count}')
+            lines.append(f'{name}_sum{{stage="{label}"}} {stats["sum_seconds"]:.6f}')
+            lines.append(f'{name}_count{{stage="{label}"}} {stats["count"]}')
+            errors.append(f'{prefix}_stage_errors_total{{stage="{label}"}} {stats["errors"]}')
+        return "\n".join(lines + errors) + "\n"
+
+    def to_json(self) -> str:
+        """Return a JSON snapshot of every stage (buckets omitted)"""
+        stages = {}
+        for stage, stats in self.snapshot().items():
+            stats.pop("buckets")
+            stages[stage] = stats
+        return json.dumps({"time": time.time(), "uptime_seconds": time.time() - self.started,
+                           "stages": stages}, indent=2)
+
+    def dump(self, path: str):
+        """Write the JSON snapshot to a file (replaced atomically)"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.to_json())
+        os.replace(temporary, path)
+
+    def reset(self):
+        """Forget every recorded duration"""
+        with self._lock:
+            self._histograms = {}
+        self.started = time.time()
+
+
+# Process-wide registry used by span()
+metrics = MetricsRegistry()
+
+
+def span(stage: str):
+    """
+    Time a pipeline stage in the shared registry
+
+    Args:
+        stage: Stage name, e.g. "llm", "tts_gtts" or "twilio"
+
+    Returns:
+        Context manager; a shared no-op while metrics are disabled
+    """
+    if not metrics.enabled:
+        return _NOOP_SPAN
+    return _Span(metrics, stage)
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0"):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a background thread
+
+    Args:
+        port: Port to listen on
+        host: Interface to bind
+
+    Returns:
+        The running HTTP server (call shutdown() to stop it)
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = metrics.render_prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = metrics.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+class MetricsDumper:
+    """Write the JSON snapshot to a file every interval from a background thread"""
+
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start dumping"""
+        self._thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop after one final dump"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            stopped = self._stop_event.wait(self.interval)
+            try:
+                metrics.dump(self.path)
+            except OSError as e:
+                print(f"Error writing metrics to {self.path}: {e}")
+            if stopped:
+                return
+
+
+def start_metrics(settings: Optional[Dict]) -> Dict:
+    """
+    Enable metrics and start the exporters configured in a "metrics" config section
+
+    Args:
+        settings: The "metrics" section (nothing happens unless "enabled" is true)
+
+    Returns:
+        Dict with the running "server" and "dumper", where started (see stop_metrics)
+    """
+    settings = settings or {}
+    started = {}
+    if not settings.get("enabled"):
+        return started
+    metrics.enabled = True
+    port = settings.get("port", 0)
+    if port:
+        try:
+            started["server"] = serve_metrics(port, settings.get("host", "0.0.0.0"))
+            print(f"Metrics at http://localhost:{port}/metrics")
+        except OSError as e:
+            print(f"Error starting metrics server on port {port}: {e}")
+    if settings.get("dump_path"):
+        started["dumper"] = MetricsDumper(settings["dump_path"], settings.get("dump_interval", 60))
+        started["dumper"].start()
+    return started
+
+
+def stop_metrics(started: Dict):
+    """Stop the exporters returned by start_metrics (the dumper writes a final snapshot)"""
+    if "server" in started:
+        started["server"].shutdown()
+    if "dumper" in started:
+        started["dumper"].stop()
@@ -0,0 +1,316 @@
+"""
+Offline message generator for Anti-Grammy-Scammy
+
+When the remote model is slow or down, scheduled check-ins used to fall back
+to one hard-coded sentence. This module writes them locally instead, in
+microseconds and with no network:
+- Templates for each kind of check-in (how are you, a story, hobbies,
+  encouragement, a joke) are filled in from the persona's name and interests
+- A small word-level Markov chain, trained on a bundled corpus of warm
+  sentences plus sentences built from the persona's interests and backstory,
+  adds a line in the persona's voice so messages do not repeat
+
+LatencyBudget decides when to switch: a remote call that fails or takes
+longer than the budget is abandoned for an offline message, and the remote
+model is skipped for a cooldown period afterwards so the following sends are
+not held up either.
+"""
+
+import re
+import time
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config_model import PersonaConfig
+
+
+# Sentences in a companion's voice the Markov chain learns from
+CORPUS = [
+    "I was just thinking about you and it made me smile.",
+    "I hope the sun is shining wherever you are today.",
+    "I made a pot of tea this morning and thought of our last chat.",
+    "I spent the afternoon in the garden and the roses are finally blooming.",
+    "I tried a new recipe last night and it turned out better than I expected.",
+    "I found an old photograph this morning and it brought back so many happy memories.",
+    "I went for a short walk and the birds were singing the whole way.",
+    "I read a lovely story today about neighbors helping each other.",
+    "I hope you are taking good care of yourself and getting plenty of rest.",
+    "I always feel better after we talk, even for a few minutes.",
+    "I remember how much you laughed at that silly story I told you.",
+    "I think the little things in life are often the most important.",
+    "I had a quiet morning with a good book and a warm cup of coffee.",
+    "I heard your favorite song on the radio and had to sing along.",
+    "I hope your day is full of small and happy surprises.",
+    "I was looking at the clouds this morning and one looked just like a teapot.",
+    "I am so grateful to have someone as kind as you to talk to.",
+    "I baked cookies today and the whole house smells wonderful.",
+    "I watched the sunset yesterday evening and it was beautiful.",
+    "I hope you had something tasty for breakfast this morning.",
+    "I would love to hear what you have been up to lately.",
+    "I think a good laugh is the best medicine there is.",
+]
+
+TEMPLATES = {
+    "check_in": [
+        "Good {time_of_day}! {line} How are you feeling today?",
+        "Hi there! {line} Tell me how your {weekday} is going.",
+        "Just checking in on you this {time_of_day}. {line} What have you been up to?",
+        "Hello, my dear! {line} I hope you're doing well today.",
+    ],
+    "story": [
+        "I have to tell you something. {line} It reminded me of how lucky I am to know you.",
+        "Here's a little story from my {weekday}. {line} Do you have any stories for me?",
+        "{line} Isn't it funny how the small moments are the ones we remember?",
+    ],
+    "hobbies": [
+        "I've been spending time on {interest} lately. {line} Have you been doing any {other_interest}?",
+        "{line} It got me wondering, what's your favorite part of {interest}?",
+        "Do you enjoy {interest} as much as I do? {line} I'd love to hear about your hobbies.",
+    ],
+    "encouragement": [
+        "I just wanted to remind you how special you are. {line} You make the world brighter.",
+        "{line} Whatever today brings, I know you can handle it. I'm always here for you.",
+        "You are stronger than you know. {line} Be gentle with yourself today.",
+    ],
+    "joke": [
+        "Here's one to make you smile: {joke} {line}",
+        "{line} And a little joke for you: {joke}",
+    ],
+}
+
+JOKES = [
+    "Why did the tomato blush? Because it saw the salad dressing!",
+    "What do you call a sleeping bull? A bulldozer!",
+    "Why don't eggs tell jokes? They'd crack each other up!",
+    "What did one plate say to the other? Lunch is on me!",
+    "Why did the scarecrow win an award? He was outstanding in his field!",
+    "How does a penguin build its house? Igloos it together!",
+]
+
+_START = ("", "")
+_WORD = re.compile(r"\S+")
+
+
+def prompt_kind(prompt: str) -> str:
+    """Map a check-in prompt to the kind of message it asks for"""
+    lowered = (prompt or "").lower()
+    for keyword, kind in (("story", "story"), ("memory", "story"), ("hobbies", "hobbies"),
+                          ("interests", "hobbies"), ("encouragement", "encouragement"),
+                          ("joke", "joke"), ("fun fact", "joke")):
+        if keyword in lowered:
+            return kind
+    return "check_in"
+
+
+def split_interests(interests: str) -> List[str]:
+    """Split "gardening, reading and cooking" into ["gardening", "reading", "cooking"]"""
+    parts = re.split(r",|\band\b|;", interests or "")
+    return [part.strip() for part in parts if part.strip()] or ["my hobbies"]
+
+
+def persona_sentences(persona: PersonaConfig) -> List[str]:
+    """Sentences built from the persona's interests and backstory"""
+    sentences = []
+    for interest in split_interests(persona.interests):
+        sentences.append(f"I spent some time on {interest} today and it made me so happy.")
+        sentences.append(f"I was telling a friend how much I love {interest}.")
+    backstory = (persona.backstory or "").strip().rstrip(".")
+    if backstory:
+        if re.match(r"(?i)^(i|my|we)\b", backstory):
+            sentences.append(backstory[0].upper() + backstory[1:] + ".")
+        else:
+            sentences.append(f"As a {backstory[0].lower() + backstory[1:]}, I have learned to treasure every day.")
+    return sentences
+
+
+class MarkovChain:
+    """Second-order word Markov chain over whole sentences"""
+
+    def __init__(self, sentences: List[str]):
+        self._next: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for sentence in sentences:
+            state = _START
+            for word in _WORD.findall(sentence) + [""]:
+                self._next[state].append(word)
+                state = (state[1], word)
+        self._next = dict(self._next)
+
+    def sentence(self, rng: random.Random, max_words: int = 30) -> str:
+        """Generate one sentence"""
+        words = []
+        state = _START
+        while len(words) < max_words:
+            word = rng.choice(self._next[state])
+            if not word:
+                break
+            words.append(word)
+            state = (state[1], word)
+        text = " ".join(words)
+        if text and text[-1] not in ".!?":
+            text += "."
+        return text
+
+
+class OfflineGenerator:
+    """Write check-in messages for a persona without a model"""
+
+    def __init__(self, persona: PersonaConfig, seed: Optional[int] = None):
+        """
+        Initialize the generator
+
+        Args:
+            persona: Persona section of a config snapshot
+            seed: Random seed (for repeatable output in tests)
+        """
+        self.persona = persona
+        self.interests = split_interests(persona.interests)
+        # Persona sentences count twice so they show up often
+        own = persona_sentences(persona)
+        self.chain = MarkovChain(CORPUS + own + own)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str = "") -> str:
+        """
+        Write a message
+
+        Args:
+            prompt: Check-in prompt the message answers (see CHECK_IN_PROMPTS)
+
+        Returns:
+            The message
+        """
+        now = time.localtime()
+        hour = now.tm_hour
+        with self._lock:
+            rng = self._random
+            template = rng.choice(TEMPLATES[prompt_kind(prompt)])
+            interest = rng.choice(self.interests)
+            others = [other for other in self.interests if other != interest]
+            return template.format(
+                line=self.chain.sentence(rng),
+                interest=interest,
+                other_interest=rng.choice(others) if others else "something fun",
+                joke=rng.choice(JOKES),
+                name=self.persona.name,
+                time_of_day="morning" if hour < 12 else "afternoon" if hour < 17 else "evening",
+                weekday=time.strftime("%A", now),
+            )
+
+
+@lru_cache(maxsize=256)
+def get_offline_generator(persona: PersonaConfig) -> OfflineGenerator:
+    """Return the shared generator for a persona (built once per persona)"""
+    return OfflineGenerator(persona)
+
+
+class LatencyBudget:
+    """Decide whether to wait for the remote model or write a message offline"""
+
+    def __init__(self, budget: float = 10.0, cooldown: float = 300.0):
+        """
+        Initialize the budget
+
+        Args:
+            budget: Seconds a remote call may take before an offline message is used
+            cooldown: Seconds the remote model is skipped after it failed or was too slow
+        """
+        self.budget = budget
+        self.cooldown = cooldown
+        self.remote_ok = 0
+        self.remote_failed = 0
+        self._skip_until = 0.0
+
+    def use_remote(self) -> bool:
+        """Whether the remote model should be tried (False while cooling down)"""
+        return time.monotonic() >= self._skip_until
+
+    def record_success(self):
+        """Record a remote call that finished within the budget"""
+        self.remote_ok += 1
+
+    def record_failure(self):
+        """Record a remote call that failed or ran over; starts the cooldown"""
+        self.remote_failed += 1
+        self._skip_until = time.monotonic() + self.cooldown
+
+    def call(self, func: Callable, *args, on_late: Optional[Callable] = None):
+        """
+        Run a remote call in a worker thread, waiting at most the budget
+
+        Args:
+            func: Blocking remote call
+            *args: Arguments passed to func
+            on_late: Called with the result if the call finishes after the budget
+
+        Returns:
+            The call's return value
+
+        Raises:
+            TimeoutError: If the call ran over the budget (it keeps running)
+            Exception: Whatever the call raised
+        """
+        future = _get_executor().submit(func, *args)
+        try:
+            result = future.result(timeout=self.budget)
+        except FutureTimeoutError:
+            self.record_failure()
+            if on_late is not None:
+                future.add_done_callback(
+                    lambda done: on_late(done.result()) if done.exception() is None else None)
+            raise TimeoutError(f"Remote model took longer than {self.budget}s")
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        """Return remote successes, failures and whether the remote model is being skipped"""
+        return {
+            "budget": self.budget,
+            "remote_ok": self.remote_ok,
+            "remote_failed": self.remote_failed,
+            "skipping_remote": not self.use_remote(),
+        }
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_budgets: Dict[Tuple[str, float, float], LatencyBudget] = {}
+_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="remote")
+        return _executor
+
+
+def get_latency_budget(provider: str, budget: float, cooldown: float) -> LatencyBudget:
+    """
+    Return the process-wide latency budget for a provider and settings
+
+    Companions with the same provider and settings share one budget (and
+    cooldown state); tenants configured differently each get their own, so
+    one tenant's settings never change another's.
+
+    Args:
+        provider: Provider key (see batch_generation.provider_key)
+        budget: Seconds a remote call may take
+        cooldown: Seconds to skip the provider after a failure
+
+    Returns:
+        Shared LatencyBudget
+    """
+    key = (provider, budget, cooldown)
+    with _lock:
+        entry = _budgets.get(key)
+        if entry is None:
+            entry = _budgets[key] = LatencyBudget(budget, cooldown)
+        return entry
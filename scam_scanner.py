@@ -0,0 +1,278 @@
+"""
+Scam phrase scanner for Anti-Grammy-Scammy
+
+Inspects text the resident receives from others or says to the companion for
+phrases scammers use ("gift card", "Western Union", "I'm stuck overseas",
+...). All phrases are compiled into one Aho-Corasick automaton, so a message
+is scanned in a single pass however many phrases the library holds:
+- The built-in library (DEFAULT_PHRASES) can be extended with a JSON file of
+  {"category": ["phrase", ...]}
+- Matching ignores case and only counts whole words ("bail" does not match
+  "available")
+- Scanners are built once per phrase library and shared
+
+Run `python anti_scammy.py --scan FILE` to check pasted text, or
+`python bench_scanner.py` for throughput.
+"""
+
+import os
+import json
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_PHRASES = {
+    "gift_card": [
+        "gift card", "gift cards", "itunes card", "google play card", "google play cards",
+        "steam card", "amazon card", "apple card", "scratch off the back", "read me the numbers",
+        "card numbers", "the code on the back",
+    ],
+    "wire_transfer": [
+        "western union", "moneygram", "wire transfer", "wire the money", "wire me",
+        "send it through zelle", "bank transfer", "money order", "cashier's check",
+    ],
+    "crypto": [
+        "bitcoin", "bitcoin atm", "crypto wallet", "cryptocurrency", "usdt",
+        "investment platform", "guaranteed returns", "double your money",
+    ],
+    "grandparent": [
+        "grandma it's me", "grandpa it's me", "i'm in jail", "i've been arrested", "bail money",
+        "don't tell mom", "don't tell dad", "i was in an accident", "i need a lawyer",
+        "i'm in trouble", "please don't tell anyone",
+    ],
+    "romance": [
+        "i'm stuck overseas", "stuck overseas", "on an oil rig", "deployed overseas",
+        "my camera is broken", "can't video chat", "customs fee", "plane ticket to see you",
+        "release my package", "my inheritance", "frozen account", "when i get my funds",
+    ],
+    "authority_threat": [
+        "arrest warrant", "warrant for your arrest", "social security number has been suspended",
+        "your social security number", "irs agent", "back taxes", "pay the fine",
+        "legal action against you", "medicare card", "your benefits will be stopped",
+    ],
+    "prize": [
+        "you have won", "you've won", "claim your prize", "processing fee", "lottery winnings",
+        "sweepstakes", "publishers clearing house", "jamaica lottery", "pay the taxes on your prize",
+    ],
+    "tech_support": [
+        "your computer has a virus", "remote access", "teamviewer", "anydesk",
+        "microsoft support", "refund department", "we refunded too much", "verify your account",
+        "account has been compromised", "suspicious activity on your account",
+    ],
+    "secrecy": [
+        "keep this between us", "keep it a secret", "don't tell your family", "don't tell anyone",
+        "act now", "right away or", "before it's too late",
+    ],
+}
+
+
+class ScanHit:
+    """One phrase found in scanned text"""
+
+    def __init__(self, phrase: str, category: str, start: int, end: int):
+        self.phrase = phrase
+        self.category = category
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f"ScanHit({self.phrase!r}, {self.category!r}, {self.start}, {self.end})"
+
+
+def normalize(text: str) -> str:
+    """Lowercase text and straighten curly apostrophes (keeps character offsets)"""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters lowercase to two ("İ" -> "i" + combining dot); keep
+        # the first so hit offsets still index the original text
+        lowered = "".join(char.lower()[0] for char in text)
+    return lowered.replace("’", "'")
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher: finds every pattern occurrence in one pass"""
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        """
+        Build the automaton
+
+        Args:
+            patterns: (pattern, value) pairs; value is returned with each match
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple] = [()]
+        outputs: List[List] = [[]]
+        for pattern, value in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                node = next_node
+            outputs[node].append((len(pattern), value))
+
+        # Breadth-first: each node's failure link is the longest proper suffix
+        # that is also in the trie, and it inherits that node's matches
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                outputs[child].extend(outputs[self._fail[child]])
+        self._out = [tuple(output) for output in outputs]
+
+    @property
+    def size(self) -> int:
+        """Number of automaton states"""
+        return len(self._goto)
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, value) for every pattern occurrence in text"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                end = index + 1
+                for length, value in out[node]:
+                    yield end - length, end, value
+
+
+class ScamScanner:
+    """Find scam phrases from a phrase library in text"""
+
+    def __init__(self, phrases: Optional[Dict[str, List[str]]] = None):
+        """
+        Initialize the scanner
+
+        Args:
+            phrases: Category -> phrases (default: DEFAULT_PHRASES)
+        """
+        phrases = DEFAULT_PHRASES if phrases is None else phrases
+        self.pattern_count = 0
+        entries = []
+        for category, items in phrases.items():
+            for phrase in items:
+                phrase = normalize(phrase.strip())
+                if phrase:
+                    entries.append((phrase, (phrase, category)))
+                    self.pattern_count += 1
+        self._automaton = AhoCorasick(entries)
+        self.scanned_chars = 0
+        self.hits_by_category: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def scan(self, text: str) -> List[ScanHit]:
+        """
+        Find every library phrase in text
+
+        Args:
+            text: Message or pasted text
+
+        Returns:
+            Whole-word hits in order of where they end
+        """
+        normalized = normalize(text)
+        hits = []
+        for start, end, (phrase, category) in self._automaton.iter_matches(normalized):
+            if start > 0 and normalized[start - 1].isalnum():
+                continue
+            if end < len(normalized) and normalized[end].isalnum():
+                continue
+            hits.append(ScanHit(phrase, category, start, end))
+        with self._lock:
+            self.scanned_chars += len(text)
+            for hit in hits:
+                self.hits_by_category[hit.category] = self.hits_by_category.get(hit.category, 0) + 1
+        return hits
+
+    def categories(self, text: str) -> List[str]:
+        """Return the categories of phrases found in text, in order of first hit"""
+        categories = []
+        for hit in self.scan(text):
+            if hit.category not in categories:
+                categories.append(hit.category)
+        return categories
+
+    def stats(self) -> Dict:
+        """Return pattern count, characters scanned and hits per category"""
+        with self._lock:
+            return {
+                "patterns": self.pattern_count,
+                "states": self._automaton.size,
+                "scanned_chars": self.scanned_chars,
+                "hits": dict(self.hits_by_category),
+            }
+
+
+def load_phrases(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Return the built-in phrase library merged with a JSON file of extra phrases
+
+    Args:
+        path: JSON file of {"category": ["phrase", ...]} (optional)
+
+    Returns:
+        Category -> phrases
+    """
+    phrases = {category: list(items) for category, items in DEFAULT_PHRASES.items()}
+    if not path:
+        return phrases
+    try:
+        with open(path) as f:
+            extra = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error loading scam phrases from {path}: {e}")
+        return phrases
+    for category, items in extra.items():
+        phrases.setdefault(category, []).extend(items)
+    return phrases
+
+
+_scanners: Dict[str, ScamScanner] = {}
+_scanners_lock = threading.Lock()
+
+
+def get_scam_scanner(phrases_path: Optional[str] = None) -> ScamScanner:
+    """
+    Return the shared scanner for a phrase library, building it on first use
+
+    Args:
+        phrases_path: JSON file of extra phrases (see load_phrases)
+    """
+    key = os.path.abspath(phrases_path) if phrases_path else ""
+    with _scanners_lock:
+        scanner = _scanners.get(key)
+        if scanner is None:
+            scanner = _scanners[key] = ScamScanner(load_phrases(phrases_path))
+        return scanner
+
+
+def format_hits(hits: List[ScanHit]) -> str:
+    """Describe hits as "phrase (category)" for display"""
+    seen = []
+    for hit in hits:
+        label = f"\"{hit.phrase}\" ({hit.category.replace('_', ' ')})"
+        if label not in seen:
+            seen.append(label)
+    return ", ".join(seen)
+
+
+def scan_guidance(hits: List[ScanHit]) -> str:
+    """Return the note added to a reply prompt when a message contains scam phrases"""
+    return (f"(Their message mentions things often seen in scams: {format_hits(hits)}. "
+            "Gently encourage them to check with family before sending money or personal details.)")
@@ -0,0 +1,541 @@
+"""
+Durable SMS outbox for Anti-Grammy-Scammy
+
+Messages are never sent directly from the scheduler. Instead they are written
+to an SQLite outbox and a background dispatcher delivers them:
+- Failed sends (Twilio 429s, 5xx errors, network blips) are retried with
+  exponential backoff and jitter until max_attempts is reached
+- Every message carries an idempotency key; enqueueing the same key twice
+  stores one message, so a message is only queued once however often the
+  caller retries (see sms_idempotency_key)
+- Pending messages survive restarts and are delivered on the next run
+- A message that was being sent when the process died is marked "unknown"
+  instead of being resent: Twilio may already have accepted it. It is then
+  checked against the transport's sent messages (where the transport can
+  look them up) and only queued again if it was not sent
+- Claimed messages carry a lease, and only messages whose lease expired are
+  treated as interrupted, so a second process sharing the outbox (such as
+  --test-sms while --run is going) never touches sends that are still in
+  flight
+
+Transports wrap the actual delivery. TwilioTransport sends through an
+SMSSender, and FakeTwilioTransport simulates Twilio locally (latency,
+rate limiting, failures) so throughput and retry behavior can be tested
+offline.
+"""
+
+import time
+import uuid
+import hashlib
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from metrics import span
+
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+# Was being sent when the process died; may or may not have been delivered
+UNKNOWN = "unknown"
+
+
+def sms_idempotency_key(tenant: str, slot: str, to_number: str) -> str:
+    """
+    Return the idempotency key of one logical message
+
+    Args:
+        tenant: Tenant ID or persona name of the sending companion
+        slot: What the message is for, e.g. the date and time of a scheduled send
+        to_number: Recipient phone number
+
+    Returns:
+        A stable key: retrying the same message yields the same key
+    """
+    return hashlib.sha256(f"{tenant}\n{slot}\n{to_number}".encode("utf-8")).hexdigest()[:32]
+
+
+class TransientSendError(Exception):
+    """A send failure worth retrying (rate limit, server error, network)"""
+
+
+class PermanentSendError(Exception):
+    """A send failure that will not succeed on retry (bad number, auth)"""
+
+
+class TwilioTransport:
+    """
+    Deliver messages through an SMSSender's Twilio client
+
+    Twilio's Messages API takes no idempotency key, so the key only
+    deduplicates locally. Sends cut off by a crash are checked with lookup().
+    """
+
+    def __init__(self, sms_sender):
+        self.sms_sender = sms_sender
+
+    def send(self, to_number: str, body: str, idempotency_key: str) -> str:
+        """
+        Send one message
+
+        Returns:
+            Twilio message SID
+
+        Raises:
+            TransientSendError: The send may succeed if retried
+            PermanentSendError: The send will not succeed if retried
+        """
+        client = self.sms_sender.client
+        if client is None or not self.sms_sender.is_configured():
+            raise PermanentSendError("SMS not configured")
+
+        try:
+            from twilio.base.exceptions import TwilioRestException
+        except ImportError:
+            raise PermanentSendError("Twilio not installed")
+
+        try:
+            with span("twilio"):
+                message = client.messages.create(
+                    body=body,
+                    from_=self.sms_sender.from_number,
+                    to=self.sms_sender.normalize_phone_number(to_number),
+                )
+            return message.sid
+        except TwilioRestException as e:
+            if e.status == 429 or e.status >= 500:
+                raise TransientSendError(f"Twilio {e.status}: {e.msg}")
+            raise PermanentSendError(f"Twilio {e.status}: {e.msg}")
+        except (ConnectionError, TimeoutError, OSError) as e:
+            raise TransientSendError(str(e))
+
+    def lookup(self, to_number: str, body: str, since: float, idempotency_key: str) -> Optional[str]:
+        """
+        Find a message Twilio accepted since a time
+
+        Messages are matched on their creation time, not their send time:
+        a message Twilio accepted but has not sent yet has no send date.
+
+        Args:
+            to_number: Recipient phone number
+            body: Message text
+            since: Unix timestamp the message was first queued at
+            idempotency_key: The message's key (unused: Twilio does not store it)
+
+        Returns:
+            The message SID, or None if Twilio has no such message
+
+        Raises:
+            Exception: If Twilio could not be asked (the message stays unknown)
+        """
+        client = self.sms_sender.client
+        if client is None:
+            raise PermanentSendError("SMS not configured")
+        for message in client.messages.list(
+            to=self.sms_sender.normalize_phone_number(to_number),
+            from_=self.sms_sender.from_number,
+            limit=100,
+        ):
+            # Allow for clock skew between this machine and Twilio
+            created = message.date_created.timestamp() if message.date_created else since
+            if created < since - 60:
+                continue
+            if message.body == body and message.status not in ("failed", "undelivered", "canceled"):
+                return message.sid
+        return None
+
+
+class FakeTwilioTransport:
+    """Local stand-in for Twilio used for offline testing and benchmarks"""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, fail_first: int = 0,
+                 seed: Optional[int] = None):
+        """
+        Initialize the fake transport
+
+        Args:
+            latency: Seconds each send takes
+            failure_rate: Probability that a send fails with a simulated 429
+            fail_first: Number of initial sends that fail with a simulated 429
+            seed: Random seed for reproducible failures
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_first = fail_first
+        self.attempts = 0
+        self.delivered: Dict[str, Dict] = {}
+        self.duplicates = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def send(self, to_number: str, body: str, idempotency_key: str) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.attempts += 1
+            if self.attempts <= self.fail_first or self._random.random() < self.failure_rate:
+                raise TransientSendError("Twilio 429: Too Many Requests (simulated)")
+            if idempotency_key in self.delivered:
+                self.duplicates += 1
+            else:
+                self.delivered[idempotency_key] = {"to": to_number, "body": body}
+            return f"SM{uuid.uuid5(uuid.NAMESPACE_OID, idempotency_key).hex}"
+
+    def lookup(self, to_number: str, body: str, since: float, idempotency_key: str) -> Optional[str]:
+        with self._lock:
+            if idempotency_key not in self.delivered:
+                return None
+        return f"SM{uuid.uuid5(uuid.NAMESPACE_OID, idempotency_key).hex}"
+
+
+class SMSOutbox:
+    """SQLite-backed queue of outgoing SMS messages"""
+
+    def __init__(self, path: str = "sms_outbox.db", lease: float = 300.0):
+        """
+        Open (or create) an outbox
+
+        Args:
+            path: SQLite database file
+            lease: Seconds a claimed message belongs to its dispatcher. A
+                   message still sending after that is assumed interrupted.
+                   Must exceed the longest time a single send can take.
+        """
+        self.path = path
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                idempotency_key TEXT PRIMARY KEY,
+                sender TEXT NOT NULL,
+                to_number TEXT NOT NULL,
+                body TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                sid TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                lease_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        if "lease_until" not in columns:
+            self._conn.execute("ALTER TABLE outbox ADD COLUMN lease_until REAL")
+        self.recover_expired()
+
+    def recover_expired(self) -> int:
+        """
+        Mark messages whose dispatcher died mid-send as unknown
+
+        They may have been delivered, so they are reconciled (see
+        OutboxDispatcher.reconcile) rather than resent. Messages still within
+        their lease belong to a live dispatcher, possibly in another process,
+        and are left alone.
+
+        Returns:
+            Number of messages marked unknown
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = ? WHERE status = ? AND "
+                "(lease_until IS NULL OR lease_until <= ?)",
+                (UNKNOWN, SENDING, time.time()),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def enqueue(self, to_number: str, body: str, idempotency_key: Optional[str] = None,
+                sender: str = "") -> str:
+        """
+        Add a message to the outbox
+
+        Args:
+            to_number: Recipient phone number
+            body: Message text
+            idempotency_key: Unique key for this message (see sms_idempotency_key;
+                             generated if omitted, in which case a retry is
+                             a new message). Enqueueing an existing key is a no-op.
+            sender: Name of the transport that should deliver the message
+
+        Returns:
+            The message's idempotency key
+        """
+        key = idempotency_key or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (idempotency_key, sender, to_number, body, status, "
+                "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, sender, to_number, body, PENDING, now, now, now),
+            )
+            self._conn.commit()
+        return key
+
+    def claim_due(self, limit: int = 50) -> List[Dict]:
+        """Mark up to limit due messages as sending and return them"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idempotency_key, sender, to_number, body, attempts FROM outbox "
+                "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, now, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE outbox SET status = ?, updated_at = ?, lease_until = ? WHERE idempotency_key = ?",
+                [(SENDING, now, now + self.lease, row[0]) for row in rows],
+            )
+            self._conn.commit()
+        return [
+            {"idempotency_key": row[0], "sender": row[1], "to_number": row[2], "body": row[3],
+             "attempts": row[4]}
+            for row in rows
+        ]
+
+    def unknown(self) -> List[Dict]:
+        """Return the messages whose delivery is unknown after a crash"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT idempotency_key, sender, to_number, body, attempts, created_at FROM outbox "
+                "WHERE status = ?",
+                (UNKNOWN,),
+            ).fetchall()
+        return [
+            {"idempotency_key": row[0], "sender": row[1], "to_number": row[2], "body": row[3],
+             "attempts": row[4], "created_at": row[5]}
+            for row in rows
+        ]
+
+    def _update(self, key: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE outbox SET {assignments} WHERE idempotency_key = ?",
+                (*fields.values(), key),
+            )
+            self._conn.commit()
+
+    def mark_sent(self, key: str, sid: str, attempts: int):
+        self._update(key, status=SENT, sid=sid, attempts=attempts, last_error=None)
+
+    def mark_unsent(self, key: str):
+        """Queue an unknown message again once it is known not to have been sent"""
+        self._update(key, status=PENDING, next_attempt_at=time.time())
+
+    def mark_retry(self, key: str, delay: float, error: str, attempts: int):
+        self._update(key, status=PENDING, next_attempt_at=time.time() + delay,
+                     last_error=error, attempts=attempts)
+
+    def mark_failed(self, key: str, error: str, attempts: int):
+        self._update(key, status=FAILED, last_error=error, attempts=attempts)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the stored state of a message, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, attempts, last_error, sid FROM outbox WHERE idempotency_key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "attempts": row[1], "last_error": row[2], "sid": row[3]}
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of messages in each status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxDispatcher:
+    """Background worker that drains an SMSOutbox with retries"""
+
+    def __init__(self, outbox: SMSOutbox, transport=None, max_attempts: int = 8,
+                 base_delay: float = 1.0, max_delay: float = 300.0, workers: int = 4,
+                 poll_interval: float = 0.5):
+        """
+        Initialize the dispatcher
+
+        Args:
+            outbox: Outbox to drain
+            transport: Default transport for messages without a registered sender
+            max_attempts: Attempts before a message is marked failed
+            base_delay: Retry delay after the first failure, doubled on each retry
+            max_delay: Upper bound on the retry delay
+            workers: Number of messages sent in parallel
+            poll_interval: Seconds between checks for due messages when idle
+        """
+        self.outbox = outbox
+        self.transports = {"": transport} if transport is not None else {}
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._reconcile_needed = True
+        self._recover_at = time.time() + outbox.lease / 2
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sms")
+
+    def register_transport(self, sender: str, transport):
+        """Use a transport for messages enqueued with this sender name"""
+        self.transports[sender] = transport
+        # Its unknown messages can now be checked
+        self._reconcile_needed = True
+        self._wakeup.set()
+
+    def backoff_delay(self, attempts: int) -> float:
+        """Return the retry delay after a number of failed attempts (with jitter)"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        # Equal jitter: spread retries out without ever retrying immediately
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _deliver(self, item: Dict):
+        key = item["idempotency_key"]
+        attempts = item["attempts"] + 1
+        transport = self.transports.get(item["sender"])
+        if transport is None:
+            self.outbox.mark_failed(key, f"No transport registered for sender {item['sender']!r}", attempts)
+            return
+        try:
+            sid = transport.send(item["to_number"], item["body"], key)
+            self.outbox.mark_sent(key, sid, attempts)
+        except PermanentSendError as e:
+            print(f"SMS {key} failed permanently: {e}")
+            self.outbox.mark_failed(key, str(e), attempts)
+        except Exception as e:
+            if attempts >= self.max_attempts:
+                print(f"SMS {key} failed after {attempts} attempts: {e}")
+                self.outbox.mark_failed(key, str(e), attempts)
+            else:
+                self.outbox.mark_retry(key, self.backoff_delay(attempts), str(e), attempts)
+
+    def reconcile(self) -> int:
+        """
+        Settle messages left unknown by a crash
+
+        Each one is looked up with its transport: found messages are marked
+        sent, missing ones are queued again. Messages whose transport cannot
+        look them up (or could not be reached) stay unknown rather than risk
+        a duplicate.
+
+        Returns:
+            Number of messages settled
+        """
+        settled = 0
+        for item in self.outbox.unknown():
+            key = item["idempotency_key"]
+            lookup = getattr(self.transports.get(item["sender"]), "lookup", None)
+            if lookup is None:
+                continue
+            try:
+                sid = lookup(item["to_number"], item["body"], item["created_at"], key)
+            except Exception as e:
+                print(f"SMS {key} could not be checked: {e}")
+                continue
+            if sid:
+                self.outbox.mark_sent(key, sid, item["attempts"] + 1)
+            else:
+                self.outbox.mark_unsent(key)
+            settled += 1
+        return settled
+
+    def drain_once(self) -> int:
+        """Send every message that is currently due; returns how many were attempted"""
+        if time.time() >= self._recover_at:
+            # Another process sharing the outbox may have died mid-send
+            self._recover_at = time.time() + self.outbox.lease / 2
+            if self.outbox.recover_expired():
+                self._reconcile_needed = True
+        if self._reconcile_needed:
+            self._reconcile_needed = False
+            self.reconcile()
+        items = self.outbox.claim_due(limit=self.workers * 8)
+        if items:
+            list(self._pool.map(self._deliver, items))
+        return len(items)
+
+    def notify(self):
+        """Wake the dispatcher because a new message was enqueued"""
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.drain_once():
+                    continue
+            except Exception as e:
+                print(f"SMS dispatcher error: {e}")
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def start(self):
+        """Start draining in a background thread (no-op if already running)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sms-outbox", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread; undelivered messages stay in the outbox"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wait_for(self, key: str, timeout: float = 30.0) -> str:
+        """
+        Wait until a message is sent or has failed
+
+        Args:
+            key: Idempotency key returned by enqueue
+            timeout: Maximum seconds to wait
+
+        Returns:
+            Final status ("sent", "failed" or "unknown"), or the current status on timeout
+        """
+        deadline = time.time() + timeout
+        while True:
+            state = self.outbox.get(key)
+            status = state["status"] if state else FAILED
+            if status in (SENT, FAILED, UNKNOWN) or time.time() >= deadline:
+                return status
+            time.sleep(0.05)
+
+
+_outboxes: Dict[str, SMSOutbox] = {}
+_dispatchers: Dict[str, OutboxDispatcher] = {}
+_registry_lock = threading.Lock()
+
+
+def open_sms_outbox(path: str = "sms_outbox.db", **dispatcher_options):
+    """
+    Return the process-wide outbox and dispatcher for a database path
+
+    Args:
+        path: SQLite database file
+        **dispatcher_options: Passed to OutboxDispatcher when first created
+
+    Returns:
+        Tuple of (SMSOutbox, OutboxDispatcher)
+    """
+    with _registry_lock:
+        if path not in _outboxes:
+            _outboxes[path] = SMSOutbox(path)
+            _dispatchers[path] = OutboxDispatcher(_outboxes[path], **dispatcher_options)
+        return _outboxes[path], _dispatchers[path]
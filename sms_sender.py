@@ -28,19 +28,33 @@ class SMSSender:
         self.auth_token = auth_token or os.getenv("TWILIO_AUTH_TOKEN")
         self.from_number = from_number or os.getenv("TWILIO_PHONE_NUMBER")
         
-        self.client = None
-        if self.account_sid and self.auth_token:
+        # The Twilio SDK is slow to import, so the client is created on first use
+        self._client = None
+        self._client_failed = False
+    
+    @property
+    def client(self):
+        """Twilio REST client, or None if Twilio is unavailable or not configured"""
+        if self._client is None and not self._client_failed and self.account_sid and self.auth_token:
             try:
-                from twilio.rest import Client
-                self.client = Client(self.account_sid, self.auth_token)
+                # Shared, connection-pooled client (reused by every sender with these credentials)
+                from http_transport import get_twilio_client
+                self._client = get_twilio_client(self.account_sid, self.auth_token)
             except ImportError:
                 print("Warning: Twilio not installed. Run: pip install twilio")
+                self._client_failed = True
             except Exception as e:
                 print(f"Warning: Could not initialize Twilio client: {e}")
+                self._client_failed = True
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
     
     def is_configured(self) -> bool:
         """Check if SMS sending is properly configured"""
-        return (self.client is not None and 
+        return (bool(self.account_sid) and bool(self.auth_token) and 
                 self.from_number is not None and 
                 len(self.from_number) > 0)
     
@@ -63,13 +77,11 @@ class SMSSender:
             print("No phone number specified")
             return False
         
-        # Ensure phone number is in E.164 format
-        if not to_number.startswith('+'):
-            print(f"Warning: Phone number should be in E.164 format (e.g., +1234567890), got: {to_number}")
-            # Try to add +1 for US numbers if it looks like a 10-digit number
-            if len(to_number.replace('-', '').replace(' ', '').replace('(', '').replace(')', '')) == 10:
-                to_number = '+1' + to_number.replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
-                print(f"Auto-formatted to: {to_number}")
+        to_number = self.normalize_phone_number(to_number)
+        
+        if self.client is None:
+            print("Twilio client unavailable. Check your Twilio installation and credentials")
+            return False
         
         try:
             message_obj = self.client.messages.create(
@@ -83,6 +95,25 @@ class SMSSender:
             print(f"Failed to send SMS: {e}")
             return False
     
+    def normalize_phone_number(self, to_number: str) -> str:
+        """
+        Convert a phone number to E.164 format where possible
+        
+        Args:
+            to_number: Phone number as entered
+            
+        Returns:
+            The number, with +1 added to 10-digit US numbers
+        """
+        # Ensure phone number is in E.164 format
+        if not to_number.startswith('+'):
+            print(f"Warning: Phone number should be in E.164 format (e.g., +1234567890), got: {to_number}")
+            # Try to add +1 for US numbers if it looks like a 10-digit number
+            if len(to_number.replace('-', '').replace(' ', '').replace('(', '').replace(')', '')) == 10:
+                to_number = '+1' + to_number.replace('-', '').replace(' ', '').replace('(', '').replace(')', '')
+                print(f"Auto-formatted to: {to_number}")
+        return to_number
+    
     def validate_phone_number(self, phone_number: str) -> bool:
         """
         Validate a phone number format
@@ -0,0 +1,92 @@
+"""
+Streaming helpers for Anti-Grammy-Scammy
+
+Replies can be streamed token by token (see AntiScammyCompanion.stream_reply)
+so the chat shows text as soon as the model starts writing instead of
+appearing frozen until the whole reply is done. This module has the pieces
+shared by stream consumers:
+- TimedStream measures time to first token and total time
+- chunk_sms groups a token stream into SMS-sized messages split at sentence
+  or word boundaries, so the first text can go out before the reply is done
+"""
+
+import time
+from typing import Iterable, Iterator, Optional
+
+
+# A single-segment SMS; longer messages are billed and delivered as several
+SMS_SEGMENT_LENGTH = 160
+
+
+class TimedStream:
+    """Iterate a token stream while recording timing and the full text"""
+
+    def __init__(self, tokens: Iterable[str]):
+        self._tokens = iter(tokens)
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.parts = []
+
+    def __iter__(self) -> Iterator[str]:
+        for token in self._tokens:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.parts.append(token)
+            yield token
+        self.finished_at = time.perf_counter()
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        """Seconds until the first token arrived, or None if none has"""
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started
+
+    @property
+    def total_time(self) -> Optional[float]:
+        """Seconds until the stream finished, or None while it is running"""
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started
+
+    @property
+    def text(self) -> str:
+        """Text received so far"""
+        return "".join(self.parts)
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Return where to end a chunk of at most limit characters"""
+    window = text[:limit]
+    for marks in (".!?\n", ",;:", " "):
+        index = max(window.rfind(mark) for mark in marks)
+        if index >= limit // 2:
+            return index + 1
+    return limit
+
+
+def chunk_sms(tokens: Iterable[str], limit: int = SMS_SEGMENT_LENGTH) -> Iterator[str]:
+    """
+    Group a token stream into SMS-sized chunks as tokens arrive
+
+    Each chunk is at most `limit` characters and ends at a sentence, clause
+    or word boundary where possible.
+
+    Args:
+        tokens: Token stream (or any iterable of text pieces)
+        limit: Maximum characters per chunk
+
+    Returns:
+        Iterator of stripped, non-empty chunks
+    """
+    buffer = ""
+    for token in tokens:
+        buffer += token
+        while len(buffer) > limit:
+            index = _split_point(buffer, limit)
+            chunk, buffer = buffer[:index].strip(), buffer[index:].lstrip()
+            if chunk:
+                yield chunk
+    if buffer.strip():
+        yield buffer.strip()
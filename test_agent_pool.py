@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Tests for the agent pool and the memoized system prompt
+"""
+
+import gc
+import os
+import sys
+import time
+import weakref
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from agent_pool import AgentPool, get_agent_pool
+from anti_scammy import AntiScammyCompanion
+
+
+class FakeAgent:
+    """Records prompts and history like a Swarms agent, without an LLM"""
+
+    def __init__(self, slot, latency=0.0):
+        self.slot = slot
+        self.latency = latency
+        self.short_memory = []
+
+    def short_memory_init(self):
+        return []
+
+    def run(self, prompt):
+        self.short_memory.append(prompt)
+        time.sleep(self.latency)
+        return f"agent {self.slot}: {prompt}"
+
+
+def test_pool_checkout():
+    """Test that concurrent checkouts never share an agent and stay within the size"""
+    print("Testing agent pool checkout...")
+
+    pool = AgentPool(lambda slot: FakeAgent(slot), size=3)
+    in_use, overlaps = set(), []
+    lock = threading.Lock()
+
+    def request():
+        with pool.checkout() as agent:
+            with lock:
+                if id(agent) in in_use:
+                    overlaps.append(agent)
+                in_use.add(id(agent))
+            time.sleep(0.02)
+            with lock:
+                in_use.discard(id(agent))
+
+    threads = [threading.Thread(target=request) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = pool.stats()
+    assert not overlaps, "An agent was checked out twice at once"
+    assert stats["created"] == 3 and stats["idle"] == 3, stats
+    assert stats["checkouts"] == 12 and stats["waits"] > 0, stats
+
+    # A full pool times out instead of building more agents
+    small = AgentPool(lambda slot: FakeAgent(slot), size=1)
+    held = small.acquire()
+    try:
+        small.acquire(timeout=0.05)
+        assert False, "Expected TimeoutError"
+    except TimeoutError:
+        pass
+    small.release(held)
+    assert small.acquire(timeout=0.05) is held
+
+    # A failing factory frees its slot
+    def flaky(slot):
+        raise RuntimeError("no model")
+    failing = AgentPool(flaky, size=1)
+    for _ in range(2):
+        try:
+            failing.acquire(timeout=0.05)
+            assert False, "Expected RuntimeError"
+        except RuntimeError:
+            pass
+    assert failing.stats()["created"] == 0
+
+    warm = AgentPool(lambda slot: FakeAgent(slot), size=2)
+    assert warm.warm(5) == 2 and warm.stats()["idle"] == 2
+
+    key = ("test_pool_checkout",)
+    shared = get_agent_pool(key, lambda slot: FakeAgent(slot), 2)
+    assert get_agent_pool(key, lambda slot: None, 4) is shared and shared.size == 4
+
+    print("✓ Agent pool checkout test passed")
+
+
+def test_companions_share_pool():
+    """Test that companions with one persona share its prompt and pooled agents"""
+    print("Testing shared agent pool...")
+
+    built = []
+
+    def fake_create_agent(saved_state_path=None):
+        agent = FakeAgent(len(built), latency=0.05)
+        built.append(saved_state_path)
+        return agent
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companions = []
+        for tenant in ("rose", "joe"):
+            companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, f"{tenant}.json"), tenant_id=tenant)
+            companion.config["persona"]["name"] = "PoolTestPersona"
+            companion.config["model"]["agent_pool_size"] = 2
+            companion.config["cache"]["enabled"] = False
+            companion.apply_config()
+            companion.create_agent = fake_create_agent
+            companions.append(companion)
+        rose, joe = companions
+
+        assert rose.system_prompt is joe.system_prompt, "Prompt not shared"
+        assert rose.get_agent_pool() is joe.get_agent_pool()
+
+        assert rose.generate_message("hello").endswith("hello")
+        assert joe.generate_message("hi").endswith("hi")
+        assert len(built) == 1, "Agent rebuilt per request"
+        assert "PoolTestPersona" in built[0] and "_0_state.json" in built[0]
+
+        # Concurrent requests get their own agents, up to the pool size
+        results = rose.generate_messages([f"prompt {i}" for i in range(6)], max_workers=6)
+        assert all(result.ok for result in results)
+        assert len(built) == 2
+        pool = rose.get_agent_pool()
+        assert pool.stats()["idle"] == 2
+        assert all(agent.short_memory == [] for agent in pool._idle), "History not cleared"
+
+        # The pool does not keep a companion that used it alive
+        # (amy's own API key gives her a pool of her own, which she creates)
+        amy = AntiScammyCompanion(config_path=os.path.join(tmpdir, "amy.json"), tenant_id="amy")
+        amy.config["persona"]["name"] = "PoolTestPersona"
+        amy.config["api_keys"]["openai_api_key"] = "amy-key"
+        amy.apply_config()
+        amy.create_agent = fake_create_agent
+        amy_pool = amy.get_agent_pool()
+        assert amy_pool is not pool, "Tenants with different API keys share agents"
+        assert amy.generate_message("hello").endswith("hello") and amy_pool.stats()["created"] == 1
+        assert built[-1].endswith("_0_state.json") and built[-1] != built[0], "Pools share state files"
+        amy_ref = weakref.ref(amy)
+        del amy
+        gc.collect()
+        assert amy_ref() is None, "Pool keeps the companion alive"
+
+        # A pinned agent bypasses the pool
+        pinned = FakeAgent("pinned")
+        joe.agent = pinned
+        assert joe.generate_message("hey").startswith("agent pinned")
+
+        # A persona edit switches to another pool
+        rose.config["persona"]["interests"] = "birdwatching"
+        rose.apply_config()
+        assert rose.get_agent_pool() is not pool
+        assert "birdwatching" in rose.system_prompt
+
+    print("✓ Shared agent pool test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_pool_checkout,
+        test_companions_share_pool,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -113,6 +113,20 @@ def test_agent_creation():
         assert companion.agent is not None, "Agent not created"
         assert hasattr(companion.agent, 'agent_name'), "Agent missing agent_name"
         
+        # Each tenant's agent gets its own key and endpoint; the environment is left alone
+        os.environ.pop('OPENAI_API_BASE', None)
+        agents = []
+        for tenant in ("rose", "joe"):
+            tenant_companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, f"{tenant}.json"),
+                                                   tenant_id=tenant)
+            tenant_companion.config["api_keys"]["openai_api_key"] = f"{tenant}-key"
+            tenant_companion.config["model"]["baseurl"] = f"http://{tenant}.example/v1"
+            tenant_companion.apply_config()
+            agents.append(tenant_companion.create_agent(os.path.join(tmpdir, f"{tenant}_state.json")))
+        assert [(agent.llm_api_key, agent.llm_base_url) for agent in agents] == [
+            ("rose-key", "http://rose.example/v1"), ("joe-key", "http://joe.example/v1")]
+        assert os.environ['OPENAI_API_KEY'] == 'test-key' and 'OPENAI_API_BASE' not in os.environ
+        
         print("✓ Agent creation test passed")
 
 
@@ -142,6 +156,210 @@ def test_payment_info_addition():
         print("✓ Payment info addition test passed")
 
 
+def test_multi_tenant_runtime():
+    """Test that one runtime serves several tenants with shared clients"""
+    print("Testing multi-tenant runtime...")
+    
+    from async_scheduler import AsyncScheduler
+    from companion_runtime import CompanionRuntime
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        
+        for tenant_id, name in [("rose", "Alex"), ("joe", "Alex")]:
+            config = AntiScammyCompanion.create_default_config(None)
+            config["persona"]["name"] = name
+            with open(os.path.join(tmpdir, f"{tenant_id}.json"), 'w') as f:
+                json.dump(config, f)
+        
+        runtime = CompanionRuntime.from_directory(tmpdir)
+        assert sorted(runtime.tenant_ids()) == ["joe", "rose"]
+        
+        # Companions are built lazily, on first use
+        assert all(t.companion is None for t in runtime.tenants.values())
+        
+        rose = runtime.get("rose")
+        joe = runtime.get("joe")
+        assert rose is runtime.get("rose"), "Companion should be built once"
+        assert rose.tenant_id == "rose"
+        
+        # Same credentials share one SMS sender
+        assert rose.sms_sender is joe.sms_sender
+        
+        scheduler = AsyncScheduler()
+        assert runtime.register_schedule(scheduler) == 6
+        assert len(scheduler.jobs) == 6
+        
+        print("✓ Multi-tenant runtime test passed")
+
+
+def test_batch_generation():
+    """Test concurrent batch generation with ordered, per-item results"""
+    print("Testing batch generation...")
+    
+    import time
+    from batch_generation import RateLimiter
+    
+    class SlowAgent:
+        def run(self, prompt):
+            time.sleep(0.2)
+            if prompt == "fail":
+                raise RuntimeError("provider error")
+            return f"reply to {prompt}"
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = os.path.join(tmpdir, "test_config.json")
+        
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        
+        companion = AntiScammyCompanion(config_path=config_path)
+        companion.config["persona"]["name"] = "BatchTestPersona"
+        companion.apply_config()
+        agents = []
+        
+        def create_agent(saved_state_path=None):
+            agents.append(SlowAgent())
+            return agents[-1]
+        
+        companion.create_agent = create_agent
+        # A dedicated agent is not shared by the batch workers
+        companion.agent = SlowAgent()
+        
+        contexts = [f"prompt {i}" for i in range(7)] + ["fail"]
+        started = time.time()
+        results = companion.generate_messages(contexts, max_workers=8)
+        elapsed = time.time() - started
+        assert len(agents) == 8, f"Workers shared agents ({len(agents)} built)"
+        
+        assert [r.context for r in results] == contexts, "Results out of order"
+        assert results[0].message == "reply to prompt 0"
+        assert all(r.ok for r in results[:7])
+        assert not results[7].ok and isinstance(results[7].error, RuntimeError)
+        assert elapsed < 1.0, f"Batch ran serially ({elapsed:.2f}s)"
+    
+    # 5 requests/second with a burst of 1 spaces calls ~0.2s apart
+    limiter = RateLimiter(5, burst=1)
+    started = time.time()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.time() - started >= 0.55, "Rate limiter did not throttle"
+    
+    print("✓ Batch generation test passed")
+
+
+def test_pregenerated_messages_served_from_cache():
+    """Test that pre-generated check-ins are served without calling the agent"""
+    print("Testing pre-generated message cache...")
+    
+    class CountingAgent:
+        calls = 0
+        
+        def run(self, prompt):
+            CountingAgent.calls += 1
+            return f"message {CountingAgent.calls}"
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = os.path.join(tmpdir, "test_config.json")
+        
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        
+        companion = AntiScammyCompanion(config_path=config_path)
+        companion.config["cache"]["path"] = os.path.join(tmpdir, "cache.db")
+        companion.config["persona"]["name"] = "PregenerateTestPersona"
+        companion.apply_config()
+        companion.create_agent = lambda saved_state_path=None: CountingAgent()
+        companion.agent = CountingAgent()
+        
+        assert companion.pregenerate_messages(3) == 3
+        assert CountingAgent.calls == 3
+        
+        served = {companion.generate_message() for _ in range(3)}
+        assert served == {"message 1", "message 2", "message 3"}
+        assert CountingAgent.calls == 3, "Cached messages should not call the agent"
+        
+        # Pool exhausted: falls through to the agent
+        assert companion.generate_message() == "message 4"
+        
+        # Replies to the user are never served from the cache
+        companion.generate_reply("Hello!")
+        assert CountingAgent.calls == 5
+        
+        stats = companion.get_message_cache().stats()
+        assert stats["hits"] == 3 and stats["misses"] == 1
+        
+        print("✓ Pre-generated message cache test passed")
+
+
+def test_lazy_heavy_imports():
+    """Test that creating a companion does not import Swarms or Twilio"""
+    print("Testing lazy imports...")
+    
+    import subprocess
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = os.path.join(tmpdir, "test_config.json")
+        probe = (
+            "import sys\n"
+            "from anti_scammy import AntiScammyCompanion\n"
+            f"companion = AntiScammyCompanion(config_path={config_path!r})\n"
+            "companion.sms_sender.is_configured()\n"
+            "print(','.join(m for m in ('swarms', 'twilio', 'gtts', 'openai', 'PIL') if m in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", probe], cwd=tmpdir, capture_output=True, text=True,
+            env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+        )
+        assert result.returncode == 0, result.stderr
+        loaded = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+        assert loaded == "", f"Heavy modules imported at startup: {loaded}"
+        
+        print("✓ Lazy import test passed")
+
+
+def test_shared_http_transport():
+    """Test that HTTP clients are shared and connections are kept alive"""
+    print("Testing shared HTTP transport...")
+    
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from http_transport import get_http_session
+    from sms_sender import SMSSender
+    
+    client_ports = set()
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def do_GET(self):
+            client_ports.add(self.client_address[1])
+            body = b"image-bytes"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/image.png"
+        assert get_http_session() is get_http_session()
+        for _ in range(5):
+            assert get_http_session().get(url, timeout=5).content == b"image-bytes"
+        assert len(client_ports) == 1, f"Expected one kept-alive connection, got {len(client_ports)}"
+    finally:
+        server.shutdown()
+    
+    # Senders with the same credentials share one Twilio client
+    first = SMSSender("ACtest", "token", "+15555550100")
+    second = SMSSender("ACtest", "token", "+15555550100")
+    assert first.client is not None and first.client is second.client
+    
+    print("✓ Shared HTTP transport test passed")
+
+
 def run_all_tests():
     """Run all tests"""
     print("\n" + "="*70)
@@ -154,6 +372,11 @@ def run_all_tests():
         test_directories_created,
         test_agent_creation,
         test_payment_info_addition,
+        test_multi_tenant_runtime,
+        test_batch_generation,
+        test_pregenerated_messages_served_from_cache,
+        test_lazy_heavy_imports,
+        test_shared_http_transport,
     ]
     
     passed = 0
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Tests for the asyncio scheduler
+
+These tests run real timers for a couple of seconds and need no API keys.
+"""
+
+import os
+import sys
+import time
+import asyncio
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from async_scheduler import AsyncScheduler, next_daily_run
+
+
+def _time_of_day(seconds_from_now: float) -> str:
+    """Return an "HH:MM:SS" time a few seconds in the future"""
+    return (datetime.now() + timedelta(seconds=seconds_from_now)).strftime("%H:%M:%S")
+
+
+def test_next_daily_run():
+    """Test that daily times roll over to the next day once passed"""
+    print("Testing next daily run calculation...")
+
+    now = datetime(2024, 1, 1, 12, 0).timestamp()
+    assert next_daily_run("13:00", now) == datetime(2024, 1, 1, 13, 0).timestamp()
+    assert next_daily_run("08:00", now) == datetime(2024, 1, 2, 8, 0).timestamp()
+    assert next_daily_run("12:00", now) == datetime(2024, 1, 2, 12, 0).timestamp()
+
+    print("✓ Next daily run test passed")
+
+
+def test_jobs_run_concurrently_and_on_time():
+    """Test that a slow job does not delay other jobs due at the same time"""
+    print("Testing concurrent job firing...")
+
+    scheduler = AsyncScheduler(stage_limits={"generation": 4})
+    finished = []
+
+    def slow_generation(index):
+        time.sleep(0.5)
+        finished.append((index, time.time()))
+
+    async def job(index):
+        await scheduler.run_stage("generation", slow_generation, index)
+
+    at = _time_of_day(2)
+    for index in range(4):
+        scheduler.every_day_at(at, job, index)
+
+    async def run_briefly():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(scheduler.run(stop))
+        await asyncio.sleep(3.5)
+        stop.set()
+        await runner
+
+    started = time.time()
+    asyncio.run(run_briefly())
+
+    assert len(finished) == 4, "All jobs should have run"
+    # Four 0.5s jobs in parallel finish together rather than 2s apart
+    spread = max(t for _, t in finished) - min(t for _, t in finished)
+    assert spread < 0.4, f"Jobs ran serially (spread {spread:.2f}s)"
+    assert finished[0][1] - started < 3.5
+
+    summary = scheduler.jitter.summary()
+    assert summary["count"] == 4
+    assert summary["max_ms"] < 500, f"Jobs fired late: {summary}"
+
+    # Each job was rescheduled for tomorrow
+    assert all(job.next_run > time.time() + 3600 for job in scheduler.jobs)
+
+    print("✓ Concurrent job firing test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_next_daily_run,
+        test_jobs_run_concurrently_and_on_time,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
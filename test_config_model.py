@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Tests for the typed config snapshot and hot reloading
+"""
+
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config_model import ConfigError, ConfigWatcher, parse_config
+
+
+def test_parse_and_validate():
+    """Test typed sections, defaults, validation errors and change detection"""
+    print("Testing config validation...")
+
+    settings = parse_config({
+        "persona": {"name": "Rose", "age": 70},
+        "schedule": {"morning_message": "07:30", "stage_limits": {"sms": 4}},
+        "sms": {"enabled": True, "send_via_sms": True, "phone_number": "+15551234567"},
+        "model": {"requests_per_minute": 500},
+        "unknown_section": {"kept": True},
+    })
+    assert settings.persona.name == "Rose" and settings.persona.interests == "various hobbies"
+    assert settings.schedule.times == ("07:30", "14:00", "19:00")
+    assert settings.schedule.stage_limits == {"sms": 4}
+    assert settings.sms.delivery_enabled and not settings.payment.active
+    assert settings.model.requests_per_minute == 500.0
+    assert not settings.cache.enabled and settings.scanner.enabled and settings.memory.path == ""
+    assert settings.sms.send_timeout == 60.0 and settings.message_log.path == "message_log.db"
+
+    try:
+        parse_config({"persona": {"age": "old"}, "schedule": {"evening_message": "25:00"},
+                      "content_settings": {"use_voice": "yes"}, "cache": {"ttl_hours": 0},
+                      "intent": {"enabled": "no"}})
+        assert False, "Invalid config should raise"
+    except ConfigError as e:
+        assert len(e.errors) == 5, e.errors
+        assert "cache.ttl_hours" in str(e) and "intent.enabled" in str(e)
+        assert "schedule.evening_message" in str(e)
+
+    same = parse_config({"persona": {"name": "Rose", "age": 70}})
+    moved = parse_config({"persona": {"name": "Rose", "age": 70}, "schedule": {"evening_message": "20:00"}})
+    assert moved.persona_key == same.persona_key
+    assert moved.changed_sections(same) == ["schedule"]
+    assert parse_config({"persona": {"name": "Joe"}}).persona_key != same.persona_key
+
+    print("✓ Config validation test passed")
+
+
+def test_hot_reload():
+    """Test that edits re-register only moved jobs and rebuild the prompt only for persona changes"""
+    print("Testing config hot reload...")
+
+    from anti_scammy import AntiScammyCompanion
+    from async_scheduler import AsyncScheduler
+
+    class PromptAgent:
+        system_prompt = ""
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        config_path = os.path.join(tmpdir, "config.json")
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=config_path)
+        agent = companion.agent = PromptAgent()
+        scheduler = AsyncScheduler()
+        assert companion.register_schedule(scheduler) == 3
+        morning, afternoon, evening = (companion._jobs[slot] for slot in range(3))
+        prompt = companion.system_prompt
+
+        watcher = ConfigWatcher()
+        watcher.watch(config_path, lambda config, settings: companion.reload_config(config, scheduler))
+
+        def edit(change, mtime):
+            with open(config_path) as f:
+                config = json.load(f)
+            change(config)
+            with open(config_path, "w") as f:
+                json.dump(config, f)
+            os.utime(config_path, (mtime, mtime))
+            return watcher.check()
+
+        assert watcher.check() == 0, "Unchanged files are not reloaded"
+
+        # Moving one message re-registers only that job
+        assert edit(lambda c: c["schedule"].update(evening_message="20:15"), 1_000_000) == 1
+        assert companion._jobs[0] is morning and companion._jobs[1] is afternoon
+        assert evening.cancelled and companion._jobs[2].at == "20:15"
+        assert companion.system_prompt is prompt, "Schedule edits must not rebuild the prompt"
+
+        # Persona edits rebuild the prompt and update the running agent
+        assert edit(lambda c: c["persona"].update(interests="quilting"), 1_000_100) == 1
+        assert "quilting" in companion.system_prompt and agent.system_prompt == companion.system_prompt
+        assert companion._jobs[2] is not evening and not companion._jobs[2].cancelled
+
+        # Invalid edits are reported and ignored
+        assert edit(lambda c: c["schedule"].update(morning_message="soon"), 1_000_200) == 0
+        assert companion.get_schedule_times()[0] == "08:00"
+        assert companion.settings.persona.interests == "quilting"
+
+    print("✓ Config hot reload test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_parse_and_validate,
+        test_hot_reload,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,587 @@
+#!/usr/bin/env python
+"""
+Tests for image and voice generation
+
+The OpenAI image API and image downloads are served by a local HTTP server,
+so these tests need no API keys or network access.
+"""
+
+import io
+import os
+import sys
+import base64
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from content_generator import ImageGenerator
+
+
+def _png_bytes(size=(64, 48), color=(200, 120, 40)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _ImageItem:
+    """Stand-in for one item of an images API response"""
+
+    def __init__(self, url=None, b64_json=None):
+        self.url = url
+        self.b64_json = b64_json
+
+
+class _ImageServer:
+    """
+    Local stand-in for the OpenAI images API
+
+    POST /v1/images/generations returns n download URLs (after an optional
+    delay) and GET of any other path serves a fixed PNG.
+    """
+
+    def __init__(self, body, delay=0.0):
+        import json
+        import time
+
+        server = self
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                self._send(body, "image/png")
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append(payload)
+                time.sleep(delay)
+                data = [{"url": server.url} for _ in range(payload.get("n", 1))]
+                self._send(json.dumps({"created": 0, "data": data}).encode(), "application/json")
+
+            def _send(self, content, content_type):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/image.png"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+def _fake_synthesize(text, path):
+    """Stand-in TTS engine for process pool workers (must be module level)"""
+    if text == "FAIL":
+        raise RuntimeError("engine error")
+    with open(path, "w") as f:
+        f.write(f"{os.getpid()}:{text}")
+
+
+class _InTempDir:
+    """Run in a temporary directory and restore cwd and OPENAI_API_BASE afterwards"""
+
+    def __enter__(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.original_dir = os.getcwd()
+        self.original_base = os.environ.get("OPENAI_API_BASE")
+        os.chdir(self.tmp.name)
+        return self.tmp.name
+
+    def __exit__(self, *exc):
+        os.chdir(self.original_dir)
+        if self.original_base is None:
+            os.environ.pop("OPENAI_API_BASE", None)
+        else:
+            os.environ["OPENAI_API_BASE"] = self.original_base
+        self.tmp.cleanup()
+
+
+def test_streaming_image_save():
+    """Test that images are written to disk as-is unless conversion is asked for"""
+    print("Testing streaming image save...")
+
+    from PIL import Image
+
+    png = _png_bytes()
+    with _InTempDir(), _ImageServer(png) as server:
+        generator = ImageGenerator(api_key="test-key")
+
+        # URL response: bytes are streamed to disk unchanged
+        path = generator.save_image(_ImageItem(url=server.url), generator.output_dir / "a.png")
+        assert path.read_bytes() == png
+        assert not list(generator.output_dir.glob("*.part")), "Temporary file left behind"
+
+        # b64_json response: decoded in chunks, also unchanged
+        item = _ImageItem(b64_json=base64.b64encode(png).decode("ascii"))
+        path = generator.save_image(item, generator.output_dir / "b.png")
+        assert path.read_bytes() == png
+
+        # Conversion only when requested
+        path = generator.save_image(_ImageItem(url=server.url), generator.output_dir / "c.png",
+                                    resize_to=(32, 24), image_format="JPEG")
+        assert path.suffix == ".jpg"
+        with Image.open(path) as img:
+            assert img.format == "JPEG" and img.size == (32, 24)
+        # Converted in place too: written to a temporary file, then renamed
+        path = generator.save_image(_ImageItem(url=server.url), generator.output_dir / "d.png",
+                                    resize_to=(16, 16))
+        with Image.open(path) as img:
+            assert img.format == "PNG" and img.size == (16, 16)
+        assert not list(generator.output_dir.glob("*.tmp")) + list(generator.output_dir.glob("*.part"))
+
+    print("✓ Streaming image save test passed")
+
+
+def test_concurrent_scene_generation():
+    """Test that scenes are requested concurrently and shared prompts use n"""
+    print("Testing concurrent scene generation...")
+
+    import time
+    from content_generator import SCENE_PROMPTS
+    from http_transport import get_openai_client
+
+    with _InTempDir(), _ImageServer(_png_bytes(), delay=0.3) as server:
+        generator = ImageGenerator(api_key="test-key", baseurl=server.base_url)
+        # Create the shared client up front so the timing covers only the requests
+        get_openai_client(generator.api_key, generator.baseurl)
+
+        # "garden" and its literal prompt share one request with n=2, and
+        # "coffee" listed twice gets two images from one request
+        scenes = ["garden", "coffee", "sunset", "book", SCENE_PROMPTS["garden"], "coffee"]
+        started = time.time()
+        results = generator.generate_scenes(scenes, "Alex", max_concurrency=4)
+        elapsed = time.time() - started
+
+        assert len(results) == 6
+        assert all(path and os.path.exists(path) for path in results)
+        assert len(set(results)) == 6, "Each scene should get its own file"
+        assert "coffee" in os.path.basename(results[5])
+        assert sorted(r["n"] for r in server.requests) == [1, 1, 2, 2]
+        # Four 0.3s requests in parallel, not one after another
+        assert elapsed < 1.0, f"Scenes were generated serially ({elapsed:.2f}s)"
+
+    print("✓ Concurrent scene generation test passed")
+
+
+def test_image_library_reuse_and_eviction():
+    """Test variant rotation, reuse expiry and size-based eviction"""
+    print("Testing image library...")
+
+    from image_library import ImageLibrary
+
+    png = _png_bytes()
+    with _InTempDir(), _ImageServer(png) as server:
+        library = ImageLibrary("generated_images/library.db", variants=2, max_bytes=len(png) * 3)
+        generator = ImageGenerator(api_key="test-key", baseurl=server.base_url, library=library)
+
+        first = generator.generate_scene_image("garden", "Alex")
+        second = generator.generate_scene_image("garden", "Alex")
+        assert first != second, "Should build up two variants before reusing"
+        assert len(server.requests) == 2
+
+        # With two variants available, the least recently used one is reused
+        assert generator.generate_scene_image("garden", "Alex") == first
+        assert generator.generate_scene_image("garden", "Alex") == second
+        assert len(server.requests) == 2, "Reused images should not call the API"
+
+        # Two more scenes push the library past 3 images' worth of bytes:
+        # the least recently used file is deleted from disk
+        generator.generate_scenes(["coffee", "sunset"], "Alex")
+        assert library.total_bytes() <= len(png) * 3
+        assert not os.path.exists(first)
+        stored = {row["path"] for row in generator.storage.find()}
+        assert first not in stored and second in stored, "Eviction left the manifest behind"
+
+        # Retention in the storage drops the images from the library too
+        assert generator.storage.delete_older_than(days=-1) == 3
+        assert library.stats()["images"] == 0
+
+        # Images older than reuse_days are not reused
+        library.reuse_days = 0
+        generator.generate_scene_image("sunset", "Alex")
+        assert len(server.requests) == 5
+
+        stats = library.stats()
+        assert stats["hits"] == 2 and stats["misses"] == 5 and stats["images"] == 1
+
+    print("✓ Image library test passed")
+
+
+def test_voice_cache():
+    """Test that repeated text reuses one audio file and the cache stays under its cap"""
+    print("Testing voice cache...")
+
+    import content_generator
+    from content_generator import VoiceGenerator
+    from voice_cache import VoiceCache
+
+    calls = []
+
+    class FakeTTS:
+        def __init__(self, text, lang, slow):
+            calls.append(text)
+            self.text = text
+
+        def save(self, path):
+            with open(path, "wb") as f:
+                f.write(self.text.encode("utf-8") * 100)
+
+    original = content_generator.create_gtts
+    content_generator.create_gtts = FakeTTS
+    try:
+        with _InTempDir():
+            cache = VoiceCache("generated_voices/cache", max_bytes=2500)
+            generator = VoiceGenerator(cache=cache)
+
+            first = generator.generate_gtts("Good morning,  dear!", "Alex")
+            # Whitespace differences normalize to the same entry
+            assert generator.generate_gtts(" Good morning, dear! ", "Sam") == first
+            assert len(calls) == 1, "Cache hit should not call the TTS engine"
+            # A different language is a different file
+            assert generator.generate_gtts("Good morning, dear!", "Alex", lang="fr") != first
+            assert len(calls) == 2
+            assert not list(cache.directory.rglob("*.partial.*"))
+
+            # Each file is ~1900 bytes, so adding one more evicts the oldest
+            generator.generate_gtts("Thinking of you today!", "Alex")
+            assert cache.stats()["total_bytes"] <= 2500
+            assert cache.stats()["evictions"] >= 1
+            assert cache.stats()["hits"] == 1
+
+            # A key is never synthesized by two threads at once, even when the
+            # first attempt fails while others wait and more keep arriving
+            import threading
+            import time
+            from voice_cache import open_voice_cache
+
+            state = {"active": 0, "most": 0, "calls": 0}
+
+            def slow_synthesize(path):
+                state["calls"] += 1
+                state["active"] += 1
+                state["most"] = max(state["most"], state["active"])
+                try:
+                    time.sleep(0.05)
+                    if state["calls"] == 1:
+                        raise RuntimeError("TTS service unavailable")
+                    with open(path, "wb") as f:
+                        f.write(b"audio")
+                finally:
+                    state["active"] -= 1
+
+            def request():
+                try:
+                    cache.get_or_create("See you soon!", "en", "fake", {}, slow_synthesize)
+                except RuntimeError:
+                    pass
+
+            threads = [threading.Thread(target=request) for _ in range(8)]
+            for i, thread in enumerate(threads):
+                thread.start()
+                if i == 3:
+                    time.sleep(0.06)
+            for thread in threads:
+                thread.join()
+            assert state["most"] == 1, "Two threads synthesized the same key at once"
+            assert state["calls"] == 2
+            assert cache._key_locks == {}, "Per-key locks leaked"
+
+            # Reopening with another size cap applies it
+            shared = open_voice_cache("generated_voices/shared", max_bytes=10000, owner="rose")
+            assert open_voice_cache("generated_voices/shared", max_bytes=2000, owner="rose") is shared
+            assert shared.max_bytes == 2000
+            assert open_voice_cache("generated_voices/shared").max_bytes == 2000
+            # Tenants sharing the cache get the largest cap any of them asks for
+            open_voice_cache("generated_voices/shared", max_bytes=5000, owner="amy")
+            open_voice_cache("generated_voices/shared", max_bytes=2000, owner="rose")
+            assert shared.max_bytes == 5000
+    finally:
+        content_generator.create_gtts = original
+
+    print("✓ Voice cache test passed")
+
+
+def test_gtts_connection_pool():
+    """Test that gTTS requests go out over the shared session without patching gtts"""
+    print("Testing gTTS connection pooling...")
+
+    import base64
+    import requests
+    import gtts.tts
+    import http_transport
+    from gtts import gTTS
+    from http_transport import create_gtts, get_settings
+
+    tts = create_gtts("Good morning!")
+    assert isinstance(tts, gTTS) and tts.timeout == get_settings()["timeout"]
+    assert gtts.tts.requests is requests, "The gtts module should be left untouched"
+
+    class FakeResponse:
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self, chunk_size):
+            audio = base64.b64encode(b"audio").decode("ascii")
+            yield f'["jQ1olc","[\\"{audio}\\"]"]'.encode("utf-8")
+
+    class FakeSession:
+        sent = []
+
+        def send(self, request, timeout):
+            self.sent.append(request.url)
+            return FakeResponse()
+
+    original = http_transport._session
+    http_transport._session = FakeSession()
+    try:
+        assert b"".join(create_gtts("Good morning!").stream()) == b"audio"
+        assert b"".join(create_gtts("Good night!").stream()) == b"audio"
+    finally:
+        http_transport._session = original
+    assert len(FakeSession.sent) == 2 and "translate.google.com" in FakeSession.sent[0]
+
+    print("✓ gTTS connection pooling test passed")
+
+
+def test_tts_worker_reuses_engine():
+    """Test that the offline TTS worker initializes its engine once for many jobs"""
+    print("Testing TTS worker...")
+
+    from content_generator import VoiceGenerator
+    from tts_worker import TTSWorker
+
+    threads = set()
+
+    class FakeEngine:
+        def __init__(self):
+            self.pending = []
+
+        def save_to_file(self, text, path):
+            self.pending.append((text, path))
+
+        def runAndWait(self):
+            threads.add(threading.get_ident())
+            for text, path in self.pending:
+                with open(path, "w") as f:
+                    f.write(text)
+            self.pending = []
+
+    def factory(settings):
+        assert settings["rate"] == 150
+        return FakeEngine()
+
+    with _InTempDir():
+        worker = TTSWorker(engine_factory=factory)
+        futures = [worker.submit(f"Message {i}", f"voice_{i}.wav") for i in range(5)]
+        assert [f.result(timeout=5) for f in futures] == [f"voice_{i}.wav" for i in range(5)]
+        with open("voice_3.wav") as f:
+            assert f.read() == "Message 3"
+
+        # VoiceGenerator routes pyttsx3 synthesis through the same worker
+        generator = VoiceGenerator(use_cache=False, tts_worker=worker)
+        path = generator.generate_pyttsx3("Hello there!", "Alex")
+        assert path and os.path.exists(path)
+
+        stats = worker.stats()
+        assert stats["jobs"] == 6 and stats["engine_inits"] == 1
+        assert stats["max_latency"] >= stats["p50_latency"] > 0
+        assert len(threads) == 1, "Engine must stay on its own thread"
+        worker.stop(timeout=5)
+
+    print("✓ TTS worker test passed")
+
+
+def test_bulk_voice_synthesis():
+    """Test bulk synthesis across processes with dedup, cache hits and failures"""
+    print("Testing bulk voice synthesis...")
+
+    from bulk_voice import BulkProgress, synthesize_bulk
+    from voice_cache import VoiceCache
+
+    with _InTempDir():
+        cache = VoiceCache("generated_voices/cache")
+        jobs = [(f"resident_{i}", f"Hello number {i % 4}!") for i in range(12)]
+        jobs.append(("resident_x", "FAIL"))
+        progress = BulkProgress(len(jobs))
+        updates = []
+
+        results = synthesize_bulk(jobs, workers=2, cache=cache, progress=progress,
+                                  on_progress=lambda p: updates.append(p.completed),
+                                  synthesize=_fake_synthesize)
+
+        assert [r.recipient for r in results] == [recipient for recipient, _ in jobs]
+        assert all(r.ok for r in results[:12])
+        assert not results[12].ok and "engine error" in str(results[12].error)
+        # Same text, same file; four distinct texts were synthesized
+        assert results[0].path == results[4].path == results[8].path
+        assert len({r.path for r in results[:12]}) == 4
+        pids = {open(r.path).read().split(":")[0] for r in results[:12]}
+        assert str(os.getpid()) not in pids, "Synthesis should run in worker processes"
+
+        snapshot = progress.snapshot()
+        assert snapshot["completed"] == 13 and snapshot["failed"] == 1
+        assert snapshot["synthesized"] == 4 and snapshot["throughput"] > 0
+        assert updates == list(range(1, 14))
+
+        # A second run is served entirely from the cache
+        again = synthesize_bulk(jobs[:12], workers=2, cache=cache, synthesize=_fake_synthesize)
+        assert all(r.cached for r in again)
+        assert not list(cache.directory.rglob("*.partial.*"))
+
+    print("✓ Bulk voice synthesis test passed")
+
+
+def test_voice_batcher():
+    """Test that voice notes of sends firing together share one bulk run and the cache's key locks"""
+    print("Testing voice batcher...")
+
+    import asyncio
+    import threading
+    import time
+    from anti_scammy import AntiScammyCompanion
+    from async_scheduler import AsyncScheduler
+    from bulk_voice import VoiceBatcher, synthesize_bulk
+    from voice_cache import VoiceCache, make_voice_key
+
+    class EchoAgent:
+        def __init__(self, message):
+            self.message = message
+
+        def run(self, prompt):
+            return self.message
+
+    with _InTempDir() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        cache = VoiceCache("generated_voices/cache")
+        batcher = VoiceBatcher(workers=2, window=0.2, cache=cache, synthesize=_fake_synthesize)
+        companions = []
+        for tenant_id in ("rose", "joe"):
+            companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, f"{tenant_id}.json"),
+                                            tenant_id=tenant_id, voice_batcher=batcher)
+            companion.config["cache"]["enabled"] = False
+            companion.config["message_log"]["path"] = os.path.join(tmpdir, "log.db")
+            companion.apply_config()
+            companion.agent = EchoAgent(f"Good morning, {tenant_id}!")
+            companion.should_send_voice = lambda: True
+            companion.generate_voice = lambda message: None
+            companions.append(companion)
+
+        async def fire_together():
+            scheduler = AsyncScheduler()
+            await asyncio.gather(*(c.send_scheduled_message_async(scheduler) for c in companions))
+
+        asyncio.run(fire_together())
+        assert batcher.batches == 1, "Sends firing together should share one bulk run"
+        assert batcher.progress.snapshot()["synthesized"] == 2
+        entries = companions[0].get_message_log().query()
+        assert sorted(open(entry["media"][0]).read().split(":")[1] for entry in entries) == \
+            ["Good morning, joe!", "Good morning, rose!"]
+        batcher.close()
+
+        # A bulk run waits for a key another thread is synthesizing and reuses its file
+        key = make_voice_key("See you soon!", "en", "gtts", {"slow": False})
+        assert cache.reserve(key) is None
+        results = []
+        thread = threading.Thread(target=lambda: results.extend(synthesize_bulk(
+            [("amy", "See you soon!")], workers=1, cache=cache, synthesize=_fake_synthesize)))
+        thread.start()
+        time.sleep(0.2)
+        assert thread.is_alive(), "Bulk run should wait for the reserved key"
+        with open(cache.partial_path(key, "mp3"), "w") as f:
+            f.write("first")
+        path = cache.commit(key, "mp3")
+        cache.release(key, "mp3")
+        thread.join()
+        assert results[0].cached and results[0].path == path
+        assert open(path).read() == "first"
+        assert cache._key_locks == {}
+        companions[0].get_message_log().close()
+
+    print("✓ Voice batcher test passed")
+
+
+def test_media_storage():
+    """Test unique sharded paths, atomic saves, manifest lookups and retention"""
+    print("Testing media storage...")
+
+    import time
+    from datetime import datetime
+    from content_generator import VoiceGenerator
+    from media_storage import MediaStorage
+
+    png = _png_bytes()
+    with _InTempDir(), _ImageServer(png) as server:
+        storage = MediaStorage("generated_images")
+        generator = ImageGenerator(api_key="test-key", baseurl=server.base_url,
+                                   reuse_images=False, storage=storage)
+
+        # Many images in the same second never overwrite each other
+        paths = [generator.generate_dalle_image("a garden", "Rose") for _ in range(5)]
+        assert len(set(paths)) == 5 and all(os.path.exists(p) for p in paths)
+        shard = os.path.join("generated_images", datetime.now().strftime("%Y/%m/%d"), "Rose")
+        assert all(os.path.dirname(p) == os.path.normpath(shard) for p in paths)
+        assert not list(storage.root.rglob("*.part"))
+
+        voices = VoiceGenerator(use_cache=False, storage=storage)
+        voices.synthesize("Hi", "Joe", "fake", "en", {},
+                          lambda path: open(path, "w").write("audio"), "mp3")
+
+        assert len(storage.find(tenant="Rose")) == 5
+        assert len(storage.find(kind="voice")) == 1
+        assert len(storage.find(since=time.time() + 60)) == 0
+        assert storage.find(tenant="Rose", limit=1)[0]["size_bytes"] == len(png)
+
+        # Retention removes files and empty shard directories via the manifest
+        assert storage.delete_older_than(days=-1) == 6
+        assert not any(os.path.exists(p) for p in paths)
+        assert not os.path.exists(shard)
+        assert storage.find() == []
+
+    print("✓ Media storage test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_streaming_image_save,
+        test_concurrent_scene_generation,
+        test_image_library_reuse_and_eviction,
+        test_voice_cache,
+        test_gtts_connection_pool,
+        test_tts_worker_reuses_engine,
+        test_bulk_voice_synthesis,
+        test_voice_batcher,
+        test_media_storage,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+"""
+Tests for bounded conversation memory
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conversation_memory import ConversationMemory
+
+
+def test_prompt_size_stays_flat():
+    """Test that long chats stay within the token budget and older turns are summarized"""
+    print("Testing bounded conversation memory...")
+
+    memory = ConversationMemory(max_tokens=400, summary_tokens=80)
+    for i in range(200):
+        prompt = memory.build_prompt(f"Message {i}. I went to the market and bought some apples today.")
+        memory.add("user", f"Message {i}. I went to the market and bought some apples today.")
+        memory.add("assistant", f"Reply {i}. How lovely, apples are my favourite! Tell me more.")
+
+    tokens = [stat["prompt_tokens"] for stat in memory.turn_stats]
+    assert len(tokens) == 200
+    assert max(tokens) <= 400, f"Prompt exceeded the budget: {max(tokens)}"
+    # After warm-up the prompt size is flat rather than growing with the chat
+    assert max(tokens[50:]) - min(tokens[50:]) < 40
+
+    # Recent turns are verbatim; older ones survive only in the summary
+    assert "Message 199." in memory.turns[-2]["text"]
+    assert "Message 0." not in prompt
+    assert "Summary of your earlier conversation" in prompt
+    assert memory.count_tokens(memory.summary) <= 80
+
+    print("✓ Bounded conversation memory test passed")
+
+
+def test_companion_replies_use_memory():
+    """Test that replies carry earlier turns, reset agent history and persist"""
+    print("Testing companion reply memory...")
+
+    from anti_scammy import AntiScammyCompanion
+
+    class RecordingAgent:
+        def __init__(self):
+            self.prompts = []
+            self.short_memory = []
+            self.resets = 0
+
+        def run(self, prompt):
+            self.prompts.append(prompt)
+            self.short_memory.append(prompt)
+            return f"reply {len(self.prompts)}"
+
+        def short_memory_init(self):
+            self.resets += 1
+            return []
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        memory_path = os.path.join(tmpdir, "memory.json")
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        companion.config["memory"] = {"max_tokens": 1500, "path": memory_path}
+        companion.apply_config()
+        agent = companion.agent = RecordingAgent()
+
+        companion.generate_reply("My cat is called Whiskers")
+        assert companion.generate_reply("What did I say my cat was called?") == "reply 2"
+        assert "Whiskers" in agent.prompts[1], "Earlier turns should be in the prompt"
+        assert agent.short_memory == [] and agent.resets == 2, "Agent history should not grow"
+        assert companion.memory.last_prompt_tokens > 0
+
+        companion.memory.save()
+        restored = ConversationMemory(path=memory_path)
+        assert [turn["text"] for turn in restored.turns] == [
+            "My cat is called Whiskers", "reply 1",
+            "What did I say my cat was called?", "reply 2",
+        ]
+
+    print("✓ Companion reply memory test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_prompt_size_stays_flat,
+        test_companion_replies_use_memory,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
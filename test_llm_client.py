@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+"""
+Tests for the async LLM client, against a local OpenAI-compatible stub server
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from llm_client import LLMClient, LLMError
+from anti_scammy import AntiScammyCompanion, FALLBACK_MESSAGE
+
+
+class StubServer:
+    """Minimal /v1/chat/completions server; model "slow" takes `slow_latency` seconds"""
+
+    def __init__(self, latency=0.1, slow_latency=1.0):
+        self.latency = latency
+        self.slow_latency = slow_latency
+        self.calls = []
+        self.url = None
+        self._runner = None
+
+    async def handle(self, request):
+        from aiohttp import web
+
+        payload = await request.json()
+        self.calls.append(payload)
+        model = payload["model"]
+        if model == "broken":
+            return web.json_response({"error": {"message": "model overloaded"}}, status=500)
+        await asyncio.sleep(self.slow_latency if model == "slow" else self.latency)
+        prompt = payload["messages"][-1]["content"]
+        return web.json_response({"choices": [{"message": {"role": "assistant",
+                                                           "content": f"{model} says hi to {prompt}"}}]})
+
+    async def __aenter__(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+
+def test_coalescing_and_deadlines():
+    """Test single-flight deduplication, deadlines and fallback on timeout"""
+    print("Testing LLM client coalescing and deadlines...")
+
+    async def scenario():
+        async with StubServer() as server:
+            client = LLMClient(server.url, api_key="test-key")
+            try:
+                # Ten identical requests share one call; a different prompt gets its own
+                results = await asyncio.gather(
+                    *(client.complete("check in", "fast", system_prompt="You are Rose") for _ in range(10)),
+                    client.complete("tell a joke", "fast", system_prompt="You are Rose"),
+                )
+                assert len(server.calls) == 2, server.calls
+                assert {r.text for r in results[:10]} == {"fast says hi to check in"}
+                assert sum(r.coalesced for r in results) == 9
+                assert server.calls[0]["messages"][0] == {"role": "system", "content": "You are Rose"}
+
+                # Done requests are not reused
+                await client.complete("check in", "fast", system_prompt="You are Rose")
+                assert len(server.calls) == 3
+
+                # The primary misses its deadline: the fallback answers
+                result = await client.complete("hello", "slow", timeout=0.3, fallback_model="fast")
+                assert result.fallback and result.model == "fast"
+                assert result.text == "fast says hi to hello"
+                assert result.latency < 0.9, result.latency
+
+                # Without a fallback the timeout reaches the caller
+                try:
+                    await client.complete("hello", "slow", timeout=0.1)
+                    assert False, "Expected TimeoutError"
+                except asyncio.TimeoutError:
+                    pass
+
+                # One waiter's deadline does not cancel the call for the others
+                short = asyncio.ensure_future(client.complete("story", "fast", timeout=0.02))
+                patient = asyncio.ensure_future(client.complete("story", "fast", timeout=1.0))
+                done = await asyncio.gather(short, patient, return_exceptions=True)
+                assert isinstance(done[0], asyncio.TimeoutError)
+                assert done[1].text == "fast says hi to story" and done[1].coalesced
+
+                try:
+                    await client.complete("hello", "broken")
+                    assert False, "Expected LLMError"
+                except LLMError as e:
+                    assert "500" in str(e)
+
+                stats = client.stats()
+                assert stats["timeouts"] == 3 and stats["fallbacks"] == 1, stats
+                assert not client._inflight, "In-flight calls leaked"
+            finally:
+                await client.close()
+
+    asyncio.run(scenario())
+    print("✓ LLM client coalescing and deadlines test passed")
+
+
+def test_companion_http_client():
+    """Test scheduled generation through the HTTP client with a fallback model"""
+    print("Testing companion generation over HTTP...")
+
+    async def scenario(tmpdir):
+        async with StubServer(slow_latency=0.6) as server:
+            companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+            companion.config["cache"]["enabled"] = False
+            companion.config["model"].update({"baseurl": server.url, "client": "http", "name": "slow",
+                                              "timeout": 0.2, "fallback_model": ""})
+            companion.apply_config()
+
+            generation = await companion.compose_message_async("Say good morning")
+            assert generation["source"] == "fallback"
+            assert generation["message"] == FALLBACK_MESSAGE
+
+            companion.config["model"]["fallback_model"] = "fast"
+            companion.apply_config()
+            generation = await companion.compose_message_async("Say good morning")
+            assert generation["source"] == "llm" and generation["model"] == "fast"
+            assert generation["message"] == "fast says hi to Say good morning"
+            assert server.calls[-1]["messages"][0]["content"] == companion.system_prompt
+            await companion.get_llm_client().close()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        asyncio.run(scenario(tmpdir))
+
+    print("✓ Companion HTTP generation test passed")
+
+
+def test_check_in_budget_with_fallback():
+    """Test that check-ins try the fallback within the latency budget and cache late replies"""
+    print("Testing check-in latency budget with a fallback model...")
+
+    async def scenario(tmpdir):
+        async with StubServer(slow_latency=0.6) as server:
+            companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+            companion.config["cache"].update({"enabled": True, "path": os.path.join(tmpdir, "cache.db")})
+            companion.config["model"].update({"baseurl": server.url, "client": "http", "name": "slow",
+                                              "timeout": 5.0, "fallback_model": "fast"})
+            companion.config["offline"] = {"mode": "fallback", "latency_budget": 0.5, "cooldown": 60}
+            companion.apply_config()
+
+            started = asyncio.get_running_loop().time()
+            generation = await companion.compose_message_async()
+            elapsed = asyncio.get_running_loop().time() - started
+            # The primary gets half the budget (not its 5s timeout), leaving time for the fallback
+            assert generation["source"] == "llm" and generation["model"] == "fast", generation
+            assert elapsed < 0.5, f"Check-in took {elapsed:.2f}s"
+
+            # The primary keeps running and its late reply is kept for a later check-in
+            await asyncio.sleep(0.5)
+            key = companion.check_in_cache_key(generation["prompt"])
+            assert companion.get_message_cache().get(key, consume=False) == f"slow says hi to {generation['prompt']}"
+            assert (await companion.compose_message_async())["source"] == "cache"
+            await companion.get_llm_client().close()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        asyncio.run(scenario(tmpdir))
+
+    print("✓ Check-in latency budget with fallback test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_coalescing_and_deadlines,
+        test_companion_http_client,
+        test_check_in_budget_with_fallback,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
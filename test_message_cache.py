@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Tests for the persistent message cache
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from message_cache import MessageCache, make_cache_key, open_message_cache
+
+
+def test_cache_key():
+    """Test that keys depend on every part of the request"""
+    print("Testing cache keys...")
+
+    key = make_cache_key("system", "prompt", "gpt-4o-mini")
+    assert key == make_cache_key("system", "prompt", "gpt-4o-mini")
+    assert key != make_cache_key("system", "prompt", "gpt-4o")
+    assert key != make_cache_key("other", "prompt", "gpt-4o-mini")
+    assert make_cache_key("ab", "c", "m") != make_cache_key("a", "bc", "m")
+
+    print("✓ Cache key test passed")
+
+
+def test_pool_ttl_and_eviction():
+    """Test pooled responses, TTL expiry, LRU eviction and statistics"""
+    print("Testing message cache pool...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        cache = MessageCache(path, max_entries=3)
+
+        cache.put("a", "first")
+        cache.put("a", "second")
+        assert cache.pool_size("a") == 2
+
+        # Pooled responses are served oldest first and consumed
+        assert cache.get("a") == "first"
+        assert cache.get("a") == "second"
+        assert cache.get("a") is None
+
+        # Non-consuming reads keep the entry
+        cache.put("b", "kept")
+        assert cache.get("b", consume=False) == "kept"
+        assert cache.get("b", consume=False) == "kept"
+
+        # Least recently used entries go first once over max_entries
+        cache.put("c", "c1")
+        cache.put("d", "d1")
+        cache.put("e", "e1")
+        stats = cache.stats()
+        assert stats["entries"] == 3
+        assert stats["evictions"] == 1
+        assert cache.pool_size("b") == 0, "LRU entry should have been evicted"
+
+        assert stats["hits"] == 4 and stats["misses"] == 1
+        cache.close()
+
+        # Entries persist on disk, but expire after the TTL
+        reopened = MessageCache(path, ttl_seconds=0.1)
+        assert reopened.pool_size("e") == 1
+        time.sleep(0.2)
+        assert reopened.get("e") is None
+        reopened.close()
+
+    print("✓ Message cache pool test passed")
+
+
+def test_shared_cache_limits():
+    """Test that reopening applies new limits and tenants get the largest requested"""
+    print("Testing shared message cache limits...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "cache.db")
+        cache = open_message_cache(path, ttl_seconds=3600, max_entries=10, owner="rose")
+        for i in range(10):
+            cache.put("a", f"message {i}")
+
+        # Another tenant asking for less does not shrink rose's cache
+        assert open_message_cache(path, ttl_seconds=60, max_entries=2, owner="amy") is cache
+        assert (cache.ttl_seconds, cache.max_entries) == (3600, 10)
+        assert cache.pool_size("a") == 10
+
+        # A reload of rose's config applies at once
+        open_message_cache(path, ttl_seconds=7200, max_entries=4, owner="rose")
+        assert (cache.ttl_seconds, cache.max_entries) == (7200, 4)
+        assert cache.pool_size("a") == 4
+        cache.close()
+
+    print("✓ Shared message cache limits test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_cache_key,
+        test_pool_ttl_and_eviction,
+        test_shared_cache_limits,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Tests for the structured message log
+"""
+
+import os
+import sys
+import time
+import asyncio
+import sqlite3
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from message_log import MessageLog
+
+
+def test_buffered_writes_and_queries():
+    """Test batching, flush on query and indexed lookups by recipient and day"""
+    print("Testing message log queries...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "log.db")
+        log = MessageLog(path, flush_interval=60, batch_size=1000)
+
+        day_start = time.mktime(time.strptime("2026-03-01", "%Y-%m-%d"))
+        for i in range(5000):
+            recipient = f"+1555000{i % 10:04d}"
+            log.record(f"Hello {recipient}", tenant="rose", recipient=recipient,
+                       model="gpt-4o-mini", latency=0.5, source="llm",
+                       sms_status="queued", media=["voice.mp3"], timestamp=day_start + i * 60)
+
+        # Buffered entries are visible to queries (query flushes first)
+        entries = log.query(recipient="+15550000003", limit=None)
+        assert len(entries) == 500
+        assert entries[0]["timestamp"] > entries[-1]["timestamp"], "Newest first"
+        assert entries[0]["media"] == ["voice.mp3"] and entries[0]["sms_status"] == "queued"
+
+        # 5000 minutes spans four days
+        assert len(log.query(day="2026-03-02", limit=None)) == 1440
+        assert len(log.query(tenant="rose", limit=10)) == 10
+
+        started = time.perf_counter()
+        log.query(recipient="+15550000007", day="2026-03-03")
+        assert time.perf_counter() - started < 0.1, "Indexed query should be fast"
+
+        # A failed write keeps the batch for the next flush, in order
+        log._conn.execute("CREATE TEMP TRIGGER full BEFORE INSERT ON messages "
+                          "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+        log.record("First", tenant="amy", timestamp=day_start + 10 ** 6)
+        try:
+            log.flush()
+            assert False, "Failed write should raise"
+        except sqlite3.Error:
+            pass
+        log.record("Second", tenant="amy", timestamp=day_start + 10 ** 6 + 1)
+        log._conn.execute("DROP TRIGGER full")
+        assert [entry["message"] for entry in log.query(tenant="amy")] == ["Second", "First"]
+
+        # Entries survive closing and reopening
+        log.record("Last one", tenant="rose")
+        log.close()
+        reopened = MessageLog(path)
+        assert reopened.query(limit=1)[0]["message"] == "Last one"
+        reopened.close()
+
+    print("✓ Message log query test passed")
+
+
+def test_scheduled_send_is_logged():
+    """Test that scheduled sends record prompt, model, latency and media"""
+    print("Testing scheduled send logging...")
+
+    from anti_scammy import AntiScammyCompanion
+    from async_scheduler import AsyncScheduler
+
+    class EchoAgent:
+        def run(self, prompt):
+            return "Good morning!"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        companion.config["cache"]["enabled"] = False
+        companion.config["content_settings"]["use_voice"] = True
+        companion.config["message_log"]["path"] = os.path.join(tmpdir, "log.db")
+        companion.config["sms"]["phone_number"] = "+15551234567"
+        companion.apply_config()
+        companion.agent = EchoAgent()
+        companion.should_send_voice = lambda: True
+        companion.generate_voice = lambda message: "generated_voices/cache/ab/ab.mp3"
+
+        companion.send_scheduled_message()
+        asyncio.run(companion.send_scheduled_message_async(AsyncScheduler()))
+
+        entries = companion.get_message_log().query(recipient="+15551234567")
+        assert len(entries) == 2
+        for entry in entries:
+            assert entry["message"] == "Good morning!"
+            assert entry["tenant"] == companion.config["persona"]["name"]
+            assert entry["source"] == "llm" and entry["prompt"]
+            assert entry["model"] == "gpt-4o-mini" and entry["latency"] >= 0
+            assert entry["sms_status"] is None, "SMS is disabled in the default config"
+            assert entry["media"] == ["generated_voices/cache/ab/ab.mp3"]
+        companion.get_message_log().close()
+
+    print("✓ Scheduled send logging test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_buffered_writes_and_queries,
+        test_scheduled_send_is_logged,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
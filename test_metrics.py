@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Tests for per-stage latency metrics
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from metrics import MetricsRegistry, metrics, serve_metrics, span
+from anti_scammy import AntiScammyCompanion
+
+
+def test_histograms_and_export():
+    """Test recording, quantiles, Prometheus/JSON export and the disabled fast path"""
+    print("Testing metrics histograms and export...")
+
+    registry = MetricsRegistry(enabled=True)
+    for seconds in (0.002, 0.003, 0.004, 0.2, 3.0):
+        registry.observe("llm", seconds)
+    try:
+        with registry.span("twilio"):
+            raise ConnectionError("network down")
+    except ConnectionError:
+        pass
+
+    llm = registry.snapshot()["llm"]
+    assert llm["count"] == 5 and llm["errors"] == 0
+    assert llm["p50_ms"] == 5.0, "Median should fall in the 5ms bucket"
+    assert llm["max_ms"] == 3000.0 and llm["p99_ms"] == 3000.0
+    assert registry.snapshot()["twilio"]["errors"] == 1
+
+    text = registry.render_prometheus()
+    assert "# TYPE antiscammy_stage_seconds histogram" in text
+    assert 'antiscammy_stage_seconds_bucket{stage="llm",le="0.005"} 3' in text
+    assert 'antiscammy_stage_seconds_bucket{stage="llm",le="+Inf"} 5' in text
+    assert 'antiscammy_stage_seconds_count{stage="llm"} 5' in text
+    assert 'antiscammy_stage_errors_total{stage="twilio"} 1' in text
+    assert json.loads(registry.to_json())["stages"]["llm"]["count"] == 5
+
+    # Disabled spans record nothing and cost well under a microsecond
+    disabled = MetricsRegistry(enabled=False)
+    with disabled.span("llm"):
+        pass
+    assert disabled.snapshot() == {}
+
+    assert not metrics.enabled, "Metrics should be off by default"
+    iterations = 200000
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            with span("bench"):
+                pass
+        best = min(best, (time.perf_counter() - started) / iterations)
+    assert best < 1e-6, f"Disabled span costs {best * 1e9:.0f}ns"
+    assert "bench" not in metrics.snapshot()
+
+    print("✓ Metrics histograms and export test passed")
+
+
+def test_pipeline_spans():
+    """Test that a scheduled send and a reply record their stages"""
+    print("Testing pipeline spans...")
+
+    class FakeAgent:
+        def run(self, prompt):
+            time.sleep(0.01)
+            return "Thinking of you!"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        companion.config["cache"]["enabled"] = False
+        companion.config["content_settings"]["use_voice"] = False
+        companion.config["message_log"]["path"] = os.path.join(tmpdir, "log.db")
+        companion.apply_config()
+        companion.agent = FakeAgent()
+
+        metrics.reset()
+        metrics.enabled = True
+        server = serve_metrics(0, "127.0.0.1")
+        try:
+            companion.send_scheduled_message()
+            companion.generate_reply("How was your garden today?")
+
+            stages = metrics.snapshot()
+            for stage in ("send", "generation", "llm", "log", "reply", "reply_plan"):
+                assert stage in stages, f"Missing stage {stage}: {sorted(stages)}"
+            assert stages["generation"]["count"] == 2
+            assert stages["llm"]["mean_ms"] >= 10
+            assert stages["send"]["sum_seconds"] >= stages["llm"]["sum_seconds"] / 2
+
+            url = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(url + "/metrics") as response:
+                assert 'antiscammy_stage_seconds_count{stage="send"} 1' in response.read().decode()
+            with urllib.request.urlopen(url + "/metrics.json") as response:
+                assert json.loads(response.read())["stages"]["reply"]["count"] == 1
+        finally:
+            server.shutdown()
+            metrics.enabled = False
+            metrics.reset()
+
+    print("✓ Pipeline spans test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_histograms_and_export,
+        test_pipeline_spans,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Tests for offline message generation and the latency budget
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config_model import parse_config
+from offline_generator import OfflineGenerator, prompt_kind, split_interests
+from anti_scammy import AntiScammyCompanion, CHECK_IN_PROMPTS
+
+
+def test_offline_messages():
+    """Test that offline messages use the persona, vary and are fast"""
+    print("Testing offline message generation...")
+
+    assert split_interests("gardening, reading and cooking") == ["gardening", "reading", "cooking"]
+    assert [prompt_kind(prompt) for prompt in CHECK_IN_PROMPTS] == [
+        "check_in", "story", "hobbies", "encouragement", "joke"]
+
+    persona = parse_config({"persona": {
+        "name": "Rose", "interests": "birdwatching, quilting",
+        "backstory": "Retired nurse from Ohio",
+    }}).persona
+    generator = OfflineGenerator(persona, seed=7)
+
+    messages = [generator.generate(CHECK_IN_PROMPTS[i % len(CHECK_IN_PROMPTS)]) for i in range(300)]
+    assert all(message and "{" not in message for message in messages)
+    assert len(set(messages)) > 100, f"Only {len(set(messages))} distinct messages"
+    assert any("birdwatching" in message for message in messages)
+    assert any("retired nurse from Ohio" in message for message in messages)
+    assert all("?" in message or "!" in message or "." in message for message in messages)
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        generator.generate()
+    per_message = (time.perf_counter() - started) / 1000
+    assert per_message < 0.001, f"Offline generation too slow: {per_message * 1e6:.0f}µs"
+
+    print("✓ Offline message generation test passed")
+
+
+def test_latency_budget_fallback():
+    """Test switching to offline messages when the model is slow or down"""
+    print("Testing latency budget fallback...")
+
+    class SlowAgent:
+        def __init__(self, latency):
+            self.latency = latency
+            self.calls = 0
+
+        def run(self, prompt):
+            self.calls += 1
+            time.sleep(self.latency)
+            return "Hello from the model!"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        # A provider of its own, so the cooldown does not affect other tests
+        companion.config["model"]["baseurl"] = "http://offline-test.invalid/v1"
+        companion.config["cache"]["path"] = os.path.join(tmpdir, "cache.db")
+        companion.config["offline"] = {"mode": "fallback", "latency_budget": 0.1, "cooldown": 60}
+        companion.apply_config()
+        agent = companion.agent = SlowAgent(latency=0.4)
+
+        started = time.perf_counter()
+        generation = companion.compose_message()
+        assert generation["source"] == "offline", generation
+        assert time.perf_counter() - started < 0.3, "Waited past the latency budget"
+
+        # The model is skipped during the cooldown
+        assert companion.compose_message()["source"] == "offline"
+        assert asyncio.run(companion.compose_message_async())["source"] == "offline"
+        assert agent.calls == 1
+        assert companion.get_latency_budget().stats()["skipping_remote"]
+        # A tenant with other settings for the same provider keeps its own budget
+        from offline_generator import get_latency_budget
+        other = get_latency_budget("offline-test.invalid", 5.0, 10.0)
+        assert other is not companion.get_latency_budget()
+        assert companion.get_latency_budget().budget == 0.1
+        assert not other.stats()["skipping_remote"]
+
+        # The late reply is kept for a later check-in
+        time.sleep(0.5)
+        assert companion.take_cached_check_in() == "Hello from the model!"
+
+        # Replies to the user never use offline messages
+        assert companion.compose_message("Reply to: hi")["source"] == "llm"
+
+        companion.config["offline"] = {"mode": "off", "latency_budget": 0.1}
+        companion.apply_config()
+        assert companion.compose_message()["message"] == "Hello from the model!"
+
+        companion.config["offline"] = {"mode": "always"}
+        companion.apply_config()
+        calls = agent.calls
+        assert companion.compose_message()["source"] == "offline"
+        assert agent.calls == calls
+
+    print("✓ Latency budget fallback test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_offline_messages,
+        test_latency_budget_fallback,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""
+Tests for the scam phrase scanner
+"""
+
+import os
+import sys
+import json
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from scam_scanner import AhoCorasick, ScamScanner, get_scam_scanner
+
+
+def test_scanner_matches():
+    """Test overlapping matches, whole words and agreement with a brute-force search"""
+    print("Testing scam phrase scanner...")
+
+    automaton = AhoCorasick([("he", 1), ("she", 2), ("his", 3), ("hers", 4)])
+    assert sorted(automaton.iter_matches("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 4)]
+
+    scanner = ScamScanner({"money": ["western union", "bail money"], "tech": ["anydesk"]})
+    hits = scanner.scan("Grandma, send the BAIL MONEY by Western  Union or western union today. AnyDesk too")
+    assert [(hit.phrase, hit.category) for hit in hits] == [
+        ("bail money", "money"), ("western union", "money"), ("anydesk", "tech")]
+    assert scanner.scan("The bail money is available")[0].start == 4
+    assert scanner.scan("Xanydesk and anydesks") == [], "Only whole words count"
+    assert scanner.categories("AnyDesk, then Western Union") == ["tech", "money"]
+    stats = scanner.stats()
+    assert stats["patterns"] == 3 and stats["hits"]["money"] == 4
+
+    # Offsets index the original text even where lowercasing changes its length
+    scanner = ScamScanner({"gift_card": ["gift card"], "romance": ["İstanbul customs"]})
+    text = "İİİ gift card from İSTANBUL CUSTOMS"
+    assert [text[hit.start:hit.end] for hit in scanner.scan(text)] == ["gift card", "İSTANBUL CUSTOMS"]
+
+    # Thousands of patterns agree with a brute-force search
+    rng = random.Random(3)
+    patterns = sorted({"".join(rng.choice("abc") for _ in range(rng.randint(1, 6))) for _ in range(3000)})
+    automaton = AhoCorasick((pattern, pattern) for pattern in patterns)
+    text = "".join(rng.choice("abcd") for _ in range(2000))
+    expected = sorted((i, i + len(p), p) for p in patterns for i in range(len(text)) if text.startswith(p, i))
+    assert sorted(automaton.iter_matches(text)) == expected
+
+    print("✓ Scam phrase scanner test passed")
+
+
+def test_scanner_in_replies():
+    """Test that scam phrases are flagged and shape the reply prompt"""
+    print("Testing scanner in replies...")
+
+    from anti_scammy import AntiScammyCompanion
+
+    class RecordingAgent:
+        def __init__(self):
+            self.prompts = []
+
+        def run(self, prompt):
+            self.prompts.append(prompt)
+            return "Oh my, tell me more."
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        phrases_path = os.path.join(tmpdir, "phrases.json")
+        with open(phrases_path, "w") as f:
+            json.dump({"romance": ["my sweet angel"]}, f)
+        assert get_scam_scanner(phrases_path) is get_scam_scanner(phrases_path)
+
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        companion.config["memory"] = {"path": os.path.join(tmpdir, "memory.json")}
+        companion.config["scanner"] = {"enabled": True, "phrases_path": phrases_path}
+        companion.apply_config()
+        agent = companion.agent = RecordingAgent()
+
+        message = "A man online calls me his sweet angel, my sweet angel! He's stuck overseas."
+        plan = companion.plan_reply(message)
+        assert [hit.phrase for hit in plan["scan_hits"]] == ["my sweet angel", "stuck overseas"]
+        assert plan["reply"] is None and "often seen in scams" in plan["prompt"]
+        companion.report_flags(plan)
+
+        assert companion.generate_reply("The roses are blooming") == "Oh my, tell me more."
+        assert "often seen in scams" not in agent.prompts[-1]
+
+        companion.config["scanner"]["enabled"] = False
+        companion.apply_config()
+        assert companion.scan_message(message) == []
+
+    print("✓ Scanner in replies test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_scanner_matches,
+        test_scanner_in_replies,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Tests for the durable SMS outbox
+
+All deliveries go through FakeTwilioTransport, so no Twilio account is needed.
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sms_outbox import SMSOutbox, OutboxDispatcher, FakeTwilioTransport, sms_idempotency_key
+
+
+def test_retry_with_backoff():
+    """Test that transient failures are retried until delivery"""
+    print("Testing SMS retry with backoff...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        outbox = SMSOutbox(os.path.join(tmpdir, "outbox.db"))
+        transport = FakeTwilioTransport(fail_first=2)
+        dispatcher = OutboxDispatcher(outbox, transport, base_delay=0.05, poll_interval=0.01)
+        dispatcher.start()
+
+        key = outbox.enqueue("+15555550100", "Good morning!")
+        dispatcher.notify()
+        assert dispatcher.wait_for(key, timeout=5) == "sent"
+
+        state = outbox.get(key)
+        assert state["attempts"] == 3, f"Expected 3 attempts, got {state}"
+        assert state["sid"].startswith("SM")
+        assert transport.delivered[key]["body"] == "Good morning!"
+
+        dispatcher.stop()
+
+    print("✓ SMS retry test passed")
+
+
+def test_idempotency_and_permanent_failure():
+    """Test idempotent enqueueing and giving up after max_attempts"""
+    print("Testing SMS idempotency and failure handling...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        outbox = SMSOutbox(os.path.join(tmpdir, "outbox.db"))
+        transport = FakeTwilioTransport()
+        dispatcher = OutboxDispatcher(outbox, transport, max_attempts=3, base_delay=0.01)
+
+        outbox.enqueue("+15555550100", "Hello", idempotency_key="msg-1")
+        outbox.enqueue("+15555550100", "Hello", idempotency_key="msg-1")
+        while dispatcher.drain_once():
+            pass
+        assert len(transport.delivered) == 1 and transport.duplicates == 0
+
+        # A sent message is never sent again, even if re-enqueued
+        outbox.enqueue("+15555550100", "Hello", idempotency_key="msg-1")
+        assert dispatcher.drain_once() == 0
+
+        # Retrying a scheduled send derives the same key
+        key = sms_idempotency_key("rose", "2026-10-17 08:00", "+15555550100")
+        assert key == sms_idempotency_key("rose", "2026-10-17 08:00", "+15555550100")
+        assert key != sms_idempotency_key("rose", "2026-10-17 14:00", "+15555550100")
+        assert key != sms_idempotency_key("joe", "2026-10-17 08:00", "+15555550100")
+
+        # Always-failing transport gives up after max_attempts
+        dispatcher.transports[""] = FakeTwilioTransport(failure_rate=1.0)
+        key = outbox.enqueue("+15555550100", "Doomed")
+        deadline = time.time() + 5
+        while outbox.get(key)["status"] != "failed" and time.time() < deadline:
+            dispatcher.drain_once()
+            time.sleep(0.01)
+        assert outbox.get(key)["status"] == "failed"
+        assert outbox.get(key)["attempts"] == 3
+        assert outbox.counts() == {"sent": 1, "failed": 1}
+
+    print("✓ SMS idempotency test passed")
+
+
+def test_pending_messages_survive_restart():
+    """Test that queued messages are delivered after the process restarts"""
+    print("Testing SMS outbox persistence...")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "outbox.db")
+        outbox = SMSOutbox(path)
+        for i in range(20):
+            outbox.enqueue("+15555550100", f"Message {i}")
+        # Simulate a crash after claiming some messages, two of which Twilio accepted
+        transport = FakeTwilioTransport(latency=0.01)
+        claimed = outbox.claim_due(limit=5)
+        for item in claimed[:2]:
+            transport.send(item["to_number"], item["body"], item["idempotency_key"])
+
+        # A second process opening the outbox leaves sends in flight alone
+        other = SMSOutbox(path)
+        assert other.counts() == {"pending": 15, "sending": 5}
+        other.close()
+        # ...until the dead process's lease runs out
+        outbox._conn.execute("UPDATE outbox SET lease_until = ? WHERE status = 'sending'", (time.time(),))
+        outbox._conn.commit()
+        outbox.close()
+
+        # Without a way to check, interrupted sends are not retried blindly
+        reopened = SMSOutbox(path)
+        assert reopened.counts() == {"pending": 15, "unknown": 5}
+        blind = OutboxDispatcher(reopened, FakeTwilioTransport())
+        blind.transports[""].lookup = None
+        while blind.drain_once():
+            pass
+        assert reopened.counts() == {"sent": 15, "unknown": 5}
+        reopened.close()
+
+        reopened = SMSOutbox(path)
+        dispatcher = OutboxDispatcher(reopened, transport, workers=8)
+        while dispatcher.drain_once():
+            pass
+        assert transport.duplicates == 0, "Interrupted send was sent twice"
+        assert set(item["idempotency_key"] for item in claimed) <= set(transport.delivered)
+        assert reopened.counts() == {"sent": 20}
+
+    print("✓ SMS outbox persistence test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_retry_with_backoff,
+        test_idempotency_and_permanent_failure,
+        test_pending_messages_survive_restart,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Tests for streaming replies and SMS chunking
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streaming import TimedStream, chunk_sms
+
+
+def test_chunk_sms():
+    """Test that streamed text is split into SMS-sized chunks at natural boundaries"""
+    print("Testing SMS chunking...")
+
+    text = ("Good morning! I hope you slept well and the sun is shining where you are. "
+            "I was just thinking about the lovely garden you told me about, with the "
+            "roses by the fence. Did the tomatoes come up this year? Tell me everything, "
+            "I love hearing about it.")
+    tokens = [text[i:i + 3] for i in range(0, len(text), 3)]
+
+    chunks = list(chunk_sms(tokens, limit=100))
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks) == text, "No text should be lost or reordered"
+    assert chunks[0].endswith("."), "Chunks should end at sentence boundaries when possible"
+
+    # Chunks are produced while tokens are still arriving
+    consumed = []
+
+    def tracked():
+        for token in tokens:
+            consumed.append(token)
+            yield token
+
+    first = next(chunk_sms(tracked(), limit=100))
+    assert first == chunks[0]
+    assert len(consumed) < len(tokens)
+
+    assert list(chunk_sms(["a" * 250], limit=100)) == ["a" * 100, "a" * 100, "a" * 50]
+    assert list(chunk_sms(["   "])) == []
+
+    print("✓ SMS chunking test passed")
+
+
+def test_streamed_reply():
+    """Test token streaming, time to first token, memory and fallback"""
+    print("Testing streamed replies...")
+
+    from anti_scammy import AntiScammyCompanion, FALLBACK_MESSAGE
+
+    class StreamingAgent:
+        fail = False
+
+        def run_stream(self, prompt):
+            if self.fail:
+                raise RuntimeError("model unavailable")
+            for word in ["Hello ", "there, ", "dear!"]:
+                time.sleep(0.05)
+                yield word
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.environ['OPENAI_API_KEY'] = 'test-key'
+        companion = AntiScammyCompanion(config_path=os.path.join(tmpdir, "config.json"))
+        companion.config["memory"] = {"path": os.path.join(tmpdir, "memory.json")}
+        companion.apply_config()
+        agent = companion.agent = StreamingAgent()
+
+        stream = TimedStream(companion.stream_reply("How are you?"))
+        tokens = list(stream)
+        assert tokens == ["Hello ", "there, ", "dear!"]
+        assert 0.04 <= stream.time_to_first_token < stream.total_time
+        assert stream.total_time >= 0.15
+        assert [turn["text"] for turn in companion.memory.turns] == ["How are you?", "Hello there, dear!"]
+
+        # Failures before the first token fall back to the canned message
+        agent.fail = True
+        assert "".join(companion.stream_reply("Still there?")) == FALLBACK_MESSAGE
+
+        # Agents without run_stream deliver the whole reply as one piece
+        class PlainAgent:
+            def run(self, prompt):
+                return "All at once"
+
+        companion.agent = PlainAgent()
+        assert list(companion.stream_message("Say hi")) == ["All at once"]
+
+    print("✓ Streamed reply test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_chunk_sms,
+        test_streamed_reply,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+Tests for the inbound SMS webhook server
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config_model import ConfigError
+from webhook_server import ConversationRouter, WebhookServer, create_webhook_server, twiml_message
+
+
+class FakeCompanion:
+    """Companion whose replies take a fixed time"""
+
+    def __init__(self, name: str, latency: float = 0.0, resident: str = ""):
+        self.name = name
+        self.latency = latency
+        self.config = {"sms": {"phone_number": resident}}
+        self.sent = []
+        self.memories = {}
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def conversation_memory(self, phone_number: str = "") -> "FakeMemory":
+        with self._lock:
+            return self.memories.setdefault(phone_number, FakeMemory())
+
+    def generate_reply(self, user_message: str, memory=None) -> str:
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.latency)
+        with self._lock:
+            self.active -= 1
+        memory.messages.append(user_message)
+        return f"{self.name} says hi & thanks for '{user_message}'"
+
+    def send_sms_message(self, message: str, wait: bool = False, slot=None, to_number=None) -> bool:
+        self.sent.append((to_number, message))
+        return True
+
+
+class FakeMemory:
+    def __init__(self):
+        self.messages = []
+
+    def save(self):
+        pass
+
+
+async def _serve(server: WebhookServer, requests, auth_tokens=None):
+    """
+    Start the server on a free port, post each (To, From, Body), return (status, text) list
+
+    auth_tokens maps a To number to the token its requests are signed with.
+    """
+    from twilio.request_validator import RequestValidator
+
+    from aiohttp import ClientSession, web
+
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/sms"
+
+    async def post(session, to_number, from_number, body):
+        data = {"To": to_number, "From": from_number, "Body": body}
+        headers = {}
+        if auth_tokens and to_number in auth_tokens:
+            headers["X-Twilio-Signature"] = RequestValidator(auth_tokens[to_number]).compute_signature(url, data)
+        async with session.post(url, data=data, headers=headers) as response:
+            return response.status, await response.text()
+
+    try:
+        async with ClientSession() as session:
+            return await asyncio.gather(*(post(session, *request) for request in requests))
+    finally:
+        await runner.cleanup()
+
+
+def test_routing_and_concurrency():
+    """Test routing by number, TwiML replies and concurrency across companions"""
+    print("Testing webhook routing and concurrency...")
+
+    rose, joe = FakeCompanion("Rose", latency=0.3), FakeCompanion("Joe", latency=0.3)
+    router = ConversationRouter()
+    router.add(lambda: rose, to_number="+15550001", from_number="(555) 100-0001")
+    router.add(lambda: joe, to_number="+15550001")
+
+    assert router.route("+1 555 0001", "+15551000001")() is rose
+    assert router.route("+15550001", "+15559999999")() is joe
+    assert router.route("+15550002", "+15551000001") is None
+    assert twiml_message("") == '<?xml version="1.0" encoding="UTF-8"?><Response></Response>'
+
+    server = WebhookServer(router, max_concurrency=4, validate_signature=False)
+    requests = [("+15550001", "+15551000001", "hello"), ("+15550001", "+15551000001", "again"),
+                ("+15550001", "+15552000002", "hi"), ("+15550002", "+15552000002", "lost")]
+    started = time.perf_counter()
+    results = asyncio.run(_serve(server, requests))
+    elapsed = time.perf_counter() - started
+
+    assert [status for status, _ in results] == [200] * 4
+    assert "<Message>Rose says hi &amp; thanks for 'hello'</Message>" in results[0][1]
+    assert "Joe says hi" in results[2][1]
+    assert "<Message>" not in results[3][1], "Unrouted messages get an empty reply"
+    # Rose's two messages run one after the other, Joe's alongside them
+    assert rose.max_active == 1
+    assert elapsed < 0.85, f"Companions should answer concurrently ({elapsed:.2f}s)"
+
+    stats = server.stats()
+    assert stats["replies"] == 3 and stats["unrouted"] == 1 and stats["pending"] == 0
+
+    print("✓ Webhook routing and concurrency test passed")
+
+
+def test_backpressure_and_late_delivery():
+    """Test 503 when saturated and SMS delivery of replies that miss the deadline"""
+    print("Testing webhook backpressure and late delivery...")
+
+    companion = FakeCompanion("Rose", latency=0.3)
+    server = WebhookServer(ConversationRouter.for_companion(companion), max_pending=2,
+                           reply_timeout=0.1, validate_signature=False, send_late_replies=True)
+    requests = [("+15550001", "+15551000001", f"message {i}") for i in range(5)]
+
+    # Shutdown waits for replies that missed the deadline to be texted
+    results = asyncio.run(_serve(server, requests))
+    statuses = sorted(status for status, _ in results)
+    assert statuses == [200, 200, 503, 503, 503], statuses
+    assert all("<Message>" not in text for status, text in results if status == 200)
+    assert server.stats()["rejected"] == 3 and server.stats()["timeouts"] == 2
+    # Late replies go back to whoever texted, not to the configured number
+    assert len(companion.sent) == 2
+    assert all(to == "+15551000001" and "Rose says hi" in text for to, text in companion.sent)
+
+    # Without send_late_replies nothing is texted
+    companion = FakeCompanion("Rose", latency=0.3)
+    server = WebhookServer(ConversationRouter.for_companion(companion), reply_timeout=0.1,
+                           validate_signature=False)
+    asyncio.run(_serve(server, [("+15550001", "+15551000001", "hello")]))
+    assert server.stats()["timeouts"] == 1 and companion.sent == []
+
+    print("✓ Webhook backpressure and late delivery test passed")
+
+
+def test_signatures_per_tenant():
+    """Test that each tenant's webhooks are checked against its own Twilio token"""
+    print("Testing webhook signatures per tenant...")
+
+    rose, joe = FakeCompanion("Rose"), FakeCompanion("Joe")
+    router = ConversationRouter()
+    router.add(lambda: rose, to_number="+15550001", auth_token="rose-token")
+    router.add(lambda: joe, to_number="+15550002", auth_token="joe-token")
+    server = create_webhook_server(router, {"api_keys": {"twilio_auth_token": ""}})
+    requests = [("+15550001", "+15551000001", "hi"), ("+15550002", "+15552000002", "hi"),
+                ("+15550003", "+15553000003", "forged")]
+    results = asyncio.run(_serve(server, requests, auth_tokens={
+        "+15550001": "rose-token", "+15550002": "joe-token", "+15550003": "guess"}))
+    assert [status for status, _ in results] == [200, 200, 403]
+    results = asyncio.run(_serve(server, requests[:1], auth_tokens={"+15550001": "joe-token"}))
+    assert results[0][0] == 403, "Another tenant's token must not be accepted"
+
+    # No token anywhere: refuse to start unless checks are explicitly off
+    saved = os.environ.pop("TWILIO_AUTH_TOKEN", None)
+    try:
+        open_router = ConversationRouter.for_companion(FakeCompanion("Rose"))
+        try:
+            create_webhook_server(open_router, {})
+            assert False, "Server started without an auth token"
+        except ConfigError:
+            pass
+        os.environ["TWILIO_AUTH_TOKEN"] = "env-token"
+        assert ConversationRouter.for_companion(FakeCompanion("Rose")).auth_token("", "") == "env-token"
+        server = create_webhook_server(open_router, {"server": {"validate_signature": False}})
+        assert not server.validate_signature and not server.send_late_replies
+    finally:
+        os.environ.pop("TWILIO_AUTH_TOKEN", None)
+        if saved is not None:
+            os.environ["TWILIO_AUTH_TOKEN"] = saved
+
+    print("✓ Webhook signatures per tenant test passed")
+
+
+def test_conversations_per_sender():
+    """Test one memory and lock per sender, and refusing strangers when a resident is set"""
+    print("Testing webhook conversations per sender...")
+
+    companion = FakeCompanion("Rose", latency=0.3)
+    server = WebhookServer(ConversationRouter.for_companion(companion), max_concurrency=4,
+                           validate_signature=False)
+    requests = [("+15550001", "+15551000001", "hello"), ("+15550001", "+15552000002", "hi")]
+    started = time.perf_counter()
+    asyncio.run(_serve(server, requests))
+    elapsed = time.perf_counter() - started
+
+    assert companion.memories["+15551000001"].messages == ["hello"]
+    assert companion.memories["+15552000002"].messages == ["hi"]
+    assert companion.max_active == 2 and elapsed < 0.55, "Senders should not wait on each other"
+
+    resident = FakeCompanion("Rose", resident="(555) 100-0001")
+    server = WebhookServer(ConversationRouter.for_companion(resident), validate_signature=False)
+    results = asyncio.run(_serve(server, [("+15550001", "+15551000001", "hello"),
+                                          ("+15550001", "+15552000002", "hi")]))
+    assert "<Message>" in results[0][1] and "<Message>" not in results[1][1]
+    assert list(resident.memories) == ["+15551000001"] and server.stats()["unrouted"] == 1
+
+    print("✓ Webhook conversations per sender test passed")
+
+
+def run_all_tests():
+    """Run all tests"""
+    tests = [
+        test_routing_and_concurrency,
+        test_backpressure_and_late_delivery,
+        test_conversations_per_sender,
+        test_signatures_per_tenant,
+    ]
+
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except Exception as e:
+            print(f"✗ {test.__name__} FAILED: {e}")
+            failed += 1
+
+    print(f"\nTests passed: {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
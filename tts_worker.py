@@ -0,0 +1,154 @@
+"""
+Offline TTS worker for Anti-Grammy-Scammy
+
+Initializing a pyttsx3 engine (loading the speech driver and enumerating
+voices) costs far more than speaking a short message. This module keeps one
+long-lived engine on a dedicated thread:
+- Synthesis jobs are queued and run one after another on that thread, since
+  pyttsx3 engines must stay on the thread that created them
+- Each job returns its file path through a Future
+- Per-job latency (queue wait plus synthesis) is recorded for reporting
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+# Warmer tone than the pyttsx3 defaults
+DEFAULT_SETTINGS = {"voice_index": 1, "rate": 150, "volume": 0.9}
+
+
+def create_pyttsx3_engine(settings: Dict) -> Any:
+    """
+    Create and configure a pyttsx3 engine
+
+    Args:
+        settings: voice_index, rate and volume to apply
+
+    Returns:
+        Configured engine
+    """
+    import pyttsx3
+
+    engine = pyttsx3.init()
+
+    # Try to set a more pleasant voice
+    voices = engine.getProperty('voices')
+    if len(voices) > settings.get("voice_index", 0):
+        engine.setProperty('voice', voices[settings["voice_index"]].id)  # Often female voice
+
+    engine.setProperty('rate', settings.get("rate", 150))  # Slower, more gentle pace
+    engine.setProperty('volume', settings.get("volume", 0.9))
+    return engine
+
+
+class TTSWorker:
+    """Thread owning a single TTS engine that synthesizes queued jobs"""
+
+    def __init__(self, settings: Optional[Dict] = None,
+                 engine_factory: Callable[[Dict], Any] = create_pyttsx3_engine):
+        """
+        Initialize the worker
+
+        Args:
+            settings: Voice settings passed to the engine factory
+            engine_factory: Creates the engine on the worker thread
+                (replaceable for tests)
+        """
+        self.settings = dict(settings or DEFAULT_SETTINGS)
+        self.engine_factory = engine_factory
+        self.latencies: List[float] = []
+        self.engine_inits = 0
+        self._jobs: "queue.Queue[Optional[Tuple[str, str, float, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker thread if it is not running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="tts-worker", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Finish queued jobs and stop the worker thread"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join(timeout)
+
+    def submit(self, text: str, path: str) -> Future:
+        """
+        Queue a synthesis job
+
+        Args:
+            text: Text to speak
+            path: Audio file to write
+
+        Returns:
+            Future resolving to the file path
+        """
+        self.start()
+        future: Future = Future()
+        self._jobs.put((text, path, time.time(), future))
+        return future
+
+    def synthesize(self, text: str, path: str, timeout: Optional[float] = None) -> str:
+        """Synthesize text to a file and wait for the result"""
+        return self.submit(text, path).result(timeout)
+
+    def _run(self):
+        engine = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            text, path, queued_at, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if engine is None:
+                    engine = self.engine_factory(self.settings)
+                    self.engine_inits += 1
+                engine.save_to_file(text, path)
+                engine.runAndWait()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(path)
+            self.latencies.append(time.time() - queued_at)
+
+    def stats(self) -> Dict:
+        """Return job count, engine initializations and latency figures in seconds"""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {"jobs": 0, "engine_inits": self.engine_inits,
+                    "mean_latency": 0.0, "p50_latency": 0.0, "max_latency": 0.0}
+        return {
+            "jobs": len(latencies),
+            "engine_inits": self.engine_inits,
+            "mean_latency": sum(latencies) / len(latencies),
+            "p50_latency": latencies[len(latencies) // 2],
+            "max_latency": latencies[-1],
+        }
+
+
+_workers: Dict[Tuple, TTSWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_tts_worker(settings: Optional[Dict] = None) -> TTSWorker:
+    """Return the shared worker for a set of voice settings"""
+    settings = dict(settings or DEFAULT_SETTINGS)
+    key = tuple(sorted(settings.items()))
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            worker = TTSWorker(settings)
+            _workers[key] = worker
+        return worker
@@ -0,0 +1,272 @@
+"""
+Voice message cache for Anti-Grammy-Scammy
+
+Many voice messages repeat the same text (greetings, the "Thinking of you
+today!" fallback), so synthesized audio is cached on disk:
+- Files are named by a hash of (normalized text, language, engine, voice
+  settings), so identical requests share one file
+- An SQLite index tracks file sizes and last use; once the cache exceeds
+  its size cap, the least recently used files are deleted
+- Cache hits return the existing file path without calling the TTS engine
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different strings share a cache entry"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def make_voice_key(text: str, lang: str, engine: str, settings: Optional[Dict] = None) -> str:
+    """Return the cache key for a synthesis request"""
+    payload = json.dumps(
+        [normalize_text(text), lang, engine, settings or {}],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class VoiceCache:
+    """Size-capped LRU cache of synthesized audio files"""
+
+    def __init__(self, directory: str = "generated_voices/cache", max_bytes: int = 200 * 1024 * 1024):
+        """
+        Initialize the cache
+
+        Args:
+            directory: Where cached audio files and the index are stored
+            max_bytes: Total size of cached files before LRU eviction
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.default_max_bytes = max_bytes
+        # Owner -> size cap it asked for
+        self._limits: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Key -> [lock, number of threads using it]
+        self._key_locks: Dict[str, List] = {}
+        self._conn = sqlite3.connect(str(self.directory / "index.db"), check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS voices (
+                voice_key TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_voices_used ON voices (last_used);
+        """)
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached file for a key, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT path FROM voices WHERE voice_key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(row[0]):
+                if row is not None:
+                    self._conn.execute("DELETE FROM voices WHERE voice_key = ?", (key,))
+                    self._conn.commit()
+                return None
+            self._conn.execute("UPDATE voices SET last_used = ? WHERE voice_key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def get_or_create(self, text: str, lang: str, engine: str, settings: Optional[Dict],
+                      synthesize: Callable[[str], None], extension: str = "mp3") -> str:
+        """
+        Return a cached audio file, synthesizing it on a miss
+
+        Args:
+            text: Text to speak
+            lang: Language code
+            engine: TTS engine name ("gtts", "pyttsx3", ...)
+            settings: Voice settings that affect the audio (rate, voice, ...)
+            synthesize: Function that writes audio for the text to a given path
+            extension: File extension of the audio format
+
+        Returns:
+            Path of the audio file
+        """
+        key = make_voice_key(text, lang, engine, settings)
+        path = self.reserve(key)
+        if path is not None:
+            return path
+        try:
+            synthesize(str(self.partial_path(key, extension)))
+            return self.commit(key, extension)
+        finally:
+            self.release(key, extension)
+
+    def reserve(self, key: str) -> Optional[str]:
+        """
+        Claim a key for synthesis, counting the lookup as a hit or a miss
+
+        Concurrent requests for the same text synthesize it only once: while
+        one caller holds a key, others wait here and then get its file.
+
+        Args:
+            key: Cache key from make_voice_key
+
+        Returns:
+            The cached file on a hit (nothing to release). On a miss, None:
+            the caller now holds the key, must write the audio to
+            partial_path(key), call commit() on success, and always release()
+        """
+        path = self.get(key)
+        if path is not None:
+            with self._lock:
+                self.hits += 1
+            return path
+
+        # The lock is dropped only when no thread holds or waits for it, so
+        # a latecomer never gets a second lock for the same key
+        with self._lock:
+            entry = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        path = self.get(key)
+        with self._lock:
+            if path is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._unlock(key)
+        return path
+
+    def partial_path(self, key: str, extension: str) -> Path:
+        """Return where a reserved key's audio is written before commit()"""
+        return self.path_for(key, extension).with_name(f"{key}.partial.{extension}")
+
+    def commit(self, key: str, extension: str) -> str:
+        """Move a reserved key's finished audio into place and index it; returns its path"""
+        final_path = self.path_for(key, extension)
+        os.replace(self.partial_path(key, extension), final_path)
+        self.add(key, str(final_path))
+        return str(final_path)
+
+    def release(self, key: str, extension: str):
+        """Give up a reserved key, removing any audio left uncommitted"""
+        try:
+            self.partial_path(key, extension).unlink()
+        except FileNotFoundError:
+            pass
+        self._unlock(key)
+
+    def _unlock(self, key: str):
+        with self._lock:
+            entry = self._key_locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._key_locks[key]
+
+    def path_for(self, key: str, extension: str) -> Path:
+        """Return where a key's audio file lives, sharded by the key's first two characters"""
+        shard = self.directory / key[:2]
+        shard.mkdir(exist_ok=True)
+        return shard / f"{key}.{extension}"
+
+    def add(self, key: str, path: str):
+        """Index an audio file and evict old files if over the size cap"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO voices (voice_key, path, size_bytes, last_used) VALUES (?, ?, ?, ?)",
+                (key, path, os.path.getsize(path), time.time()),
+            )
+            self._evict(keep=key)
+            self._conn.commit()
+
+    def resize(self, max_bytes: int):
+        """Change the size cap, evicting files at once if the cache is now over it"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict(keep=None)
+            self._conn.commit()
+
+    def set_limit(self, owner: str, max_bytes: int):
+        """
+        Record the size cap an owner wants and apply the largest requested
+
+        Calling again for the same owner replaces its earlier request, so a
+        reload can shrink the cache.
+        """
+        with self._lock:
+            self._limits[owner] = max_bytes
+            max_bytes = max(self._limits.values())
+        if max_bytes != self.max_bytes:
+            self.resize(max_bytes)
+
+    def _evict(self, keep: Optional[str]):
+        """Delete least recently used audio files (except `keep`) until under max_bytes"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM voices").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, path, size_bytes in self._conn.execute(
+                "SELECT voice_key, path, size_bytes FROM voices ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._conn.execute("DELETE FROM voices WHERE voice_key = ?", (key,))
+            total -= size_bytes
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Return hit/miss statistics and the cache size"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM voices").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "files": count,
+            "total_bytes": total,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_open_caches: Dict[str, VoiceCache] = {}
+_open_caches_lock = threading.Lock()
+
+
+def open_voice_cache(directory: str = "generated_voices/cache", max_bytes: Optional[int] = None,
+                     owner: str = "") -> VoiceCache:
+    """
+    Return the process-wide voice cache for a directory
+
+    Args:
+        directory: Cache directory
+        max_bytes: Size cap this owner wants (None to leave the cap alone).
+                   When owners ask for different caps the largest is used.
+        owner: Who is asking, e.g. the tenant ID
+    """
+    key = os.path.abspath(directory)
+    with _open_caches_lock:
+        cache = _open_caches.get(key)
+        if cache is None:
+            cache = _open_caches[key] = VoiceCache(directory)
+    if max_bytes is not None:
+        cache.set_limit(owner, max_bytes)
+    return cache
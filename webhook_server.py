@@ -0,0 +1,355 @@
+"""
+Inbound SMS webhook server for Anti-Grammy-Scammy
+
+Twilio calls a webhook for every text message a resident sends to their
+companion's number. This server answers those webhooks so residents can
+text back and forth with their companion:
+- Each message is routed to a companion by the (To, From) phone numbers
+- The reply is generated in a worker thread and returned as TwiML
+- Each sender has a conversation (and memory) of their own; messages in
+  one conversation are answered in order, different conversations
+  concurrently
+- When too many replies are already waiting on the LLM, new webhooks are
+  turned away with 503 instead of queueing without bound
+- Requests must carry a valid X-Twilio-Signature for the Twilio account of
+  the companion they are routed to; the server will not start without auth
+  tokens unless signature checks are explicitly turned off
+- Replies that miss the webhook deadline are dropped, or texted to the
+  sender later if "send_late_replies" is on
+
+Run it with `python anti_scammy.py --serve` and point the Twilio number's
+"A message comes in" webhook at http://<host>:<port>/sms.
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from config_model import ConfigError
+from metrics import metrics
+
+
+def number_key(phone_number: str) -> str:
+    """Reduce a phone number to digits (with US country code) for matching"""
+    digits = "".join(c for c in phone_number or "" if c.isdigit())
+    return "1" + digits if len(digits) == 10 else digits
+
+
+def twilio_auth_token(config: Dict) -> str:
+    """Twilio auth token from a config, else TWILIO_AUTH_TOKEN ("" if neither is set)"""
+    return config.get("api_keys", {}).get("twilio_auth_token") or os.getenv("TWILIO_AUTH_TOKEN", "")
+
+
+def twiml_message(text: str) -> str:
+    """Return a TwiML response that replies with text (or sends nothing if empty)"""
+    if not text:
+        return '<?xml version="1.0" encoding="UTF-8"?><Response></Response>'
+    return f'<?xml version="1.0" encoding="UTF-8"?><Response><Message>{escape(text)}</Message></Response>'
+
+
+class ConversationRouter:
+    """Map inbound (To, From) numbers to the companion that should answer"""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], Callable] = {}
+        self._tokens: Dict[Tuple[str, str], str] = {}
+
+    def add(self, get_companion: Callable, to_number: str = "", from_number: str = "",
+            auth_token: str = ""):
+        """
+        Register a companion
+
+        Args:
+            get_companion: Returns the companion (may build it on first call)
+            to_number: Companion's Twilio number ("" matches any)
+            from_number: Resident's phone number ("" matches any)
+            auth_token: Auth token of the Twilio account that sends its webhooks
+        """
+        key = (number_key(to_number), number_key(from_number))
+        self._routes[key] = get_companion
+        self._tokens[key] = auth_token
+
+    def _match(self, to_number: str, from_number: str) -> Optional[Tuple[str, str]]:
+        to_key, from_key = number_key(to_number), number_key(from_number)
+        for key in ((to_key, from_key), ("", from_key), (to_key, ""), ("", "")):
+            if key in self._routes:
+                return key
+        return None
+
+    def route(self, to_number: str, from_number: str) -> Optional[Callable]:
+        """Return the most specific match for a message, or None"""
+        key = self._match(to_number, from_number)
+        return None if key is None else self._routes[key]
+
+    def auth_token(self, to_number: str, from_number: str) -> str:
+        """Return the Twilio auth token of the route a message matches ("" if none)"""
+        key = self._match(to_number, from_number)
+        return "" if key is None else self._tokens[key]
+
+    def missing_tokens(self) -> List[Tuple[str, str]]:
+        """Return the (To, From) keys of routes registered without an auth token"""
+        return [key for key, token in self._tokens.items() if not token]
+
+    @classmethod
+    def for_companion(cls, companion) -> "ConversationRouter":
+        """
+        Route messages to one companion
+
+        Only the configured resident (sms.phone_number) is answered; without
+        one, anyone is, each sender in a conversation of their own.
+        """
+        router = cls()
+        config = getattr(companion, "config", {})
+        resident = config.get("sms", {}).get("phone_number", "")
+        router.add(lambda: companion, from_number=resident, auth_token=twilio_auth_token(config))
+        return router
+
+    @classmethod
+    def for_runtime(cls, runtime) -> "ConversationRouter":
+        """Route to tenants by their Twilio number and resident phone number"""
+        router = cls()
+        for tenant_id, tenant in runtime.tenants.items():
+            router.add(
+                lambda tenant_id=tenant_id: runtime.get(tenant_id),
+                to_number=tenant.config.get("api_keys", {}).get("twilio_phone_number", ""),
+                from_number=tenant.config.get("sms", {}).get("phone_number", ""),
+                auth_token=twilio_auth_token(tenant.config),
+            )
+        return router
+
+
+class WebhookServer:
+    """aiohttp application answering inbound SMS webhooks"""
+
+    def __init__(self, router: ConversationRouter, max_concurrency: int = 16,
+                 max_pending: int = 64, reply_timeout: float = 10.0,
+                 auth_token: Optional[str] = None, public_url: Optional[str] = None,
+                 validate_signature: bool = True, send_late_replies: bool = False):
+        """
+        Initialize the server
+
+        Args:
+            router: Finds the companion for each message
+            max_concurrency: Replies generated at the same time
+            max_pending: Replies in progress or waiting before new webhooks get 503
+            reply_timeout: Seconds to wait for a reply before answering the
+                webhook empty
+            auth_token: Twilio auth token for routes registered without one
+            public_url: Webhook URL as configured in Twilio (for signature
+                checks behind a proxy; defaults to the request URL)
+            validate_signature: Reject requests without a valid
+                X-Twilio-Signature for the routed companion's account
+            send_late_replies: Text replies that missed reply_timeout to the
+                sender (otherwise they are only kept in the conversation)
+        """
+        self.router = router
+        self.max_pending = max_pending
+        self.reply_timeout = reply_timeout
+        self.auth_token = auth_token
+        self.public_url = public_url
+        self.validate_signature = validate_signature
+        self.send_late_replies = send_late_replies
+        self.requests = 0
+        self.replies = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.unrouted = 0
+        self.latencies: deque = deque(maxlen=10000)
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="reply")
+        self._conversations: Dict[Tuple[str, str], List] = {}
+        self._tasks: set = set()
+
+    def create_app(self):
+        """Create the aiohttp application (POST /sms, GET /health, GET /metrics)"""
+        try:
+            from aiohttp import web
+        except ImportError:
+            print("aiohttp not installed. Run: pip install aiohttp")
+            raise
+
+        app = web.Application()
+        app.router.add_post("/sms", self.handle_sms)
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.on_cleanup.append(self._shutdown)
+        return app
+
+    def run(self, host: str = "0.0.0.0", port: int = 8080):
+        """Serve until interrupted"""
+        from aiohttp import web
+
+        print(f"Listening for SMS webhooks on http://{host}:{port}/sms")
+        web.run_app(self.create_app(), host=host, port=port, print=None)
+
+    async def _shutdown(self, app):
+        """Finish replies still in progress (and their late SMS) before stopping"""
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+            await asyncio.sleep(0)
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+
+    async def handle_sms(self, request):
+        """Answer one inbound message webhook"""
+        from aiohttp import web
+
+        params = dict(await request.post())
+        self.requests += 1
+        to_number, from_number = params.get("To", ""), params.get("From", "")
+        if self.validate_signature:
+            # Each tenant's webhooks are signed with its own Twilio account's token
+            token = self.router.auth_token(to_number, from_number) or self.auth_token
+            if not token or not self.signature_valid(request, params, token):
+                return web.Response(status=403, text="Invalid signature")
+
+        if self._pending >= self.max_pending:
+            # The LLM is saturated: shed load instead of queueing without bound
+            self.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "5"}, text="Busy")
+
+        get_companion = self.router.route(to_number, from_number)
+        if get_companion is None:
+            self.unrouted += 1
+            print(f"No companion for message from {params.get('From')} to {params.get('To')}")
+            return self._twiml("")
+
+        started = time.perf_counter()
+        self._pending += 1
+        task = asyncio.ensure_future(self._reply(
+            get_companion, params.get("Body", ""), to_number, from_number, params.get("MessageSid", "")))
+        self._tasks.add(task)
+        task.add_done_callback(self._reply_done)
+        try:
+            companion, reply, _, _ = await asyncio.wait_for(asyncio.shield(task), self.reply_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if self.send_late_replies:
+                task.add_done_callback(self._deliver_late)
+            return self._twiml("")
+        except Exception as e:
+            print(f"Error generating reply: {e}")
+            return self._twiml("")
+
+        self.replies += 1
+        self.latencies.append(time.perf_counter() - started)
+        return self._twiml(reply)
+
+    async def _reply(self, get_companion: Callable, body: str, to_number: str,
+                     from_number: str, message_sid: str = ""):
+        """Generate a reply in a worker thread, one at a time per conversation"""
+        key = (number_key(to_number), number_key(from_number))
+        entry = self._conversations.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                loop = asyncio.get_running_loop()
+                companion, reply = await loop.run_in_executor(
+                    self._executor, self._generate, get_companion, body, from_number)
+                return companion, reply, from_number, message_sid
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._conversations[key]
+
+    @staticmethod
+    def _generate(get_companion: Callable, body: str, from_number: str):
+        companion = get_companion()
+        memory = companion.conversation_memory(from_number)
+        reply = companion.generate_reply(body, memory=memory)
+        memory.save()
+        return companion, reply
+
+    def _reply_done(self, task):
+        self._pending -= 1
+        self._tasks.discard(task)
+
+    def _deliver_late(self, task):
+        """Text a reply that missed the webhook deadline to whoever sent the message"""
+        if task.cancelled() or task.exception() is not None:
+            return
+        companion, reply, from_number, message_sid = task.result()
+        slot = f"reply {message_sid}" if message_sid else None
+        self._executor.submit(companion.send_sms_message, reply, slot=slot, to_number=from_number)
+
+    def _twiml(self, text: str):
+        from aiohttp import web
+
+        return web.Response(text=twiml_message(text), content_type="application/xml")
+
+    def signature_valid(self, request, params: Dict, auth_token: str) -> bool:
+        """Check the X-Twilio-Signature header against an auth token"""
+        from twilio.request_validator import RequestValidator
+
+        url = self.public_url or str(request.url)
+        signature = request.headers.get("X-Twilio-Signature", "")
+        return RequestValidator(auth_token).validate(url, params, signature)
+
+    async def handle_health(self, request):
+        """Report request counts and reply latency"""
+        from aiohttp import web
+
+        return web.json_response(self.stats())
+
+    async def handle_metrics(self, request):
+        """Stage latency histograms in the Prometheus text format (see metrics.py)"""
+        from aiohttp import web
+
+        return web.Response(text=metrics.render_prometheus(), content_type="text/plain")
+
+    def stats(self) -> Dict:
+        """Return request counts, pending replies and latency percentiles in seconds"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "requests": self.requests,
+            "replies": self.replies,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "unrouted": self.unrouted,
+            "pending": self._pending,
+            "p50_latency": percentile(0.50),
+            "p99_latency": percentile(0.99),
+        }
+
+
+def create_webhook_server(router: ConversationRouter, config: Dict) -> WebhookServer:
+    """
+    Create a WebhookServer from a config's "server" section
+
+    Requests are checked against the Twilio auth token of the route they
+    match (or the config's token, or TWILIO_AUTH_TOKEN) unless
+    "validate_signature" is explicitly false. Late replies are only texted
+    when "send_late_replies" is true.
+
+    Raises:
+        ConfigError: If signatures are checked but a route has no auth token
+    """
+    server_config = config.get("server", {})
+    validate = server_config.get("validate_signature", True) is not False
+    auth_token = twilio_auth_token(config)
+    if validate and not auth_token and router.missing_tokens():
+        raise ConfigError([
+            "server: no Twilio auth token for webhook signature checks; set TWILIO_AUTH_TOKEN "
+            'or api_keys.twilio_auth_token, or set "validate_signature": false'
+        ])
+    if not validate:
+        print("Warning: Webhook signatures are not checked; anyone who can reach the port can post messages.")
+    return WebhookServer(
+        router,
+        max_concurrency=server_config.get("max_concurrency", 16),
+        max_pending=server_config.get("max_pending", 64),
+        reply_timeout=server_config.get("reply_timeout", 10.0),
+        auth_token=auth_token or None,
+        public_url=server_config.get("public_url") or None,
+        validate_signature=validate,
+        send_late_replies=server_config.get("send_late_replies", False) is True,
+    )